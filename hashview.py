@@ -8,7 +8,6 @@ import traceback
 
 from pathlib import Path
 from typing import Optional
-from functools import partial
 
 from hashview import create_app
 
@@ -137,6 +136,7 @@ def cli(args) -> int:
         parser = argparse.ArgumentParser()
         parser.add_argument("--debug",  action="store_true", help="increase output verbosity")
         parser.add_argument("--no-ssl", action="store_true", help="disable use of ssl")
+        parser.add_argument("command", nargs="?", choices=("web", "worker"), default="web", help="serve the web application (default) or run the scheduled jobs worker")
         parsed_args = parser.parse_args(args)
 
         ensure_authlib()
@@ -144,21 +144,21 @@ def cli(args) -> int:
         ensure_flask_bcrypt()
 
         app = create_app()
+        if parsed_args.command == 'worker':
+            # retention, dynamic wordlists and summaries run here, and only here, instead of in the web processes
+            from hashview.worker import run_worker
+            run_worker(app)
+            return 0
+
         with app.app_context():
             from hashview.models import db
             from hashview.users.routes import bcrypt
-            from hashview.scheduler import data_retention_cleanup
 
             ensure_settings_cli(db)
             ensure_admin_account_cli(db, bcrypt)
 
             print('Done! Running Hashview! Enjoy.')
 
-            scheduler = app.apscheduler
-            scheduler.remove_all_jobs()
-            #scheduler.add_job(id='DATA_RETENTION', func=partial(data_retention_cleanup, app), trigger='cron', minute='*') #hour=1
-            scheduler.add_job(id='DATA_RETENTION', func=partial(data_retention_cleanup, app), trigger='cron', hour='*')
-
         if parsed_args.debug:
             builtins.state = 'debug'
 
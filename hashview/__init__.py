@@ -6,7 +6,6 @@ from flask import request
 from flask import url_for
 from flask import redirect
 from pathlib import Path
-from functools import partial
 from logging.config import dictConfig as loggingDictConfig
 
 
@@ -75,17 +74,6 @@ def setup_defaults_if_needed():
     except:
         logger.exception('Upgrading Database failed.')
 
-    try:
-        from hashview.scheduler import scheduler
-        from hashview.scheduler import data_retention_cleanup
-        logger.info('Clearing Scheduled Jobs.')
-        scheduler.remove_all_jobs()
-        logger.info('Adding Default Scheduled Jobs Progressing.')
-        scheduler.add_job(id='DATA_RETENTION', func=partial(data_retention_cleanup, current_app), trigger='cron', hour='*')
-        logger.info('Adding Default Scheduled Jobs is Complete.')
-    except:
-        logger.exception('Adding Default Scheduled Jobs failed.')
-
     try:
         from hashview.users.routes import bcrypt
         from hashview.setup import add_admin_user
@@ -184,10 +172,6 @@ def create_app():
     migrate = Migrate()
     migrate.init_app(app, db)
 
-    from hashview.scheduler import scheduler
-    scheduler.init_app(app)
-    scheduler.start()
-
     from hashview.users.routes import bcrypt
     bcrypt.init_app(app)
 
@@ -240,4 +224,11 @@ def create_app():
 
     app.before_request(do_gui_setup_if_needed)
 
+    # Scheduled jobs run in a separate worker process (flask worker / ./hashview.py worker)
+    @app.cli.command('worker')
+    def worker_command():
+        """ Run the scheduled jobs (retention, dynamic wordlists, summaries, hashfile imports) """
+        from hashview.worker import run_worker
+        run_worker(app)
+
     return app
@@ -6,6 +6,8 @@ import hashview
 from hashview.agents.forms import AgentsForm
 from hashview.models import Agents, JobTasks
 from hashview.models import db
+from hashview.utils.agent_status import overlay_agent_status
+from hashview.utils.utils import clear_authorization_cache
 
 agents = Blueprint('agents', __name__)
 
@@ -27,7 +29,7 @@ def agents_list():
             flash('Updated Agents Name', 'success')
             return redirect(url_for('agents.agents_list'))
         else:
-            agents = Agents.query.all()
+            agents = overlay_agent_status(Agents.query.all())
             return render_template('agents.html', title='agents', agents=agents, agentsForm=agents_form)
     else:
         abort(403)
@@ -65,6 +67,7 @@ def agents_authorize(agent_id):
 
         agent.status = 'Authorized'
         db.session.commit()
+        clear_authorization_cache()
 
         flash('Agent Authorized', 'success')
         return redirect(url_for('agents.agents_list'))
@@ -83,6 +86,7 @@ def agents_deauthorize(agent_id):
 
         agent.status = 'Pending'
         db.session.commit()
+        clear_authorization_cache()
 
         flash('Agent Deauthorized', 'success')
         return redirect(url_for('agents.agents_list'))
@@ -102,6 +106,7 @@ def agents_delete(agent_id):
             agent = Agents.query.get(agent_id)
             db.session.delete(agent)
             db.session.commit()
+            clear_authorization_cache()
             flash('Agent removed', 'success')
         return redirect(url_for('agents.agents_list'))
     else:
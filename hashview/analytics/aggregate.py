@@ -0,0 +1,111 @@
+"""Single pass aggregation of recovered plaintexts for the analytics figures"""
+from collections import Counter
+from itertools import islice
+from hashview.analytics import classify
+from hashview.analytics.classify import CLASS_TABLE, MASK_TABLE, CHARSETS, CHARSET_NAMES
+
+BLANK_LABEL = 'Blank (unset)'
+
+# Number of rows classified at a time when numpy is available
+CLASSIFY_BATCH_SIZE = 10000
+
+def strip_username(username):
+    """Function to drop the domain (DOMAIN\\user) or kerberos prefix (*user) from a username"""
+
+    if '\\' in username:
+        return username.split('\\')[1]
+    if '*' in username:
+        return username.split('*')[1]
+    return username
+
+
+class PlaintextAggregate:
+    """Class accumulating every plaintext based analytics figure in one pass"""
+
+    def __init__(self):
+        self.total = 0
+        self.meets_complexity = 0
+        self.fails_complexity = 0
+        self.charsets = Counter()
+        self.lengths = Counter()
+        self.passwords = Counter()
+        self.masks = Counter()
+        self.username_matches = []
+
+    def add(self, plaintext_hex, username_hex=None):
+        """Function to account for one recovered account (hex plaintext, hex username)"""
+
+        plaintext = bytes.fromhex(plaintext_hex).decode('latin-1')
+        length = len(plaintext)
+        classes = frozenset(plaintext.translate(CLASS_TABLE))
+
+        self.total += 1
+        # Complexity: 8+ characters from at least 3 of the 4 character classes
+        if length >= 8 and len(classes) >= 3:
+            self.meets_complexity += 1
+        else:
+            self.fails_complexity += 1
+        self.charsets[CHARSET_NAMES[classes]] += 1
+        self.lengths[length] += 1
+        self.passwords[plaintext if length else BLANK_LABEL] += 1
+        self.masks[plaintext.translate(MASK_TABLE)] += 1
+
+        if username_hex and plaintext_hex:
+            if strip_username(bytes.fromhex(username_hex).decode('latin-1')) == plaintext:
+                self.username_matches.append(plaintext)
+
+    def add_batch(self, rows):
+        """Function to account for a list of (plaintext, username) rows with the vectorized classifier"""
+
+        plaintexts = [plaintext_hex for plaintext_hex, _ in rows]
+        lengths, charsets, masks, meets_complexity = classify.summarize_plaintexts(plaintexts)
+
+        self.total += len(rows)
+        self.meets_complexity += meets_complexity
+        self.fails_complexity += len(rows) - meets_complexity
+        self.charsets.update(charsets)
+        self.lengths.update(lengths)
+        self.masks.update(masks)
+        for plaintext_hex, count in Counter(plaintexts).items():
+            self.passwords[bytes.fromhex(plaintext_hex).decode('latin-1') or BLANK_LABEL] += count
+
+        for plaintext_hex, username_hex in rows:
+            if username_hex and plaintext_hex:
+                plaintext = bytes.fromhex(plaintext_hex).decode('latin-1')
+                if strip_username(bytes.fromhex(username_hex).decode('latin-1')) == plaintext:
+                    self.username_matches.append(plaintext)
+
+    def update(self, rows):
+        """Function to add (plaintext, username) rows, returns self"""
+
+        if not classify.is_available():
+            for plaintext_hex, username_hex in rows:
+                self.add(plaintext_hex, username_hex)
+            return self
+
+        rows = iter(rows)
+        batch = list(islice(rows, CLASSIFY_BATCH_SIZE))
+        while batch:
+            self.add_batch(batch)
+            batch = list(islice(rows, CLASSIFY_BATCH_SIZE))
+        return self
+
+    def charset_counts(self):
+        """Function to return (label, count) for every charset in display order"""
+
+        return [(name, self.charsets[name]) for name, _ in CHARSETS]
+
+    def top_lengths(self, limit=20):
+        """Function to return the (length, count) of the shortest lengths"""
+
+        return [(length, self.lengths[length]) for length in sorted(self.lengths)[:limit]]
+
+    def top_passwords(self, limit=10):
+        """Function to return the most common plaintexts"""
+
+        return self.passwords.most_common(limit)
+
+    def top_masks(self, limit=10):
+        """Function to return the most common masks"""
+
+        return self.masks.most_common(limit)
@@ -0,0 +1,113 @@
+"""Character classes of recovered plaintexts, and bulk classification (lengths, charsets, masks) with numpy
+
+With numpy, plaintexts are decoded from hex into one padded uint8 array and mapped through 256 entry
+lookup tables, so a batch is classified with a handful of array operations instead of
+per character Python work. numpy is optional, PlaintextAggregate falls back to its per
+row path when it is not installed.
+"""
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy is optional, see is_available()
+    np = None
+
+# Character class of every latin-1 character, same classes as hashcat masks (?u ?l ?d ?s)
+CHAR_CLASSES = ''.join(
+    'u' if 'A' <= chr(i) <= 'Z' else
+    'l' if 'a' <= chr(i) <= 'z' else
+    'd' if '0' <= chr(i) <= '9' else
+    's'
+    for i in range(256)
+)
+CLASS_TABLE = {i: CHAR_CLASSES[i] for i in range(256)}
+MASK_TABLE = {i: '?' + CHAR_CLASSES[i] for i in range(256)}
+
+# Charset breakdown labels in the order the analytics page has always listed them,
+# keyed by the set of character classes used by a plaintext
+CHARSETS = (
+    ('Blank (unset)', frozenset()),
+    ('Numeric Only', frozenset('d')),
+    ('LowerAlpha Only', frozenset('l')),
+    ('UpperAlpha Only', frozenset('u')),
+    ('Special Only', frozenset('s')),
+    ('MixedAlpha', frozenset('ul')),
+    ('MixedAlphaNumeric', frozenset('uld')),
+    ('LowerAlphaNumeric', frozenset('ld')),
+    ('UpperAlphaNumeric', frozenset('ud')),
+    ('LowerAlphaSpecial', frozenset('ls')),
+    ('UpperAlphaSpecial', frozenset('us')),
+    ('SpecialNumeric', frozenset('ds')),
+    ('MixedAlphaSpecial', frozenset('uls')),
+    ('UpperAlphaSpecialNumeric', frozenset('uds')),
+    ('LowerAlphaSpecialNumeric', frozenset('lds')),
+    ('MixedAlphaSpecialNumeric', frozenset('ulds')),
+)
+CHARSET_NAMES = {classes: name for name, classes in CHARSETS}
+
+# Bit of every character class in the charset bitmask of a plaintext
+CLASS_BITS = {'u': 1, 'l': 2, 'd': 4, 's': 8}
+
+# Charset label of every bitmask (0 to 15), same labels as the analytics page
+CHARSET_BY_BITS = {sum(CLASS_BITS[char_class] for char_class in classes): name for name, classes in CHARSETS}
+
+if np is not None:
+    # byte -> class letter (padding stays 0 so it disappears from the mask strings)
+    CLASS_LUT = np.frombuffer(CHAR_CLASSES.encode('ascii'), dtype=np.uint8)
+    # byte -> class bit
+    BITS_LUT = np.array([CLASS_BITS[char_class] for char_class in CHAR_CLASSES], dtype=np.uint8)
+    # bitmask -> number of classes used
+    POPCOUNT_LUT = np.array([bin(bits).count('1') for bits in range(16)], dtype=np.uint8)
+
+
+def is_available():
+    """Function to tell whether the vectorized path can be used"""
+
+    return np is not None
+
+def decode_plaintexts(hex_plaintexts):
+    """Function to decode hex plaintexts into a zero padded (rows, longest) uint8 array and their lengths"""
+
+    hex_lengths = np.fromiter((len(plaintext) for plaintext in hex_plaintexts), dtype=np.int64, count=len(hex_plaintexts))
+    lengths = hex_lengths // 2
+    flat = np.frombuffer(bytes.fromhex(''.join(hex_plaintexts)), dtype=np.uint8)
+
+    width = int(lengths.max()) if len(lengths) else 0
+    padded = np.zeros((len(lengths), max(width, 1)), dtype=np.uint8)
+    if len(flat):
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        columns = np.arange(len(flat)) - np.repeat(starts, lengths)
+        padded[rows, columns] = flat
+    return padded, lengths
+
+def classify_plaintexts(hex_plaintexts):
+    """Function to return the lengths, charset bitmasks and hashcat masks (b'?u?l?d') of hex plaintexts"""
+
+    padded, lengths = decode_plaintexts(hex_plaintexts)
+    in_plaintext = np.arange(padded.shape[1]) < lengths[:, None]
+
+    bits = np.bitwise_or.reduce(np.where(in_plaintext, BITS_LUT[padded], 0), axis=1).astype(np.uint8)
+    # '?' followed by the class letter for every character, padding stays 0
+    mask_bytes = np.zeros((padded.shape[0], padded.shape[1] * 2), dtype=np.uint8)
+    mask_bytes[:, 0::2] = np.where(in_plaintext, ord('?'), 0)
+    mask_bytes[:, 1::2] = np.where(in_plaintext, CLASS_LUT[padded], 0)
+    # every row viewed as one fixed width byte string, numpy drops the trailing padding
+    masks = mask_bytes.view(f'S{mask_bytes.shape[1]}').ravel()
+    return lengths, bits, masks
+
+def summarize_plaintexts(hex_plaintexts):
+    """Function to return (lengths, charsets, masks, meets_complexity) counts for a batch of hex plaintexts"""
+
+    if not hex_plaintexts:
+        return Counter(), Counter(), Counter(), 0
+    lengths, bits, masks = classify_plaintexts(hex_plaintexts)
+
+    length_counts = Counter({length: int(count) for length, count in enumerate(np.bincount(lengths)) if count})
+    charset_counts = Counter({CHARSET_BY_BITS[bitmask]: int(count) for bitmask, count in enumerate(np.bincount(bits, minlength=16)) if count})
+    unique_masks, mask_counts = np.unique(masks, return_counts=True)
+    mask_counts = Counter(dict(zip(unique_masks.astype('U').tolist(), mask_counts.tolist())))
+    # Complexity: 8+ characters from at least 3 of the 4 character classes
+    meets_complexity = int(np.count_nonzero((lengths >= 8) & (POPCOUNT_LUT[bits] >= 3)))
+    return length_counts, charset_counts, mask_counts, meets_complexity
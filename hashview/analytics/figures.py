@@ -0,0 +1,180 @@
+"""Analytics figures per scope (all, customer, hashfile), cached until the underlying summaries change"""
+import operator
+import threading
+from sqlalchemy import func
+from hashview.models import db
+from hashview.models import Hashes, Hashfiles, HashfileSummaries
+from hashview.analytics.summaries import get_hashfile_summaries, merge_summaries
+
+FIGURES = ('fig1', 'fig2', 'fig3', 'fig4', 'fig5', 'fig6', 'fig7', 'fig8', 'stats')
+
+# Number of scopes kept in the cache
+FIGURE_CACHE_SIZE = 64
+
+_cache = {}
+# Figures of a scope are requested in parallel by the page, only the first request of a scope builds them.
+# _cache_lock guards the dicts only and is never held while building, other scopes are served meanwhile.
+_cache_lock = threading.Lock()
+_scope_locks = {}
+
+
+def get_figures(customer_id=None, hashfile_id=None):
+    """Function to return every figure of a scope, from the cache while no crack, import or delete happened"""
+
+    scope = (customer_id, hashfile_id if customer_id else None)
+    version = get_figures_version()
+    with _cache_lock:
+        cached = _cache.get(scope)
+        if cached and cached[0] == version:
+            return cached[1]
+        scope_lock = _scope_locks.setdefault(scope, threading.Lock())
+
+    with scope_lock:
+        # built by the request we waited for
+        version = get_figures_version()
+        with _cache_lock:
+            cached = _cache.get(scope)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        figures = build_figures(*scope)
+        # summaries built on the way changed the version, read it again so the next view is a hit
+        version = get_figures_version()
+        with _cache_lock:
+            _cache[scope] = (version, figures)
+            while len(_cache) > FIGURE_CACHE_SIZE:
+                evicted = next(iter(_cache))
+                del _cache[evicted]
+                _scope_locks.pop(evicted, None)
+        return figures
+
+def get_figures_version():
+    """Function to return a token that changes whenever hashes are cracked, imported or deleted"""
+
+    summaries = db.session.query(func.count(HashfileSummaries.hashfile_id), func.sum(HashfileSummaries.cracked), func.sum(HashfileSummaries.total), func.max(HashfileSummaries.updated_at)).one()
+    hashfiles = db.session.query(func.count(Hashfiles.id), func.sum(Hashfiles.runtime)).one()
+    return tuple(summaries) + tuple(hashfiles)
+
+def clear_figure_cache():
+    """Function to drop every cached figure"""
+
+    with _cache_lock:
+        _cache.clear()
+
+def build_figures(customer_id=None, hashfile_id=None):
+    """Function to compute every figure of a scope from the hashfile summaries"""
+
+    if customer_id:
+        # we have a customer
+        if hashfile_id: # with a hashfile
+            summaries = get_hashfile_summaries(hashfile_ids=[hashfile_id])
+        else:
+            # just a customer, no specific hashfile
+            summaries = get_hashfile_summaries(customer_id=customer_id)
+    else:
+        summaries = get_hashfile_summaries()
+    aggregate = merge_summaries(summaries)
+
+    figures = {}
+
+    # Figure 1 (Cracked vs uncracked)
+    figures['fig1'] = _doughnut([
+        ("Recovered: ", aggregate.cracked),
+        ("Unrecovered: ", aggregate.uncracked),
+    ], percent=True)
+
+    # Figure 2 (Cracked Complexity Breakdown)
+    figures['fig2'] = _doughnut([
+        ("Fails Complexity: ", aggregate.fails_complexity),
+        ("Meets Complexity: ", aggregate.meets_complexity),
+        ("Unrecovered: ", aggregate.uncracked),
+    ])
+
+    # Figure 3 Recovered Hashes
+    figures['fig3'] = _doughnut([
+        ("Recovered: ", aggregate.unique_cracked),
+        ("Unrecovered: ", aggregate.unique_uncracked),
+    ], percent=True)
+
+    # Figure 4 (Charset Breakdown)
+    # We only want the top 4 with the 5th being other
+    fig4_sorted = sorted(aggregate.charset_counts(), key=operator.itemgetter(1), reverse=True)
+    fig4_labels = [name + ": " + format_display(count) for name, count in fig4_sorted[:4]]
+    fig4_values = [count for _, count in fig4_sorted[:4]]
+    fig4_other = sum(count for _, count in fig4_sorted[4:])
+    fig4_labels.append('Other: ' + str(fig4_other))
+    fig4_values.append(fig4_other)
+    figures['fig4'] = {'labels': fig4_labels, 'values': fig4_values}
+
+    # Figure 5 (Passwords by Length)
+    # Sort by length and limit to 20
+    fig5 = aggregate.top_lengths(20)
+    figures['fig5'] = {'labels': [row[0] for row in fig5], 'values': [row[1] for row in fig5]}
+
+    # Figure 6 (Top 10 Passwords)
+    # Sort by Highest and Limit to 10
+    fig6 = aggregate.top_passwords(10)
+    figures['fig6'] = {'labels': [row[0] for row in fig6], 'values': [row[1] for row in fig6]}
+
+    # Figure 7 (Top 10 Masks)
+    figures['fig7'] = {
+        'masks': [
+            {'mask': mask, 'count': count, 'percent': round(count / aggregate.total * 100, 2)}
+            for mask, count in aggregate.top_masks(10)
+        ],
+        'total': aggregate.total,
+    }
+
+    # Figure 8 (Users where Passwords are the same as the username)
+    figures['fig8'] = {'usernames': aggregate.username_matches}
+
+    # General Stats Table
+    if customer_id:
+        if hashfile_id:
+            runtimes = db.session.query(Hashfiles.runtime).filter(Hashfiles.id == hashfile_id)
+        else:
+            runtimes = db.session.query(Hashfiles.runtime).filter(Hashfiles.customer_id == customer_id)
+        total_unique_hashes = aggregate.unique_cracked + aggregate.unique_uncracked
+    else:
+        runtimes = db.session.query(Hashfiles.runtime)
+        # hashes shared between hashfiles are only counted once here
+        total_unique_hashes = db.session.query(Hashes).count()
+    total_runtime = sum(runtime or 0 for (runtime,) in runtimes)
+
+    figures['stats'] = {
+        'total_accounts': format_display(aggregate.cracked + aggregate.uncracked),
+        'total_unique_hashes': format_display(total_unique_hashes),
+        'total_runtime': total_runtime,
+        'total_runtime_display': format_runtime(total_runtime),
+    }
+    return figures
+
+def _doughnut(rows, percent=False):
+    """Function to return labels, values (and the recovered percentage) of a doughnut chart"""
+
+    figure = {
+        'labels': [label + format_display(count) for label, count in rows],
+        'values': [count for _, count in rows],
+    }
+    if percent:
+        total = sum(figure['values'])
+        # Cracked Percent
+        figure['percent'] = 0 if (0 == total) else [str(round(((rows[0][1] / total)*100),1)) + '%']
+    return figure
+
+def format_display(number):
+    """Function to commas to the number after every thousand places"""
+    return f"{number:,}"
+
+def format_runtime(seconds):
+    """Function to describe a runtime the way the analytics page always has"""
+
+    if seconds > 604800:
+        return str(int(round(seconds / 604800))) + ' week(s)'
+    if seconds > 86400:
+        return str(int(round(seconds / 86400))) + ' day(s)'
+    if seconds > 3600:
+        return str(int(round(seconds / 3600))) + ' hour(s)'
+    if seconds > 60:
+        return str(int(round(seconds / 60))) + ' minute(s)'
+    return '< 1 minute'
@@ -0,0 +1,233 @@
+"""Precomputed per-hashfile analytics, kept up to date on import, crack ingestion and delete"""
+import json
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import case, distinct, exists, func
+from hashview.models import db
+from hashview.models import Hashfiles, HashfileHashes, Hashes, HashfileSummaries
+from hashview.analytics.aggregate import PlaintextAggregate
+
+# Number of passwords/masks kept per hashfile. Dashboards only show the top 10, the much larger pool keeps
+# incremental adds from dropping an entry that would later climb into it (the nightly rebuild recounts them all).
+# Username matches are kept in full, fig8 lists every one of them.
+SUMMARY_TOP_LIMIT = 5000
+
+# Number of hash ids looked up at a time when recording new cracks
+SUMMARY_LOOKUP_CHUNK_SIZE = 900
+
+# Number of recovered accounts fetched at a time when refreshing a summary
+SUMMARY_BATCH_SIZE = 10000
+
+
+def refresh_hashfile_summary(hashfile_id):
+    """Function to recompute the summary of a hashfile from the hash tables, the caller commits"""
+
+    hashfile = Hashfiles.query.get(hashfile_id)
+    if not hashfile:
+        delete_hashfile_summary(hashfile_id)
+        return None
+
+    total, cracked, unique_hashes, unique_cracked, hash_type = db.session.query(
+        func.count(HashfileHashes.id),
+        func.count(case((Hashes.cracked.is_(True), 1))),
+        func.count(distinct(Hashes.id)),
+        func.count(distinct(case((Hashes.cracked.is_(True), Hashes.id)))),
+        func.max(Hashes.hash_type),
+    ).join(Hashes, Hashes.id == HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id == hashfile_id).one()
+
+    cracked_accounts = db.session.query(Hashes.plaintext, HashfileHashes.username).join(HashfileHashes, Hashes.id == HashfileHashes.hash_id).filter(Hashes.cracked.is_(True)).filter(HashfileHashes.hashfile_id == hashfile_id)
+    aggregate = PlaintextAggregate().update(cracked_accounts.yield_per(SUMMARY_BATCH_SIZE))
+
+    return _write_hashfile_summary(hashfile, hash_type, total, cracked, unique_cracked, unique_hashes - unique_cracked, aggregate)
+
+def store_hashfile_summary(hashfile_id, import_summary):
+    """Function to write the summary built while a hashfile was imported, the caller commits"""
+
+    hashfile = Hashfiles.query.get(hashfile_id)
+    if not hashfile:
+        delete_hashfile_summary(hashfile_id)
+        return None
+    return _write_hashfile_summary(hashfile, import_summary.hash_type, import_summary.total, import_summary.cracked, import_summary.unique_cracked, import_summary.unique_uncracked, import_summary.aggregate)
+
+def _write_hashfile_summary(hashfile, hash_type, total, cracked, unique_cracked, unique_uncracked, aggregate):
+    """Function to replace the summary row of a hashfile"""
+
+    summary = HashfileSummaries.query.get(hashfile.id)
+    if not summary:
+        summary = HashfileSummaries(hashfile_id=hashfile.id)
+        db.session.add(summary)
+    summary.customer_id = hashfile.customer_id
+    summary.hash_type = hash_type
+    summary.total = total
+    summary.cracked = cracked
+    summary.unique_cracked = unique_cracked
+    summary.unique_uncracked = unique_uncracked
+    summary.meets_complexity = 0
+    summary.lengths = summary.charsets = summary.masks = summary.passwords = '{}'
+    summary.username_matches = '[]'
+    _add_aggregate(summary, aggregate)
+    return summary
+
+class HashfileImportSummary:
+    """Class building the summary (and already known/cracked report) of a hashfile while it is imported
+
+    It is fed the rows the import looks up anyway, so no pass over the hashfile is needed afterwards.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.known = 0      # rows whose hash was in the db before this import
+        self.cracked = 0    # rows whose hash was already cracked
+        self.unique_cracked = 0
+        self.unique_uncracked = 0
+        self.hash_type = None
+        self.aggregate = PlaintextAggregate()
+        # hash ids seen in this hashfile and hash ids inserted by this import, bitmaps indexed by id
+        self._seen = bytearray()
+        self._inserted = bytearray()
+
+    def add_inserted(self, hash_ids):
+        """Function to record the ids of the hashes this import inserted"""
+
+        for hash_id in hash_ids:
+            _set_bit(self._inserted, hash_id)
+
+    def add_rows(self, rows):
+        """Function to account for imported (hash_id, hash_type, cracked, plaintext, username_hex) rows"""
+
+        recovered = []
+        for hash_id, hash_type, cracked, plaintext, username_hex in rows:
+            self.total += 1
+            self.hash_type = hash_type if self.hash_type is None else max(self.hash_type, hash_type)
+            if not _test_bit(self._inserted, hash_id):
+                self.known += 1
+            first = _set_bit(self._seen, hash_id)
+            if cracked:
+                self.cracked += 1
+                recovered.append((plaintext, username_hex))
+                if first:
+                    self.unique_cracked += 1
+            elif first:
+                self.unique_uncracked += 1
+        self.aggregate.update(recovered)
+
+
+def refresh_hashfile_summaries():
+    """Function to rebuild the summary of every hashfile and drop orphaned ones"""
+
+    HashfileSummaries.query.filter(~exists().where(Hashfiles.id == HashfileSummaries.hashfile_id)).delete(synchronize_session=False)
+    for (hashfile_id,) in db.session.query(Hashfiles.id).all():
+        refresh_hashfile_summary(hashfile_id)
+        db.session.commit()
+
+def delete_hashfile_summary(hashfile_id):
+    """Function to drop the summary of a deleted hashfile, the caller commits"""
+
+    HashfileSummaries.query.filter_by(hashfile_id=hashfile_id).delete(synchronize_session=False)
+
+def record_cracked_hashes(hash_ids):
+    """Function to fold newly cracked hashes into the summaries of the hashfiles containing them, the caller commits
+
+    Must be called in the transaction that marked the hashes as cracked, before the commit.
+    """
+
+    hash_ids = list(hash_ids)
+    aggregates = {}
+    new_hashes = {}
+    for offset in range(0, len(hash_ids), SUMMARY_LOOKUP_CHUNK_SIZE):
+        chunk = hash_ids[offset:offset + SUMMARY_LOOKUP_CHUNK_SIZE]
+        rows = db.session.query(HashfileHashes.hashfile_id, HashfileHashes.hash_id, HashfileHashes.username, Hashes.plaintext).join(Hashes, Hashes.id == HashfileHashes.hash_id).filter(HashfileHashes.hash_id.in_(chunk))
+        for hashfile_id, hash_id, username, plaintext in rows:
+            aggregates.setdefault(hashfile_id, PlaintextAggregate()).add(plaintext, username)
+            new_hashes.setdefault(hashfile_id, set()).add(hash_id)
+    if not aggregates:
+        return
+
+    # Lock in a fixed order so two uploads touching the same hashfiles can not deadlock
+    summaries = HashfileSummaries.query.filter(HashfileSummaries.hashfile_id.in_(aggregates)).order_by(HashfileSummaries.hashfile_id).with_for_update().all()
+    for summary in summaries:
+        aggregate = aggregates[summary.hashfile_id]
+        summary.cracked += aggregate.total
+        summary.unique_cracked += len(new_hashes[summary.hashfile_id])
+        summary.unique_uncracked = max(summary.unique_uncracked - len(new_hashes[summary.hashfile_id]), 0)
+        _add_aggregate(summary, aggregate)
+    # Hashfiles without a summary yet get a full one the next time they are read
+
+def get_hashfile_summaries(hashfile_ids=None, customer_id=None):
+    """Function to return the summaries of the given hashfiles (or of a customer, or all), building missing ones"""
+
+    hashfiles = db.session.query(Hashfiles.id)
+    summaries = HashfileSummaries.query.join(Hashfiles, Hashfiles.id == HashfileSummaries.hashfile_id)
+    if hashfile_ids is not None:
+        hashfiles = hashfiles.filter(Hashfiles.id.in_(list(hashfile_ids)))
+        summaries = summaries.filter(Hashfiles.id.in_(list(hashfile_ids)))
+    if customer_id is not None:
+        hashfiles = hashfiles.filter(Hashfiles.customer_id == customer_id)
+        summaries = summaries.filter(Hashfiles.customer_id == customer_id)
+
+    summaries = summaries.all()
+    found = {summary.hashfile_id for summary in summaries}
+    missing = [hashfile_id for (hashfile_id,) in hashfiles if hashfile_id not in found]
+    if missing:
+        summaries += [refresh_hashfile_summary(hashfile_id) for hashfile_id in missing]
+        db.session.commit()
+    return summaries
+
+def merge_summaries(summaries):
+    """Function to combine summaries into one PlaintextAggregate, with the hash counts added as attributes"""
+
+    aggregate = PlaintextAggregate()
+    aggregate.cracked = aggregate.uncracked = 0
+    aggregate.unique_cracked = aggregate.unique_uncracked = 0
+    for summary in summaries:
+        aggregate.cracked += summary.cracked
+        aggregate.uncracked += summary.total - summary.cracked
+        aggregate.unique_cracked += summary.unique_cracked
+        aggregate.unique_uncracked += summary.unique_uncracked
+        aggregate.total += summary.cracked
+        aggregate.meets_complexity += summary.meets_complexity
+        aggregate.fails_complexity += summary.cracked - summary.meets_complexity
+        aggregate.lengths.update({int(length): count for length, count in json.loads(summary.lengths).items()})
+        aggregate.charsets.update(json.loads(summary.charsets))
+        aggregate.masks.update(json.loads(summary.masks))
+        aggregate.passwords.update(json.loads(summary.passwords))
+        aggregate.username_matches.extend(json.loads(summary.username_matches))
+    return aggregate
+
+def _test_bit(bitmap, index):
+    """Function to tell whether a bit of a growing bitmap is set"""
+
+    byte, bit = divmod(index, 8)
+    return byte < len(bitmap) and bool(bitmap[byte] >> bit & 1)
+
+def _set_bit(bitmap, index):
+    """Function to set a bit of a growing bitmap, returns True if it was not set yet"""
+
+    byte, bit = divmod(index, 8)
+    if byte >= len(bitmap):
+        bitmap.extend(bytes(max(byte + 1 - len(bitmap), len(bitmap))))
+    if bitmap[byte] >> bit & 1:
+        return False
+    bitmap[byte] |= 1 << bit
+    return True
+
+def _add_aggregate(summary, aggregate):
+    """Function to add the plaintext figures of an aggregate to a summary row"""
+
+    lengths = Counter({int(length): count for length, count in json.loads(summary.lengths or '{}').items()})
+    lengths.update(aggregate.lengths)
+    charsets = Counter(json.loads(summary.charsets or '{}'))
+    charsets.update(aggregate.charsets)
+    masks = Counter(json.loads(summary.masks or '{}'))
+    masks.update(aggregate.masks)
+    passwords = Counter(json.loads(summary.passwords or '{}'))
+    passwords.update(aggregate.passwords)
+    username_matches = json.loads(summary.username_matches or '[]') + aggregate.username_matches
+
+    summary.meets_complexity = (summary.meets_complexity or 0) + aggregate.meets_complexity
+    summary.lengths = json.dumps(dict(lengths))
+    summary.charsets = json.dumps(dict(charsets))
+    summary.masks = json.dumps(dict(masks.most_common(SUMMARY_TOP_LIMIT)))
+    summary.passwords = json.dumps(dict(passwords.most_common(SUMMARY_TOP_LIMIT)))
+    summary.username_matches = json.dumps(username_matches)
+    summary.updated_at = datetime.now().replace(microsecond=0)
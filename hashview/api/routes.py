@@ -1,18 +1,22 @@
 """Flask routes to handle Analytics"""
 import os
 import json
-import secrets
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, redirect, request, send_from_directory, url_for
+from flask import Blueprint, Response, current_app, jsonify, redirect, request, send_file, stream_with_context, url_for
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from packaging import version
-from hashview.models import Agents, JobTasks, Tasks, Wordlists, Rules, Jobs, Hashes, HashfileHashes, Users, HashNotifications, Settings
-from hashview.utils.utils import get_md5_hash, update_dynamic_wordlist, update_job_task_status, send_email, send_pushover
+from hashview.models import Agents, JobTasks, Tasks, Wordlists, Rules, Jobs, Hashes, HashfileHashes, Users, HashNotifications
+from hashview.utils.agent_status import buffer_agent_status
+from hashview.utils.artifacts import get_compressed_artifact, is_valid_artifact_name
+from hashview.utils.utils import cache_authorization, claim_next_job_task, is_authorization_cached, get_cached_settings, import_cracked_hashes, update_dynamic_wordlist, update_job_task_status, send_email, send_pushover, stream_lines
 from hashview.models import db
 import hashview
 
 api = Blueprint('api', __name__)
 
+# Number of hashes fetched from the database and written to the response at a time
+HASHFILE_EXPORT_BATCH_SIZE = 5000
+
 #
 # Yeah, i know its bad and should be converted to a legit REST API.
 # This code should be considered tempoary as we work over the port.
@@ -41,6 +45,9 @@ def is_authorized(user, agent, request):
     """Function to authorize agent"""
     is_user = False # This needs to be revisited
     if request.cookies:
+        uuid = request.cookies.get('uuid')
+        if is_authorization_cached('user', uuid) or is_authorization_cached('agent', uuid):
+            return True
         if user_authorized(request.cookies.get('uuid')):
             return True
         if is_user is False:
@@ -51,26 +58,29 @@ def is_authorized(user, agent, request):
 
 def user_authorized(uuid):
     """Function to validate user authorization"""
+    if is_authorization_cached('user', uuid):
+        return True
     user = Users.query.filter_by(api_key=uuid).first()
     if user:
+        cache_authorization('user', uuid)
         return True
     return False
 
 def agent_authorized(uuid):
     """Function to validate agent authorization"""
+    if is_authorization_cached('agent', uuid):
+        return True
     agent = Agents.query.filter_by(uuid=uuid).first()
     if agent:
         if agent.status == 'Online' or agent.status == 'Working' or agent.status == 'Idle' or agent.status == 'Authorized':
+            cache_authorization('agent', uuid)
             return True
     return False
 
 def update_heartbeat(uuid):
     """Function to update agent status in DB"""
-    agent = Agents.query.filter_by(uuid=uuid).first()
-    if agent:
-        agent.src_ip = request.remote_addr
-        agent.last_checkin = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        db.session.commit()
+    # Written behind, see hashview.utils.agent_status
+    buffer_agent_status(uuid, src_ip=request.remote_addr, last_checkin=datetime.now().replace(microsecond=0))
 
 def version_check(agent_version):
     """Function to validate agent version"""
@@ -81,6 +91,28 @@ def version_check(agent_version):
     else:
         return False
 
+def send_artifact(directory, name, checksum):
+    """Function to serve a gzip copy of a wordlist or rules file from the artifact cache"""
+    if not is_valid_artifact_name(name):
+        message = {
+            'status': 400,
+            'type': 'Error',
+            'msg': 'Invalid file name'
+        }
+        return jsonify(message), 400
+
+    source_path = os.path.join(current_app.root_path, 'control', directory, name)
+    if not os.path.isfile(source_path):
+        message = {
+            'status': 404,
+            'type': 'Error',
+            'msg': 'File not found'
+        }
+        return jsonify(message), 404
+
+    # conditional=True gives us If-None-Match and Range handling on top of Content-Length
+    return send_file(get_compressed_artifact(source_path, checksum), mimetype='application/octet-stream', download_name=name + '.gz', etag=checksum, conditional=True)
+
 @api.route('/v1/not_authorized', methods=['GET', 'POST'])
 def v1_api_unauthorized():
     """Function to send unauthorized message"""
@@ -104,13 +136,13 @@ def v1_api_upgrade_required():
 @api.route('/v1/agents/heartbeat', methods=['POST'])
 def v1_api_set_agent_heartbeat():
     """Route to handle agent updates"""
+    # Agents call this every few seconds, so it loads the agent once, reads settings from the
+    # cache and commits at most once.
     # Get uuid
     uuid = request.cookies.get('uuid')
     if not version_check(request.cookies.get('agent_version')):
         return redirect("/v1/upgrade_required")
 
-    settings = Settings.query.first()
-
     # Get agent from db
     agent = Agents.query.filter_by(uuid=uuid).first()
     if not agent:
@@ -119,7 +151,7 @@ def v1_api_set_agent_heartbeat():
                         src_ip = request.remote_addr,
                         uuid = uuid,
                         status = 'Pending',
-                        last_checkin = datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                        last_checkin = datetime.now().replace(microsecond=0))
         db.session.add(new_agent)
         db.session.commit()
         message = {
@@ -129,10 +161,11 @@ def v1_api_set_agent_heartbeat():
         }
         return jsonify(message)
 
+    # Liveness and hashcat status go through the write-behind buffer, only real state changes
+    # (status, task claims, cancellations) are written as part of this request.
     update_heartbeat(uuid)
     if agent.status == 'Pending':
         # Agent exists, but has not ben activated. Update heartbeet and turn agent away
-        update_heartbeat(uuid)
         message = {
             'status': 200,
             'type': 'message',
@@ -140,9 +173,17 @@ def v1_api_set_agent_heartbeat():
         }
         return jsonify(message)
 
+    settings = get_cached_settings()
+
     # check if job_task
     agent_data = request.get_json()
 
+    message = {
+        'status': 200,
+        'type': 'message',
+        'msg': 'OK'
+    }
+
     # Check authorization cookies
     if agent_data['agent_status'] == 'Working':
         agent.status = 'Working'
@@ -150,92 +191,46 @@ def v1_api_set_agent_heartbeat():
         # Check if task has exceeded maximum runtime
         job_task = JobTasks.query.filter_by(agent_id = agent.id).first()
         if not job_task or job_task.status == 'Canceled':
-            message = {
-                'status': 200,
-                'type': 'message',
-                'msg': 'Canceled',
-            }
+            db.session.commit()
+            message['msg'] = 'Canceled'
             return jsonify(message)
 
         if settings.max_runtime_tasks > 0 and datetime.strptime(str(job_task.started_at), '%Y-%m-%d %H:%M:%S') + timedelta(hours=settings.max_runtime_tasks) < datetime.now():
             update_job_task_status(job_task.id, 'Canceled')
-            message = {
-                'status': 200,
-                'type': 'message',
-                'msg': 'Canceled',
-            }
+            message['msg'] = 'Canceled'
             return jsonify(message)
 
         # check if job has exceeded maximum runtime
         job = Jobs.query.get(job_task.job_id)
-        job_tasks = JobTasks.query.filter_by(job_id = job.id).all()
         if settings.max_runtime_jobs > 0 and datetime.strptime(str(job.started_at), '%Y-%m-%d %H:%M:%S') + timedelta(hours=settings.max_runtime_jobs) < datetime.now():
             job.status = 'Canceled'
-            job.ended_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-            for job_task in job_tasks:
-                job_task.status = 'Canceled'
-                job_task.agent_id = None
+            job.ended_at = datetime.now().replace(microsecond=0)
+            JobTasks.query.filter_by(job_id = job.id).update({JobTasks.status: 'Canceled', JobTasks.agent_id: None}, synchronize_session=False)
             db.session.commit()
-            message = {
-                'status': 200,
-                'type': 'message',
-                'msg': 'Canceled',
-            }
+            message['msg'] = 'Canceled'
             return jsonify(message)
 
         if agent_data['hc_status']:
-            agent.hc_status = agent_data['agent_status']
             hc_status = str(agent_data['hc_status']).replace("\'", "\"")
             json_response = json.loads(hc_status)
-            agent.benchmark = json_response['Speed #']
-            agent.hc_status = str(agent_data['hc_status']).replace("\'", "\"")
+            buffer_agent_status(uuid, hc_status=hc_status, benchmark=json_response['Speed #'])
 
-        db.session.commit()
-
-    if agent_data['agent_status'] == 'Idle':
+    elif agent_data['agent_status'] == 'Idle':
         # Clear hc_status if we're idle
         agent.status = "Idle"
-        agent.hc_status = ""
-        db.session.commit()
+        buffer_agent_status(uuid, hc_status="")
         already_assigned_task = JobTasks.query.filter_by(agent_id = agent.id).first()
         if already_assigned_task != None:
-            message = {
-                'status': 200,
-                'type': 'message',
-                'msg': 'START',
-                'job_task_id': already_assigned_task.id
-            }
-            return jsonify(message)
-
-        # Get first unassigned jobtask and 'assign' it to this agent
-        job_task_entry = JobTasks.query.filter_by(status = 'Queued').order_by(JobTasks.priority.desc(), JobTasks.id).first()
-        if job_task_entry:
-            job_task_entry.agent_id = agent.id
-            job_task_entry.status = 'Running'
-            job_task_entry.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            db.session.commit()
-            message = {
-                'status': 200,
-                'type': 'message',
-                'msg': 'START',
-                'job_task_id': job_task_entry.id
-            }
-            return jsonify(message)
-        update_heartbeat(uuid)
-        message = {
-            'status': 200,
-            'type': 'message',
-            'msg': 'OK'
-        }
-        return jsonify(message)
+            message['msg'] = 'START'
+            message['job_task_id'] = already_assigned_task.id
+        else:
+            # Get first unassigned jobtask and 'assign' it to this agent
+            job_task_entry = claim_next_job_task(agent.id)
+            if job_task_entry:
+                message['msg'] = 'START'
+                message['job_task_id'] = job_task_entry.id
 
-    update_heartbeat(uuid)
-    message = {
-        'status': 200,
-        'type': 'message',
-        'msg': 'OK'
-    }
+    db.session.commit()
     return jsonify(message)
 
 @api.route('/v1/rules', methods=['GET'])
@@ -261,13 +256,7 @@ def v1_api_get_rules_download(rules_id):
 
     update_heartbeat(request.cookies.get('uuid'))
     rules = Rules.query.get(rules_id)
-    rules_name = rules.path.split('/')[-1]
-    cmd = "gzip -9 -k -c hashview/control/rules/" + rules_name + " > hashview/control/tmp/" + rules_name + ".gz"
-
-    # What command injection?!
-    # TODO
-    os.system(cmd)
-    return send_from_directory('control/tmp', rules_name + '.gz', mimetype = 'application/octet-stream')
+    return send_artifact('rules', rules.path.split('/')[-1], rules.checksum)
 
 # Provide wordlist info (really should be plural)
 @api.route('/v1/wordlists', methods=['GET'])
@@ -293,13 +282,7 @@ def v1_api_get_wordlist_download(wordlist_id):
 
     update_heartbeat(request.cookies.get('uuid'))
     wordlist = Wordlists.query.get(wordlist_id)
-    wordlist_name = wordlist.path.split('/')[-1]
-    cmd = "gzip -9 -k -c hashview/control/wordlists/" + wordlist_name + " > hashview/control/tmp/" + wordlist_name + ".gz"
-
-    # What command injection?!
-    # TODO
-    os.system(cmd)
-    return send_from_directory('control/tmp', wordlist_name + '.gz', mimetype = 'application/octet-stream')
+    return send_artifact('wordlists', wordlist.path.split('/')[-1], wordlist.checksum)
 
 # Update Dynamic Wordlist
 @api.route('/v1/updateWordlist/<int:wordlist_id>', methods=['GET'])
@@ -310,11 +293,15 @@ def v1_api_get_update_wordlist(wordlist_id):
         return redirect("/v1/not_authorized")
 
     update_heartbeat(request.cookies.get('uuid'))
-    update_dynamic_wordlist(wordlist_id)
+    wordlist = update_dynamic_wordlist(wordlist_id)
+    # Agents compare generation/checksum against what they have to decide if they need to download again
     message = {
         'status': 200,
         'type': 'message',
-        'msg': 'OK'
+        'msg': 'OK',
+        'generation': wordlist.generation,
+        'checksum': wordlist.checksum,
+        'size': wordlist.size
     }
     return jsonify(message)
 
@@ -378,16 +365,18 @@ def v1_api_get_hashfile(hashfile_id):
         return redirect("/v1/not_authorized")
 
     update_heartbeat(request.cookies.get('uuid'))
-    random_hex = secrets.token_hex(8)
-    file_object = open('hashview/control/tmp/' + random_hex, 'w')
 
-    # do a left join select to get our ciphertext hashes
-    dbresults = db.session.query(Hashes, HashfileHashes).outerjoin(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(Hashes.cracked == '0').filter(HashfileHashes.hashfile_id==hashfile_id).all()
-    for result in dbresults:
-        file_object.write(result[0].ciphertext + '\n')
-    file_object.close()
+    # Only the ciphertext column is selected and rows are fetched in batches, so memory use stays
+    # flat regardless of the hashfile size and nothing is written to disk.
+    query = db.session.query(Hashes.ciphertext).join(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(Hashes.cracked.is_(False)).filter(HashfileHashes.hashfile_id==hashfile_id).yield_per(HASHFILE_EXPORT_BATCH_SIZE)
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    lines = (result.ciphertext + '\n' for result in query)
 
-    return send_from_directory('control/tmp/', random_hex)
+    response = Response(stream_with_context(stream_lines(lines, use_gzip, HASHFILE_EXPORT_BATCH_SIZE)), mimetype='text/plain')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 # Upload Cracked Hashes
 @api.route('/v1/uploadCrackFile/<int:hash_type>', methods=['POST'])
@@ -398,31 +387,17 @@ def v1_api_put_jobtask_crackfile_upload(hash_type):
 
     update_heartbeat(request.cookies.get('uuid'))
 
-    # save to file
     file_contents = request.get_json()
+    crack_file = file_contents['file']
 
-    #for entry in lines:
-    for entry in file_contents['file'].split('\n'):
-        if ':' in entry:
-            encoded_plaintext = entry.split(':')[-1]
-            #plaintext = bytes.fromhex(encoded_plaintext.rstrip())
-            plaintext = encoded_plaintext.rstrip().upper()
-            elements = entry.split(':')
-            # Remove cracked hash
-            elements.pop()
-            ciphertext = ':'.join(elements)
-
-            #print('Plaintext: ' + str(bytes.fromhex(plaintext).decode('latin-1')))
-
-            record = Hashes.query.filter_by(hash_type=hash_type, sub_ciphertext=get_md5_hash(ciphertext), cracked='0').first()
-            if record:
-                try:
-                    #record.plaintext = plaintext.decode('latin-1')
-                    record.plaintext = plaintext
-                    record.cracked = 1
-                    db.session.commit()
-                except:
-                    print('Failed to import followint cracked hash: ' + str(encoded_plaintext))
+    # Agents that send an offset only upload what was appended to their crack file since the last
+    # acknowledged offset. Only complete lines are imported, a trailing partial line (hashcat still
+    # writing) is left for the next upload. Re-sending lines is harmless, they count as already cracked.
+    offset = file_contents.get('offset')
+    if offset is not None:
+        crack_file = crack_file[:crack_file.rfind('\n') + 1]
+
+    counts = import_cracked_hashes(hash_type, crack_file)
 
     # Send Hash Completion Notifications
     hash_notifications = HashNotifications.query.all()
@@ -449,8 +424,14 @@ def v1_api_put_jobtask_crackfile_upload(hash_type):
     message = {
         'status': 200,
         'type': 'message',
-        'msg': 'OK'
+        'msg': 'OK',
+        'new': counts['new'],
+        'already_cracked': counts['already_cracked'],
+        'unmatched': counts['unmatched']
     }
+    if offset is not None:
+        # The offset is a byte position in the agent's crack file
+        message['offset'] = int(offset) + len(crack_file.encode('utf-8'))
     return jsonify(message)
 
 # Get Hashtype
@@ -17,3 +17,9 @@ class Config:
     MAIL_USERNAME = file_config['SMTP']['username']
     MAIL_PASSWORD = file_config['SMTP']['password']
     MAIL_DEFAULT_SENDER = file_config['SMTP']['default_sender']
+
+    # Size limit for the compressed wordlist/rules cache in hashview/control/cache (default 50 GB)
+    ARTIFACT_CACHE_MAX_BYTES = file_config.getint('artifacts', 'cache_max_bytes', fallback=50 * 1024 * 1024 * 1024)
+
+    # Processes parsing large hashfile uploads in parallel, 0 parses them in the importing process (default)
+    PARALLEL_PARSE_PROCESSES = file_config.getint('imports', 'parallel_parse_processes', fallback=0)
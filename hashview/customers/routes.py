@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
 from hashview.models import Customers, Jobs, Hashfiles, HashfileHashes, Hashes, HashNotifications
 from hashview.customers.forms import CustomersForm
+from hashview.analytics.summaries import delete_hashfile_summary
 from hashview.models import db
 
 customers = Blueprint('customers', __name__)
@@ -57,6 +58,7 @@ def customers_delete(customer_id):
                             db.session.delete(hash)
                             HashNotifications.query.filter_by(hash_id=hashfile_hash.hash_id).delete()
                     db.session.delete(hashfile_hash)
+                delete_hashfile_summary(hashfile.id)
                 db.session.delete(hashfile)
         db.session.delete(customer)
         db.session.commit()
@@ -4,6 +4,7 @@ from flask_login import login_required, current_user
 from sqlalchemy.sql import exists
 from hashview.models import Hashfiles, Customers, Jobs, HashfileHashes, HashNotifications, Hashes
 from hashview.models import db
+from hashview.analytics.summaries import get_hashfile_summaries, delete_hashfile_summary
 
 hashfiles = Blueprint('hashfiles', __name__)
 
@@ -22,14 +23,9 @@ def hashfiles_list():
     cracked_rate = {}
     hash_type_dict = {}
 
-    for hashfile in hashfiles:
-        cracked_cnt = db.session.query(Hashes).join(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(Hashes.cracked == '1').filter(HashfileHashes.hashfile_id==hashfile.id).count()
-        hash_cnt = db.session.query(Hashes).join(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id==hashfile.id).count()
-        cracked_rate[hashfile.id] = "(" + str(cracked_cnt) + "/" + str(hash_cnt) + ")"
-        if db.session.query(Hashes).join(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id==hashfile.id).first():
-            hash_type_dict[hashfile.id] = db.session.query(Hashes).join(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id==hashfile.id).first().hash_type
-        else:
-            hash_type_dict[hashfile.id] = 'UNKNOWN'
+    for summary in get_hashfile_summaries():
+        cracked_rate[summary.hashfile_id] = "(" + str(summary.cracked) + "/" + str(summary.total) + ")"
+        hash_type_dict[summary.hashfile_id] = summary.hash_type if summary.hash_type is not None else 'UNKNOWN'
 
     return render_template('hashfiles.html', title='Hashfiles', hashfiles=hashfiles, customers=customers, cracked_rate=cracked_rate, jobs=jobs, hash_type_dict=hash_type_dict)
 
@@ -48,6 +44,7 @@ def hashfiles_delete(hashfile_id):
             else:
                 HashfileHashes.query.filter_by(hashfile_id = hashfile_id).delete()
                 Hashfiles.query.filter_by(id = hashfile_id).delete()
+                delete_hashfile_summary(hashfile_id)
                 Hashes.query.filter().where(~exists().where(Hashes.id == HashfileHashes.hash_id)).where(Hashes.cracked == 0).delete(synchronize_session='fetch')
                 HashNotifications.query.filter(~exists().where(HashNotifications.hash_id == HashfileHashes.hash_id)).filter(Hashes.cracked == 0).delete(synchronize_session='fetch')
                 db.session.commit()
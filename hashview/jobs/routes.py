@@ -3,12 +3,14 @@ import os
 import secrets
 import json
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, flash, url_for, current_app, request
+from flask import Blueprint, render_template, redirect, flash, url_for, current_app, request, jsonify
 from flask_login import login_required, current_user
 from hashview.jobs.forms import JobsForm, JobsNewHashFileForm, JobsNotificationsForm, JobSummaryForm
-from hashview.models import HashNotifications, JobNotifications, Jobs, Customers, Hashfiles, Users, HashfileHashes, Hashes, JobTasks, Tasks, TaskGroups, Settings
-from hashview.utils.utils import save_file, import_hashfilehashes, build_hashcat_command, validate_pwdump_hashfile, validate_netntlm_hashfile, validate_kerberos_hashfile, validate_shadow_hashfile, validate_user_hash_hashfile, validate_hash_only_hashfile
+from hashview.models import HashNotifications, JobNotifications, Jobs, Customers, Hashfiles, Users, HashfileHashes, Hashes, JobTasks, Tasks, TaskGroups, Settings, HashfileImports
+from hashview.utils.utils import save_file, build_hashcat_command
+from hashview.utils.hashfile_imports import queue_hashfile_import
 from hashview.models import db
+from hashview.analytics.summaries import get_hashfile_summaries
 
 
 jobs = Blueprint('jobs', __name__)
@@ -73,10 +75,8 @@ def jobs_assigned_hashfile(job_id):
         flash('You can not edit a running or queued job. First stop and remove job from queue before editing.', 'danger')
         return redirect(url_for('jobs.list', job_id=job_id))
 
-    for hashfile in hashfiles:
-        cracked_cnt = db.session.query(Hashes).outerjoin(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(Hashes.cracked == '1').filter(HashfileHashes.hashfile_id==hashfile.id).count()
-        total = db.session.query(Hashes).outerjoin(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id==hashfile.id).count()
-        hashfile_cracked_rate[hashfile.id] = "(" + str(cracked_cnt) + "/" + str(total) + ")"
+    for summary in get_hashfile_summaries(customer_id=job.customer_id):
+        hashfile_cracked_rate[summary.hashfile_id] = "(" + str(summary.cracked) + "/" + str(summary.total) + ")"
 
     if jobs_new_hashfile_form.validate_on_submit():
 
@@ -93,55 +93,41 @@ def jobs_assigned_hashfile(job_id):
                 return redirect(url_for('jobs.jobs_assigned_hashfile', job_id=job_id))
 
             random_hex = secrets.token_hex(8)
-            hashfile_path = 'hashview/control/tmp/' + random_hex
+            hashfile_path = os.path.join(current_app.root_path, 'control/tmp', random_hex)
             hashfilehashes_file = open(hashfile_path, 'w+')
             hashfilehashes_file.write(jobs_new_hashfile_form.hashfilehashes.data)
             hashfilehashes_file.close()
 
         if len(hashfile_path) > 0:
             if jobs_new_hashfile_form.file_type.data == 'pwdump':
-                has_problem = validate_pwdump_hashfile(hashfile_path, jobs_new_hashfile_form.pwdump_hash_type.data)
                 hash_type = jobs_new_hashfile_form.pwdump_hash_type.data
             elif jobs_new_hashfile_form.file_type.data == 'NetNTLM':
-                has_problem = validate_netntlm_hashfile(hashfile_path)
                 hash_type = jobs_new_hashfile_form.netntlm_hash_type.data
             elif jobs_new_hashfile_form.file_type.data == 'kerberos':
-                has_problem = validate_kerberos_hashfile(hashfile_path, jobs_new_hashfile_form.kerberos_hash_type.data)
                 hash_type = jobs_new_hashfile_form.kerberos_hash_type.data
             elif jobs_new_hashfile_form.file_type.data == 'shadow':
-                has_problem = validate_shadow_hashfile(hashfile_path, jobs_new_hashfile_form.shadow_hash_type.data)
                 hash_type = jobs_new_hashfile_form.shadow_hash_type.data
-            elif jobs_new_hashfile_form.file_type.data == 'user_hash':
-                has_problem = validate_user_hash_hashfile(hashfile_path)
-                hash_type = jobs_new_hashfile_form.hash_type.data
-            elif jobs_new_hashfile_form.file_type.data == 'hash_only':
-                has_problem = validate_hash_only_hashfile(hashfile_path, jobs_new_hashfile_form.hash_type.data)
+            elif jobs_new_hashfile_form.file_type.data in ('user_hash', 'hash_only'):
                 hash_type = jobs_new_hashfile_form.hash_type.data
             else:
-                has_problem = 'Invalid File Format'
-
-            if has_problem:
-                flash(has_problem, 'danger')
+                os.remove(hashfile_path)
+                flash('Invalid File Format', 'danger')
                 return redirect(url_for('jobs.jobs_assigned_hashfile', job_id=job_id))
-            else:
-                hashfile = Hashfiles(name=jobs_new_hashfile_form.hashfile.data.filename, customer_id=job.customer_id, owner_id=current_user.id)
-                db.session.add(hashfile)
-                db.session.commit()
-
-                # Parse Hashfile
-                if not import_hashfilehashes(   hashfile_id=hashfile.id,
-                                                hashfile_path=hashfile_path,
-                                                file_type=jobs_new_hashfile_form.file_type.data,
-                                                hash_type=hash_type
-                                                ):
-                    return ('Something went wrong. Check the filetype / hashtype and try again.')
-
-                # Delete hashfile file on disk
-                # TODO
-                job.hashfile_id = hashfile.id
-                db.session.commit()
 
-            return redirect(str(hashfile.id))
+            if jobs_new_hashfile_form.hashfile.data:
+                hashfile_name = jobs_new_hashfile_form.hashfile.data.filename
+            else:
+                hashfile_name = jobs_new_hashfile_form.name.data
+
+            # Validation and import run in the worker, the import page polls their progress
+            hashfile_import = queue_hashfile_import(job=job,
+                                                    name=hashfile_name,
+                                                    path=hashfile_path,
+                                                    file_type=jobs_new_hashfile_form.file_type.data,
+                                                    hash_type=hash_type,
+                                                    owner_id=current_user.id
+                                                    )
+            return redirect(url_for('jobs.jobs_assigned_hashfile_import', job_id=job_id, import_id=hashfile_import.id))
 
     elif request.method == 'POST' and request.form['hashfile_id']:
         # User selected an existing hashfile
@@ -165,6 +151,33 @@ def jobs_assigned_hashfile(job_id):
 
     return render_template('jobs_assigned_hashfiles.html', title='Jobs Assigned Hashfiles', hashfiles=hashfiles, job=job, jobs_new_hashfile_form=jobs_new_hashfile_form, hashfile_cracked_rate=hashfile_cracked_rate)
 
+@jobs.route("/jobs/<int:job_id>/assigned_hashfile/import/<int:import_id>", methods=['GET'])
+@login_required
+def jobs_assigned_hashfile_import(job_id, import_id):
+    """Function to show the progress of a hashfile import"""
+
+    job = Jobs.query.get_or_404(job_id)
+    hashfile_import = HashfileImports.query.filter_by(id=import_id, job_id=job_id).first_or_404()
+    return render_template('jobs_assigned_hashfile_import.html', title='Jobs Assigned Hashfile Import', job=job, hashfile_import=hashfile_import)
+
+@jobs.route("/jobs/<int:job_id>/assigned_hashfile/import/<int:import_id>/status", methods=['GET'])
+@login_required
+def jobs_assigned_hashfile_import_status(job_id, import_id):
+    """Function to return the status of a hashfile import as json"""
+
+    hashfile_import = HashfileImports.query.filter_by(id=import_id, job_id=job_id).first_or_404()
+    status = {
+        'status': hashfile_import.status,
+        'error': hashfile_import.error,
+        'rows_processed': hashfile_import.rows_processed,
+        'rows_per_second': hashfile_import.rows_per_second,
+        'hashes_known': hashfile_import.hashes_known,
+        'hashes_cracked': hashfile_import.hashes_cracked,
+    }
+    if hashfile_import.status == 'done':
+        status['next'] = url_for('jobs.jobs_assigned_hashfile_cracked', job_id=job_id, hashfile_id=hashfile_import.hashfile_id)
+    return jsonify(status)
+
 @jobs.route("/jobs/<int:job_id>/assigned_hashfile/<int:hashfile_id>", methods=['GET'])
 @login_required
 def jobs_assigned_hashfile_cracked(job_id, hashfile_id):
@@ -174,7 +187,7 @@ def jobs_assigned_hashfile_cracked(job_id, hashfile_id):
     hashfile = Hashfiles.query.get(hashfile_id)
     # Can be optimized to only return the hash and plaintext
     cracked_hashfiles_hashes = db.session.query(Hashes, HashfileHashes).join(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(Hashes.cracked == '1').filter(HashfileHashes.hashfile_id==hashfile.id).all()
-    cracked_hashfiles_hashes_cnt = db.session.query(Hashes).join(HashfileHashes, Hashes.id == HashfileHashes.hash_id).filter(Hashes.cracked == '1').filter(HashfileHashes.hashfile_id==hashfile.id).count()
+    cracked_hashfiles_hashes_cnt = len(cracked_hashfiles_hashes)
     if cracked_hashfiles_hashes_cnt > 0:
         flash(str(cracked_hashfiles_hashes_cnt) + " instacracked Hashes!", 'success')
     # Oppertunity for either a stored procedure or for some fancy queries.
@@ -411,9 +424,8 @@ def jobs_summary(job_id):
     tasks = Tasks.query.all()
     hashfile = Hashfiles.query.get(job.hashfile_id)
     customer = Customers.query.get(job.customer_id)
-    cracked_cnt = db.session.query(Hashes).outerjoin(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(Hashes.cracked == '1').filter(HashfileHashes.hashfile_id==hashfile.id).count()
-    hash_total = db.session.query(Hashes).outerjoin(HashfileHashes, Hashes.id==HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id==hashfile.id).count()
-    cracked_rate = str(cracked_cnt) + '/' + str(hash_total)
+    summary = get_hashfile_summaries(hashfile_ids=[hashfile.id])[0]
+    cracked_rate = str(summary.cracked) + '/' + str(summary.total)
     hash_notification_cnt = db.session.query(HashNotifications).join(HashfileHashes, HashNotifications.hash_id==HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id == hashfile.id).count()
     hash_notification = db.session.query(HashNotifications).join(HashfileHashes, HashNotifications.hash_id==HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id == hashfile.id).first()
     job_notification = JobNotifications.query.filter_by(job_id = job.id).first()
@@ -6,6 +6,7 @@ from flask_login import login_required, current_user
 from sqlalchemy import or_
 
 from hashview.models import Jobs, JobTasks, Users, Customers, Tasks, Agents
+from hashview.utils.agent_status import overlay_agent_status
 from hashview.utils.utils import update_job_task_status
 
 
@@ -22,7 +23,7 @@ def home():
     customers = Customers.query.all()
     job_tasks = JobTasks.query.all()
     tasks = Tasks.query.all()
-    agents = Agents.query.all()
+    agents = overlay_agent_status(Agents.query.all())
 
     recovered_list = {}
     time_estimated_list = {}
@@ -8,10 +8,14 @@ from flask import current_app
 from authlib import jose
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
 
 
 db = SQLAlchemy()
 
+# Plain TEXT tops out at 64KB on MySQL, summaries use MEDIUMTEXT there
+SUMMARY_TEXT = db.Text().with_variant(MEDIUMTEXT(), 'mysql')
+
 
 class Users(db.Model, UserMixin):
     """Class object to represent Users"""
@@ -157,11 +161,35 @@ class Hashfiles(db.Model):
 class HashfileHashes(db.Model):
     """Class object to represent HashfileHashes"""
 
+    # hashfile_id first serves the reads of a hashfile, hash_id first the joins from hashes (crack ingestion, orphan cleanup)
+    __table_args__ = (
+        db.Index('ix_hashfile_hashes_hashfile_id_hash_id', 'hashfile_id', 'hash_id'),
+        db.Index('ix_hashfile_hashes_hash_id_hashfile_id', 'hash_id', 'hashfile_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    hash_id = db.Column(db.Integer, nullable=False, index=True)
+    hash_id = db.Column(db.Integer, nullable=False)
     username = db.Column(db.String(256), nullable=True, default=None, index=True)
     hashfile_id = db.Column(db.Integer, nullable=False)
 
+class HashfileSummaries(db.Model):
+    """Class object to represent HashfileSummaries (precomputed analytics of a hashfile)"""
+
+    hashfile_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_id = db.Column(db.Integer, nullable=False, index=True)
+    hash_type = db.Column(db.Integer)
+    total = db.Column(db.Integer, nullable=False, default=0)                # accounts
+    cracked = db.Column(db.Integer, nullable=False, default=0)              # recovered accounts
+    unique_cracked = db.Column(db.Integer, nullable=False, default=0)       # distinct recovered hashes
+    unique_uncracked = db.Column(db.Integer, nullable=False, default=0)     # distinct unrecovered hashes
+    meets_complexity = db.Column(db.Integer, nullable=False, default=0)
+    lengths = db.Column(SUMMARY_TEXT, nullable=False, default='{}')         # json {length: count}
+    charsets = db.Column(SUMMARY_TEXT, nullable=False, default='{}')        # json {charset: count}
+    masks = db.Column(SUMMARY_TEXT, nullable=False, default='{}')           # json {mask: count}, most common only
+    passwords = db.Column(SUMMARY_TEXT, nullable=False, default='{}')       # json {plaintext: count}, most common only
+    username_matches = db.Column(SUMMARY_TEXT, nullable=False, default='[]')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
 class Agents(db.Model):
     """Class object to represent Agents"""
 
@@ -196,6 +224,7 @@ class Wordlists(db.Model):
     path = db.Column(db.String(245), nullable=False)
     size = db.Column(db.BigInteger, nullable=False)
     checksum = db.Column(db.String(64), nullable=False)
+    generation = db.Column(db.Integer, nullable=False, default=0)   # Bumped on every change of a dynamic wordlist
 
 class Tasks(db.Model):
     """Class object to represent Tasks"""
@@ -219,10 +248,13 @@ class TaskGroups(db.Model):
 class Hashes(db.Model):
     """Class object to represent Hashes"""
 
+    # every lookup filters on hash_type and sub_ciphertext, one unique index serves them all
+    __table_args__ = (db.Index('ix_hashes_hash_type_sub_ciphertext', 'hash_type', 'sub_ciphertext', unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
-    sub_ciphertext = db.Column(db.String(32), nullable=False, index=True)
+    sub_ciphertext = db.Column(db.BINARY(16), nullable=False) # raw md5 digest of the ciphertext, see get_md5_hash()
     ciphertext = db.Column(db.String(16383), nullable=False) # Setting this to max value for now. If we run into this being a limitation in the future we can revisit changing thist to TEXT or BLOB. https://sheeri.org/max-varchar-size/
-    hash_type = db.Column(db.Integer, nullable=False, index=True)
+    hash_type = db.Column(db.Integer, nullable=False)
     cracked = db.Column(db.Boolean, nullable=False)
     plaintext = db.Column(db.String(256), index=True)
 
@@ -241,3 +273,31 @@ class HashNotifications(db.Model):
     owner_id = db.Column(db.Integer, nullable=False)
     hash_id = db.Column(db.Integer, nullable=False)
     method = db.Column(db.String(6), nullable=False)    # email, push
+
+class HashfileImports(db.Model):
+    """Class object to represent HashfileImports, an uploaded hashfile waiting for or going through import"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, nullable=False)
+    customer_id = db.Column(db.Integer, nullable=False)
+    owner_id = db.Column(db.Integer, nullable=False)
+    hashfile_id = db.Column(db.Integer)                 # set once the import started
+    name = db.Column(db.String(256), nullable=False)
+    path = db.Column(db.String(256), nullable=False)    # uploaded file in control/tmp, removed once imported
+    file_type = db.Column(db.String(10), nullable=False)
+    hash_type = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued', index=True)  # queued, validating, importing, done, failed
+    error = db.Column(db.String(1024))
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_per_second = db.Column(db.Integer, nullable=False, default=0)
+    hashes_known = db.Column(db.Integer, nullable=False, default=0)     # rows whose hash was already in the db
+    hashes_cracked = db.Column(db.Integer, nullable=False, default=0)   # rows whose hash was already cracked
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+class WorkerLocks(db.Model):
+    """Class object to represent WorkerLocks, held by the worker running a scheduled job"""
+
+    name = db.Column(db.String(64), primary_key=True)
+    owner = db.Column(db.String(255), nullable=False)   # hostname:pid of the worker
+    expires_at = db.Column(db.DateTime, nullable=False)
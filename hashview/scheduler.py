@@ -1,6 +1,10 @@
 """Function file to scheduler"""
+import os
+import socket
 from logging import Logger
 from functools import partial
+from datetime import datetime
+from datetime import timedelta
 
 from flask import Flask
 from flask_mail import Mail
@@ -11,6 +15,84 @@ from flask_apscheduler import APScheduler
 
 scheduler = APScheduler()
 
+# Number of rows deleted per statement (and committed at a time) by the retention cleanup
+RETENTION_BATCH_SIZE = 5000
+
+# Seconds the retention lock is held without renewal, the cleanup renews it after every batch
+RETENTION_LOCK_TTL = 3600
+
+
+def _lock_owner() -> str:
+    """ name of this worker in the worker_locks table """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def acquire_worker_lock(db :SQLAlchemy, name :str, ttl :int) -> bool:
+    """ take the cluster wide lock of a scheduled job for ttl seconds, returns False if another worker holds it """
+
+    from sqlalchemy import or_
+    from sqlalchemy.exc import IntegrityError
+    from hashview.models import WorkerLocks
+
+    now = datetime.now().replace(microsecond=0)
+    owner = _lock_owner()
+    expires_at = now + timedelta(seconds=ttl)
+
+    # Take over a lock that expired (its worker died) or that we already hold
+    taken = WorkerLocks.query.filter(WorkerLocks.name == name).filter(or_(WorkerLocks.expires_at < now, WorkerLocks.owner == owner)).update({'owner': owner, 'expires_at': expires_at}, synchronize_session=False)
+    if taken:
+        db.session.commit()
+        return True
+
+    try:
+        db.session.add(WorkerLocks(name=name, owner=owner, expires_at=expires_at))
+        db.session.commit()
+    except IntegrityError:
+        # the lock exists and is held by another worker
+        db.session.rollback()
+        return False
+    return True
+
+
+def renew_worker_lock(db :SQLAlchemy, name :str, ttl :int) -> bool:
+    """ push back the expiry of a lock this worker holds by ttl seconds, returns False if it was lost """
+
+    from hashview.models import WorkerLocks
+
+    expires_at = datetime.now().replace(microsecond=0) + timedelta(seconds=ttl)
+    renewed = WorkerLocks.query.filter_by(name=name, owner=_lock_owner()).update({'expires_at': expires_at}, synchronize_session=False)
+    db.session.commit()
+    return bool(renewed)
+
+
+def release_worker_lock(db :SQLAlchemy, name :str):
+    """ release the lock of a scheduled job if this worker holds it """
+
+    from hashview.models import WorkerLocks
+
+    WorkerLocks.query.filter_by(name=name, owner=_lock_owner()).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run_locked_job(app :Flask, name :str, ttl :int, func) -> bool:
+    """ run a scheduled job only if no other worker of the cluster is running it, returns True if it ran """
+
+    with app.app_context():
+        from hashview.models import db
+
+        if not acquire_worker_lock(db, name, ttl):
+            app.logger.info('%s ScheduledJob is Skipped, another worker holds its lock.', name)
+            return False
+
+        try:
+            func(app)
+        except:
+            db.session.rollback()
+            raise
+        finally:
+            release_worker_lock(db, name)
+        return True
+
 
 def try_send_email(user, subject :str, plaintext_body :str, mailer :Mail) -> bool:
     """ try to send an email, returning an error message on failure """
@@ -37,105 +119,101 @@ def try_send_email(user, subject :str, plaintext_body :str, mailer :Mail) -> boo
         return None
 
 
-def _data_retention_cleanup_inner(db :SQLAlchemy, mailer :Mail, logger :Logger):
-    """ description needed """
+def _data_retention_cleanup_inner(db :SQLAlchemy, mailer :Mail, logger :Logger, renew_lock=None):
+    """ remove jobs, hashfiles and temp files older than the retention period, in bounded set based batches
 
+    renew_lock, when given, is called after every committed batch and returns False once the lock is lost.
+    """
+
+    import time
     from pathlib import Path
-    from datetime import datetime
-    from datetime import timedelta
     from textwrap import dedent
 
-    from hashview.models import Users, Settings, Jobs, JobTasks, JobNotifications, HashfileHashes, HashNotifications, Hashes, Hashfiles
+    from sqlalchemy import exists, or_
+    from hashview.models import Users, Settings, Jobs, JobTasks, JobNotifications, HashfileHashes, HashNotifications, Hashes, Hashfiles, HashfileSummaries
 
     try_send_email_ = partial(try_send_email, mailer=mailer)
 
+    def keep_lock():
+        # a run longer than the lock ttl must not let a second worker start deleting the same rows
+        if renew_lock and not renew_lock():
+            raise RuntimeError('DataRetentionCleanup lost its worker lock, stopping.')
+
     logger.debug('I am retaining all the data: %s', datetime.now())
 
     setting = Settings.query.get('1')
     retention_period = setting.retention_period
     filter_after = datetime.today() - timedelta(days = retention_period)
 
-    # Remove job, job tasks and job notifications
-    jobs = Jobs.query.filter(Jobs.created_at < filter_after).all()
-    for job in jobs:
-        # Send email saying we've deleted their job
-        user = Users.query.get(job.owner_id)
-        subject = f'Hashview removed an old job: {job.name}'
-        message = dedent(f'''\
-            Hello {user.first_name},
-
-            In accordance to the data retention policy of {retention_period} days, your job "{job.name}" was deleted.
-        ''')
-        if (error := try_send_email_(user, subject, message)):
-            logger.error(error)
-
-        JobTasks.query.filter_by(job_id=job.id).delete()
-        JobNotifications.query.filter_by(job_id=job.id).delete()
+    # What was removed for whom, one email per user at the end
+    removed = {}
 
-        db.session.delete(job)
+    # Remove old jobs and jobs associated to an old hashfile (note hashfiles might be associated to a job thats < retention period. Those jobs should be removed too)
+    started = time.perf_counter()
+    expired_hashfiles = db.session.query(Hashfiles.id).filter(Hashfiles.uploaded_at < filter_after)
+    hashfiles = {hashfile.id: hashfile for hashfile in db.session.query(Hashfiles.id, Hashfiles.name, Hashfiles.owner_id).filter(Hashfiles.uploaded_at < filter_after)}
+    jobs = db.session.query(Jobs.id, Jobs.name, Jobs.owner_id, Jobs.created_at, Jobs.hashfile_id).filter(or_(Jobs.created_at < filter_after, Jobs.hashfile_id.in_(expired_hashfiles))).all()
+    for job in jobs:
+        if job.created_at < filter_after:
+            removed.setdefault(job.owner_id, []).append(f'your job "{job.name}" was deleted.')
+        else:
+            removed.setdefault(job.owner_id, []).append(f'your job "{job.name}" was deleted because it was associated with the hashfile "{hashfiles[job.hashfile_id].name}".')
+
+    counts = {'jobs': 0, 'job_tasks': 0, 'job_notifications': 0}
+    job_ids = [job.id for job in jobs]
+    for offset in range(0, len(job_ids), RETENTION_BATCH_SIZE):
+        batch = job_ids[offset:offset + RETENTION_BATCH_SIZE]
+        counts['job_tasks'] += JobTasks.query.filter(JobTasks.job_id.in_(batch)).delete(synchronize_session=False)
+        counts['job_notifications'] += JobNotifications.query.filter(JobNotifications.job_id.in_(batch)).delete(synchronize_session=False)
+        counts['jobs'] += Jobs.query.filter(Jobs.id.in_(batch)).delete(synchronize_session=False)
         db.session.commit()
-
-        logger.debug("Job Name: %s  Owner ID: %s has been Deleted", job.name, job.owner_id)
-
-    # Remove Hashfiles (note hashfiles might be associated to a job thats < retention period. Those jobs should be removed too)
-    hashfiles = Hashfiles.query.filter(Hashfiles.uploaded_at < filter_after).all()
-    for hashfile in hashfiles:
-        # Job, jobtask and job notifications
-        jobs = Jobs.query.filter_by(hashfile_id = hashfile.id).all()
-        for job in jobs:
-            logger.debug("Hashfile->jobs: Job Name: %s", job.name)
-            user = Users.query.get(job.owner_id)
-            subject = f'Hashview removed a job that was associated to an old hash file: {job.name}'
-            message = dedent(f'''\
-                Hello ' + str(user.first_name) + ',
-
-                In accordance to the data retention policy of {retention_period} days, your hashfile "{hashfile.name}" was associated with a job "{job.name}". This job was deleted.
-            ''')
-            if (error := try_send_email_(user, subject, message)):
-                logger.error(error)
-
-            JobTasks.query.filter_by(job_id=job.id).delete()
-            JobNotifications.query.filter_by(job_id=job.id).delete()
-
-            db.session.delete(job)
+        keep_lock()
+    logger.info('DataRetentionCleanup.Jobs removed %s jobs, %s job tasks and %s job notifications in %.2fs.', counts['jobs'], counts['job_tasks'], counts['job_notifications'], time.perf_counter() - started)
+
+    # Hashfiles, HashfileHashes, orphaned uncracked Hashes and their Hash notifications
+    started = time.perf_counter()
+    counts = {'hashfiles': 0, 'hashfile_hashes': 0, 'hashes': 0, 'hash_notifications': 0}
+    for hashfile in hashfiles.values():
+        logger.debug('Hashfile ID: %s  Hashfile Name: %s  Owner ID: %s', hashfile.id, hashfile.name, hashfile.owner_id)
+        removed.setdefault(hashfile.owner_id, []).append(f'your hashfile "{hashfile.name}" was removed.')
+
+        while True:
+            rows = db.session.query(HashfileHashes.id, HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id == hashfile.id).limit(RETENTION_BATCH_SIZE).all()
+            if not rows:
+                break
+            hash_ids = list({row.hash_id for row in rows})
+            counts['hashfile_hashes'] += HashfileHashes.query.filter(HashfileHashes.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+            # A hash is only removed once no hashfile references it anymore, cracked hashes are kept
+            counts['hashes'] += Hashes.query.filter(Hashes.id.in_(hash_ids)).filter(Hashes.cracked.is_(False)).filter(~exists().where(HashfileHashes.hash_id == Hashes.id)).delete(synchronize_session=False)
+            counts['hash_notifications'] += HashNotifications.query.filter(HashNotifications.hash_id.in_(hash_ids)).filter(~exists().where(Hashes.id == HashNotifications.hash_id)).delete(synchronize_session=False)
             db.session.commit()
+            keep_lock()
 
-            logger.debug("Job Name: %s  Owner ID: %s has been Deleted, it was associated with Hashfile ID: %s, Hashfile Name: %s", job.name, job.owner_id, hashfile.id, hashfile.name)
-
-        # Hashfiles, HashfileHashes and Hash notifications
-        logger.debug('Hashfile Name: %s    Owner ID: %s', hashfile.name, hashfile.owner_id)
-        logger.debug('Hashfile ID: %s', hashfile.id)
-        user = Users.query.get(hashfile.owner_id)
-        subject = f'Hashview removed an old Hashfile: {hashfile.name}'
+        HashfileSummaries.query.filter_by(hashfile_id=hashfile.id).delete(synchronize_session=False)
+        counts['hashfiles'] += Hashfiles.query.filter_by(id=hashfile.id).delete(synchronize_session=False)
+        db.session.commit()
+    logger.info('DataRetentionCleanup.Hashfiles removed %s hashfiles, %s hashfile hashes, %s hashes and %s hash notifications in %.2fs.', counts['hashfiles'], counts['hashfile_hashes'], counts['hashes'], counts['hash_notifications'], time.perf_counter() - started)
+
+    # One email per user listing everything that was removed
+    started = time.perf_counter()
+    users = Users.query.filter(Users.id.in_(list(removed))).all() if removed else []
+    for user in users:
+        items = '\n'.join('- ' + item for item in removed[user.id])
+        subject = 'Hashview removed old jobs and hashfiles'
         message = dedent(f'''\
             Hello {user.first_name},
 
-            In accordance to the data retention policy of {retention_period} days, your hashfile "{hashfile.name}" was removed.
-        ''')
+            In accordance to the data retention policy of {retention_period} days:
+        ''') + items + '\n'
         if (error := try_send_email_(user, subject, message)):
             logger.error(error)
-
-        hashfile_hashes = HashfileHashes.query.filter_by(hashfile_id = hashfile.id).all()
-        for hashfile_hash in hashfile_hashes:
-            hashes = Hashes.query.filter_by(id=hashfile_hash.hash_id).filter_by(cracked=0).all()
-            for hash in hashes:
-                # Check to see if our hashfile is the ONLY hashfile that has this hash
-                # if duplicates exist, they can still be removed. Once the hashfile_hash entry is remove,
-                # the total number of matching hash_id's will be reduced to < 2 and then can be deleted
-                hashfile_cnt = HashfileHashes.query.filter_by(hash_id=hash.id).distinct('hashfile_id').count()
-                if hashfile_cnt < 2:
-                    db.session.delete(hash)
-                    db.session.commit()
-                    HashNotifications.query.filter_by(hash_id=hashfile_hash.hash_id).delete()
-            db.session.delete(hashfile_hash)
-        db.session.delete(hashfile)
-        db.session.commit()
-
-        logger.debug("Hashfile ID: %s  Hashfile Name: %s has been Deleted", hashfile.id, hashfile.name)
+    logger.info('DataRetentionCleanup.Emails notified %s users in %.2fs.', len(users), time.perf_counter() - started)
 
     # Clean temp folder of files older than RETENTION PERIOD
+    started = time.perf_counter()
+    removed_files = 0
     tmp_directory = Path('hashview/control/tmp').resolve()
-    retention_limit = datetime.time() - retention_period * 86400
+    retention_limit = time.time() - retention_period * 86400
     for child in tmp_directory.iterdir():
         if '.gitignore' == child.name:
             logger.debug('DataRetentionCleanup.TempFile Progressing with StepResult(Ignored: %s).', child)
@@ -143,11 +221,13 @@ def _data_retention_cleanup_inner(db :SQLAlchemy, mailer :Mail, logger :Logger):
 
         if child.stat().st_mtime < retention_limit:
             child.unlink()
+            removed_files += 1
             logger.debug('DataRetentionCleanup.TempFile Progressing with StepResult(Removed: %s).', child)
             continue
 
         else:
             logger.debug('DataRetentionCleanup.TempFile Progressing with StepResult(LeftAlone: %s).', child)
+    logger.info('DataRetentionCleanup.TempFiles removed %s files in %.2fs.', removed_files, time.perf_counter() - started)
 
 
 def data_retention_cleanup(app :Flask):
@@ -161,10 +241,87 @@ def data_retention_cleanup(app :Flask):
 
             mailer = app.extensions['mail']
             logger = app.logger
-            _data_retention_cleanup_inner(db, mailer, logger)
+            renew_lock = partial(renew_worker_lock, db, 'DATA_RETENTION', RETENTION_LOCK_TTL)
+            _data_retention_cleanup_inner(db, mailer, logger, renew_lock)
 
         except:
             app.logger.exception('DataRetentionCleanup ScheduledJob is Complete with Result(Failure).')
 
         else:
             app.logger.info('DataRetentionCleanup ScheduledJob is Complete with Result(Success).')
+
+
+def dynamic_wordlist_refresh(app :Flask):
+    """ Function to fold recovered plaintexts into the dynamic wordlists before agents ask for them """
+    with app.app_context():
+        try:
+            app.logger.info('DynamicWordlistRefresh ScheduledJob Progressing.')
+
+            from hashview.models import db
+            from hashview.models import Wordlists
+            from hashview.utils.utils import update_dynamic_wordlist
+
+            for (wordlist_id,) in db.session.query(Wordlists.id).filter_by(type='dynamic').all():
+                update_dynamic_wordlist(wordlist_id)
+
+        except Exception:
+            app.logger.exception('DynamicWordlistRefresh ScheduledJob is Complete with Result(Failure).')
+
+        else:
+            app.logger.info('DynamicWordlistRefresh ScheduledJob is Complete with Result(Success).')
+
+
+def hashfile_summaries_refresh(app :Flask):
+    """ Function to rebuild every hashfile summary, correcting any drift of the incremental updates """
+    with app.app_context():
+        try:
+            app.logger.info('HashfileSummariesRefresh ScheduledJob Progressing.')
+
+            from hashview.analytics.summaries import refresh_hashfile_summaries
+            refresh_hashfile_summaries()
+
+        except Exception:
+            app.logger.exception('HashfileSummariesRefresh ScheduledJob is Complete with Result(Failure).')
+
+        else:
+            app.logger.info('HashfileSummariesRefresh ScheduledJob is Complete with Result(Success).')
+
+
+def hashfile_imports_run(app :Flask):
+    """ Function to validate and import queued hashfile uploads until none is left """
+    with app.app_context():
+        try:
+            from hashview.utils.hashfile_imports import claim_hashfile_import, fail_stale_hashfile_imports, run_hashfile_import
+
+            stale = fail_stale_hashfile_imports()
+            if stale:
+                app.logger.warning('HashfileImports ScheduledJob failed %s interrupted imports.', stale)
+
+            # imports are claimed one by one, so every worker of the cluster can take its share
+            hashfile_import = claim_hashfile_import()
+            while hashfile_import:
+                app.logger.info('HashfileImports ScheduledJob importing Upload ID: %s.', hashfile_import.id)
+                run_hashfile_import(hashfile_import)
+                hashfile_import = claim_hashfile_import()
+
+        except Exception:
+            app.logger.exception('HashfileImports ScheduledJob is Complete with Result(Failure).')
+
+
+# Jobs run by the worker: (id, function, trigger, seconds its lock is held at most or None for no cluster wide lock)
+WORKER_JOBS = (
+    ('DATA_RETENTION', data_retention_cleanup, {'trigger': 'cron', 'hour': '*'}, RETENTION_LOCK_TTL),
+    ('DYNAMIC_WORDLISTS', dynamic_wordlist_refresh, {'trigger': 'interval', 'minutes': 5}, 1800),
+    ('HASHFILE_SUMMARIES', hashfile_summaries_refresh, {'trigger': 'cron', 'hour': 3}, 6 * 3600),
+    ('HASHFILE_IMPORTS', hashfile_imports_run, {'trigger': 'interval', 'seconds': 5}, None),
+)
+
+
+def add_worker_jobs(app :Flask):
+    """ Function to schedule every worker job, guarded by its cluster wide lock when it has one """
+
+    scheduler.remove_all_jobs()
+    for name, func, trigger, ttl in WORKER_JOBS:
+        job = partial(run_locked_job, app, name, ttl, func) if ttl else partial(func, app)
+        # coalesce missed runs, and never run a job twice at the same time in this worker either
+        scheduler.add_job(id=name, func=job, coalesce=True, max_instances=1, **trigger)
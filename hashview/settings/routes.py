@@ -6,6 +6,7 @@ import hashview
 from hashview.settings.forms import HashviewSettingsForm
 from hashview.models import Settings
 from hashview.models import db
+from hashview.utils.utils import clear_settings_cache
 
 
 settings = Blueprint('settings', __name__)
@@ -34,6 +35,7 @@ def settings_list():
             settings.max_runtime_tasks = hashview_form.max_runtime_tasks.data
             settings.enabled_job_weights = hashview_form.enabled_job_weights.data
             db.session.commit()
+            clear_settings_cache()
             flash('Updated Hashview settings!', 'success')
             return redirect(url_for('settings.settings_list'))
         elif request.method == 'GET':
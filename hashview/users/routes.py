@@ -10,7 +10,7 @@ from flask_bcrypt import Bcrypt
 from hashview.models import db
 from hashview.models import Users, Jobs, Wordlists, Rules, TaskGroups, Tasks
 from hashview.users.forms import LoginForm, UsersForm, ProfileForm, RequestResetForm, ResetPasswordForm
-from hashview.utils.utils import send_email, send_pushover
+from hashview.utils.utils import clear_authorization_cache, send_email, send_pushover
 
 import uuid
 
@@ -115,6 +115,7 @@ def users_delete(user_id):
         user = Users.query.get_or_404(user_id)
         db.session.delete(user)
         db.session.commit()
+        clear_authorization_cache()
         flash('User has been deleted!', 'success')
         return redirect(url_for('users.users_list'))
     abort(403)
@@ -170,6 +171,7 @@ def generate_api_key():
     user = Users.query.get(current_user.id)
     user.api_key = str(uuid.uuid4())
     db.session.commit()
+    clear_authorization_cache()
     flash('New API Key Set', 'success')
     return redirect(url_for('users.profile'))
 
@@ -0,0 +1,108 @@
+"""Write-behind buffer for agent liveness and hashcat status"""
+import atexit
+import time
+import threading
+from sqlalchemy import bindparam
+from sqlalchemy.orm.attributes import set_committed_value
+from flask import current_app
+from hashview.models import db
+from hashview.models import Agents
+
+# Seconds between two flushes of the buffer to the agents table
+AGENT_STATUS_FLUSH_INTERVAL = 5
+
+# Columns that go through the buffer, everything else on Agents is written directly
+BUFFERED_COLUMNS = ('src_ip', 'last_checkin', 'hc_status', 'benchmark')
+
+_buffer = {}
+_buffer_lock = threading.Lock()
+_flusher = None
+
+
+def buffer_agent_status(uuid, **values):
+    """Function to record the latest liveness/status values of an agent, written to the db on the next flush"""
+
+    with _buffer_lock:
+        _buffer.setdefault(uuid, {}).update(values)
+    _start_flusher()
+
+def get_buffered_agent_status(uuid):
+    """Function to return the values buffered for an agent that have not been flushed yet"""
+
+    with _buffer_lock:
+        return dict(_buffer.get(uuid, {}))
+
+def overlay_agent_status(agents):
+    """Function to apply buffered values to loaded Agents without marking them dirty"""
+
+    with _buffer_lock:
+        pending = {uuid: dict(values) for uuid, values in _buffer.items()}
+    for agent in agents:
+        for column, value in pending.get(agent.uuid, {}).items():
+            set_committed_value(agent, column, value)
+    return agents
+
+def flush_agent_status():
+    """Function to write all buffered values to the agents table, one executemany per set of columns"""
+
+    with _buffer_lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return 0
+
+    groups = {}
+    for uuid, values in pending.items():
+        columns = tuple(sorted(values))
+        groups.setdefault(columns, []).append(dict(values, b_uuid=uuid))
+
+    agents_table = Agents.__table__
+    try:
+        for columns, params in groups.items():
+            statement = agents_table.update().where(agents_table.c.uuid == bindparam('b_uuid')).values({column: bindparam(column) for column in columns})
+            db.session.execute(statement, params)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # put the values back unless something newer arrived in the meantime
+        with _buffer_lock:
+            for uuid, values in pending.items():
+                _buffer[uuid] = dict(values, **_buffer.get(uuid, {}))
+        raise
+    return len(pending)
+
+def _start_flusher():
+    """Function to start the background flush thread of this process (once)"""
+
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    app = current_app._get_current_object()
+    with _buffer_lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_flush_loop, args=(app,), name='agent-status-flusher', daemon=True)
+        _flusher.start()
+        atexit.register(_flush_at_exit, app)
+
+def _flush_loop(app):
+    """Function run by the flush thread"""
+
+    while True:
+        time.sleep(AGENT_STATUS_FLUSH_INTERVAL)
+        with app.app_context():
+            try:
+                flush_agent_status()
+            except Exception:
+                app.logger.exception('Failed to flush buffered agent status.')
+            finally:
+                db.session.remove()
+
+def _flush_at_exit(app):
+    """Function to write whatever is still buffered when the process exits"""
+
+    with app.app_context():
+        try:
+            flush_agent_status()
+        except Exception:
+            app.logger.exception('Failed to flush buffered agent status on exit.')
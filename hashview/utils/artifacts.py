@@ -0,0 +1,99 @@
+"""Compressed artifact cache for wordlist and rule downloads"""
+import os
+import re
+import gzip
+import shutil
+import fcntl
+import threading
+from flask import current_app
+
+# Only names hashview itself generates (see save_file) are ever served
+ARTIFACT_NAME_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+ARTIFACT_EXTENSIONS = ('.rule', '.txt')
+CHECKSUM_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Serializes builds between threads, flock() below takes care of other worker processes
+_build_lock = threading.Lock()
+
+
+def get_cache_dir():
+    """Function to return (and create) the artifact cache directory"""
+
+    cache_dir = os.path.join(current_app.root_path, 'control', 'cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def is_valid_artifact_name(name):
+    """Function to validate a wordlist or rules file name before it is touched on disk"""
+
+    return bool(ARTIFACT_NAME_RE.match(name)) and name.endswith(ARTIFACT_EXTENSIONS)
+
+def get_compressed_artifact(source_path, checksum):
+    """Function to return the path of a gzip copy of source_path, building it once per checksum"""
+
+    if not CHECKSUM_RE.match(checksum or ''):
+        raise ValueError('Invalid checksum: ' + str(checksum))
+
+    cache_dir = get_cache_dir()
+    artifact_path = os.path.join(cache_dir, checksum + '.gz')
+
+    if not os.path.exists(artifact_path):
+        with _build_lock, open(os.path.join(cache_dir, checksum + '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another worker may have finished the build while we were waiting on the lock
+                if not os.path.exists(artifact_path):
+                    _build_artifact(source_path, artifact_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        evict_artifacts(keep=artifact_path)
+    else:
+        # Bump mtime so eviction is least recently used rather than least recently built
+        os.utime(artifact_path)
+
+    return artifact_path
+
+def _build_artifact(source_path, artifact_path):
+    """Function to gzip source_path into artifact_path atomically"""
+
+    tmp_path = artifact_path + '.' + str(os.getpid()) + '.tmp'
+    start_size = os.path.getsize(source_path)
+    current_app.logger.info('Building compressed artifact for %s (%s bytes).', source_path, start_size)
+    try:
+        # No name and no mtime in the gzip header, a rebuilt artifact is byte identical so resumed downloads still match
+        with open(source_path, 'rb') as source, open(tmp_path, 'wb') as tmp_file, gzip.GzipFile(filename='', fileobj=tmp_file, mode='wb', compresslevel=9, mtime=0) as destination:
+            shutil.copyfileobj(source, destination, 1024 * 1024)
+        os.replace(tmp_path, artifact_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def evict_artifacts(keep=None):
+    """Function to remove least recently used artifacts until the cache fits ARTIFACT_CACHE_MAX_BYTES"""
+
+    max_bytes = current_app.config.get('ARTIFACT_CACHE_MAX_BYTES')
+    if not max_bytes:
+        return
+
+    cache_dir = get_cache_dir()
+    artifacts = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.gz'):
+            stat = entry.stat()
+            artifacts.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in artifacts)
+    for _, size, path in sorted(artifacts):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            lock_path = path[:-len('.gz')] + '.lock'
+            if os.path.exists(lock_path):
+                os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        current_app.logger.info('Evicted compressed artifact %s (%s bytes).', path, size)
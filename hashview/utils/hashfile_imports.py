@@ -0,0 +1,126 @@
+"""Background validation and import of uploaded hashfiles, run by the worker and polled by the job pages"""
+import os
+from datetime import datetime
+from datetime import timedelta
+from functools import partial
+from sqlalchemy import exists
+from flask import current_app
+from hashview.models import db
+from hashview.models import HashfileImports, Hashfiles, HashfileHashes, Hashes, Jobs
+from hashview.analytics.summaries import delete_hashfile_summary
+from hashview.utils.utils import validate_and_import_hashfilehashes
+
+# Seconds without progress after which a validating/importing upload is considered abandoned by its worker
+HASHFILE_IMPORT_STALE_SECONDS = 1800
+
+# Number of queued imports looked at per claim attempt
+HASHFILE_IMPORT_CLAIM_BATCH = 10
+
+# Number of rows deleted per statement (and committed at a time) when a failed import is discarded
+HASHFILE_IMPORT_DELETE_BATCH = 5000
+
+
+def queue_hashfile_import(job, name, path, file_type, hash_type, owner_id):
+    """Function to record an uploaded hashfile for import by the worker"""
+
+    hashfile_import = HashfileImports(job_id=job.id, customer_id=job.customer_id, owner_id=owner_id, name=name, path=path, file_type=file_type, hash_type=int(hash_type), status='queued')
+    db.session.add(hashfile_import)
+    db.session.commit()
+    return hashfile_import
+
+def claim_hashfile_import():
+    """Function to claim the oldest queued import for this worker, returns None when there is nothing to do"""
+
+    candidates = db.session.query(HashfileImports.id).filter_by(status='queued').order_by(HashfileImports.id).limit(HASHFILE_IMPORT_CLAIM_BATCH).all()
+    for (import_id,) in candidates:
+        # Only one worker gets to move an import out of queued
+        claimed = HashfileImports.query.filter_by(id=import_id, status='queued').update({'status': 'validating', 'updated_at': datetime.now().replace(microsecond=0)}, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return HashfileImports.query.get(import_id)
+    return None
+
+def run_hashfile_import(hashfile_import):
+    """Function to validate and import a claimed upload, recording its progress on the way"""
+
+    try:
+        # the web process saved the upload, a worker on other storage cannot see it
+        if not os.path.exists(hashfile_import.path):
+            current_app.logger.error('Upload ID: %s not found at %s, the worker needs the same hashview/control storage as the web server.', hashfile_import.id, hashfile_import.path)
+            _fail_hashfile_import(hashfile_import, 'The uploaded hashfile could not be found by the worker. Check that the worker shares hashview/control with the web server.')
+            return False
+
+        hashfile = Hashfiles(name=hashfile_import.name, customer_id=hashfile_import.customer_id, owner_id=hashfile_import.owner_id)
+        db.session.add(hashfile)
+        db.session.flush()
+        hashfile_import.hashfile_id = hashfile.id
+        hashfile_import.status = 'importing'
+        hashfile_import.updated_at = datetime.now().replace(microsecond=0)
+        db.session.commit()
+
+        # Validate and parse the hashfile in the same pass, the file is read only once
+        has_problem = validate_and_import_hashfilehashes(hashfile_id=hashfile.id, hashfile_path=hashfile_import.path, file_type=hashfile_import.file_type, hash_type=str(hashfile_import.hash_type), progress=partial(_record_progress, hashfile_import))
+        if has_problem:
+            _fail_hashfile_import(hashfile_import, has_problem)
+            return False
+
+        job = Jobs.query.get(hashfile_import.job_id)
+        if job:
+            job.hashfile_id = hashfile.id
+        hashfile_import.status = 'done'
+        hashfile_import.updated_at = datetime.now().replace(microsecond=0)
+        db.session.commit()
+        return True
+
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Import of Hashfile Upload ID: %s failed.', hashfile_import.id)
+        _fail_hashfile_import(hashfile_import, 'Something went wrong while importing the hashfile. Check the logs and try again.')
+        return False
+
+    finally:
+        # the upload is not needed anymore once it was imported (or rejected)
+        if os.path.exists(hashfile_import.path):
+            os.remove(hashfile_import.path)
+
+def fail_stale_hashfile_imports():
+    """Function to fail imports whose worker stopped reporting progress, returns how many were failed"""
+
+    stale_before = datetime.now() - timedelta(seconds=HASHFILE_IMPORT_STALE_SECONDS)
+    stale = HashfileImports.query.filter(HashfileImports.status.in_(('validating', 'importing'))).filter(HashfileImports.updated_at < stale_before).all()
+    for hashfile_import in stale:
+        _fail_hashfile_import(hashfile_import, 'The import was interrupted. Please upload the hashfile again.')
+        if os.path.exists(hashfile_import.path):
+            os.remove(hashfile_import.path)
+    return len(stale)
+
+def _record_progress(hashfile_import, import_summary, elapsed):
+    """Function to record how far an import is and how many hashes were already known/cracked, called after every committed chunk"""
+
+    hashfile_import.rows_processed = import_summary.total
+    hashfile_import.rows_per_second = int(import_summary.total / max(elapsed, 1e-6))
+    hashfile_import.hashes_known = import_summary.known
+    hashfile_import.hashes_cracked = import_summary.cracked
+    hashfile_import.updated_at = datetime.now().replace(microsecond=0)
+    db.session.commit()
+
+def _fail_hashfile_import(hashfile_import, error):
+    """Function to mark an import as failed and drop whatever part of its hashfile was imported"""
+
+    if hashfile_import.hashfile_id:
+        while True:
+            rows = db.session.query(HashfileHashes.id, HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id == hashfile_import.hashfile_id).limit(HASHFILE_IMPORT_DELETE_BATCH).all()
+            if not rows:
+                break
+            hash_ids = list({row.hash_id for row in rows})
+            HashfileHashes.query.filter(HashfileHashes.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+            # Only the hashes of this hashfile that nothing else references anymore, cracked hashes are kept
+            Hashes.query.filter(Hashes.id.in_(hash_ids)).filter(Hashes.cracked.is_(False)).filter(~exists().where(HashfileHashes.hash_id == Hashes.id)).delete(synchronize_session=False)
+            db.session.commit()
+        Hashfiles.query.filter_by(id=hashfile_import.hashfile_id).delete(synchronize_session=False)
+        delete_hashfile_summary(hashfile_import.hashfile_id)
+        hashfile_import.hashfile_id = None
+    hashfile_import.status = 'failed'
+    hashfile_import.error = error[:1024]
+    hashfile_import.updated_at = datetime.now().replace(microsecond=0)
+    db.session.commit()
@@ -0,0 +1,213 @@
+"""Parsing of hashfile lines into (hash_type, sub_ciphertext, ciphertext, username_hex) rows
+
+Files are parsed in the importing process. When PARALLEL_PARSE_PROCESSES is configured, large files
+are split at newline boundaries into byte ranges that a pool of processes parses (and validates) in
+parallel, the importing process stays the single writer and receives the parsed rows in file order.
+Off by default: tests/benchmarks/hashfile_parsing.py measured the pool slower than serial parsing.
+"""
+import io
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import _md5
+from flask import current_app
+from hashview.utils.validation import FILE_TYPE_RULES, HashfileValidator
+
+# Hashfiles larger than this are parsed by a pool of processes, when PARALLEL_PARSE_PROCESSES is set
+PARALLEL_PARSE_MIN_BYTES = 64 * 1024 * 1024
+
+# Size of the byte range parsed by one process at a time
+PARALLEL_PARSE_RANGE_BYTES = 8 * 1024 * 1024
+
+
+def parse_hashfile_line(line, file_type, hash_type):
+    """Function to parse a single hashfile line
+
+    Returns a (ciphertext, hash_type, username) tuple, or None when the line
+    should be skipped (blank lines, machine accounts). Raises ValueError when
+    the line does not match the selected file type.
+    """
+
+    if not line.strip():
+        return None
+
+    username = None
+    try:
+        if file_type == 'hash_only':
+            # forcing lower casing of hash as hashcat will return lower cased version of the has and we want to match what we imported.
+            if hash_type == '2100':
+                line = line.lower().rstrip()
+                line = line.replace('$dcc2$', '$DCC2$')
+                # extract username from dcc2 hash
+                username = line.split('#')[1]
+            ciphertext = line.rstrip()
+        elif file_type == 'user_hash':
+            if ':' not in line:
+                raise ValueError('user:hash line is missing a : character')
+            if hash_type == '2100':
+                line = line.split(':',1)[1].rstrip()
+                line = line.lower()
+                line = line.replace('$dcc2$', '$DCC2$')
+                ciphertext = line
+            else:
+                ciphertext = line.split(':',1)[1].rstrip()
+            username = line.split(':')[0]
+        elif file_type == 'shadow':
+            ciphertext = line.split(':')[1]
+            username = line.split(':')[0]
+        elif file_type == 'pwdump':
+            # do we let user select LM so that we crack those instead of NTLM?
+            # First extracting usernames so we can filter out machine accounts
+            if re.search(r"\$$", line.split(':')[0]):
+                return None
+            ciphertext = line.split(':')[3].lower()
+            hash_type = '1000'
+            username = line.split(':')[0]
+        elif file_type == 'kerberos':
+            ciphertext = line.lower().rstrip()
+            if hash_type == '18200':
+                username = line.split('$')[3].split(':')[0]
+            else:
+                username = line.split('$')[3]
+        elif file_type == 'NetNTLM':
+            # First extracting usernames so we can filter out machine accounts
+            # 5600, domain is case sensitve. Hashcat returns username in upper case.
+            if re.search(r"\$$", line.split(':')[0]):
+                return None
+            line_list = line.split(':')
+            # uppercase the username in line
+            line_list[0] = line_list[0].upper()
+            # lowercase the rest (except domain name) 3,4,5
+            line_list[3] = line_list[3].lower()
+            line_list[4] = line_list[4].lower()
+            line_list[5] = line_list[5].lower()
+            line = ':'.join(line_list)
+            ciphertext = line.rstrip()
+            username = line.split(':', maxsplit=1)[0]
+        else:
+            raise ValueError('Unsupported file type: ' + str(file_type))
+    except IndexError as error:
+        raise ValueError('Line does not match file type: ' + str(file_type)) from error
+
+    # Hashes are always stored stripped and lower cased, this is what the crack upload matches against.
+    return ciphertext.strip().lower(), hash_type, username
+
+def key_hashfile_row(ciphertext, hash_type, username):
+    """Function to turn a parsed line into the (hash_type, sub_ciphertext, ciphertext, username_hex) row written to the db"""
+
+    return (int(hash_type), _md5.md5(ciphertext.encode('utf-8')).digest(), ciphertext, username.encode('latin-1').hex() if username is not None else None)
+
+def parse_hashfile_lines(lines, file_type, hash_type, validate=False, batch_size=5000):
+    """Function to yield batches of rows parsed (and validated) from lines, raises ValueError on the first bad line"""
+
+    validator = HashfileValidator(file_type, hash_type) if validate else None
+    batch = []
+    for line_number, line in enumerate(lines, 1):
+        if validator:
+            error = validator.check(line_number, line)
+            if error:
+                raise ValueError(error)
+        parsed = parse_hashfile_line(line, file_type, hash_type)
+        if parsed is None:
+            continue
+        batch.append(key_hashfile_row(*parsed))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def use_parallel_parsing(hashfile_path, file_type, validate=False):
+    """Function to tell whether a hashfile is worth parsing with a pool of processes"""
+
+    # rules like NetNTLM duplicate usernames need to see the whole file in one place
+    if validate and any(check == 'unique' for check, _, _ in FILE_TYPE_RULES.get(file_type, ())):
+        return False
+    return _parse_processes() > 1 and os.path.getsize(hashfile_path) >= PARALLEL_PARSE_MIN_BYTES
+
+def split_hashfile(hashfile_path, range_bytes=None):
+    """Function to split a hashfile into (start, end) byte ranges that begin right after a newline"""
+
+    range_bytes = range_bytes or PARALLEL_PARSE_RANGE_BYTES
+    size = os.path.getsize(hashfile_path)
+    ranges = []
+    start = 0
+    with open(hashfile_path, 'rb') as file:
+        while start < size:
+            file.seek(min(start + range_bytes, size))
+            # move the end of the range to the end of the line it falls in
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def parse_hashfile_range(hashfile_path, start, end, file_type, hash_type, validate=False):
+    """Function to parse one byte range in a pool process, returns (rows, lines read, first bad line or None)"""
+
+    with open(hashfile_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    validator = HashfileValidator(file_type, hash_type) if validate else None
+    rows = []
+    line_number = 0
+    # same decoding and newline handling as open(hashfile_path, 'r')
+    for line_number, line in enumerate(io.TextIOWrapper(io.BytesIO(data)), 1):
+        try:
+            if validator and validator.check(line_number, line):
+                return rows, line_number, line
+            parsed = parse_hashfile_line(line, file_type, hash_type)
+        except ValueError:
+            return rows, line_number, line
+        if parsed is not None:
+            rows.append(key_hashfile_row(*parsed))
+    return rows, line_number, None
+
+def parse_hashfile_parallel(hashfile_path, file_type, hash_type, validate=False, processes=None, range_bytes=None):
+    """Function to yield the rows of every byte range in file order, parsed by a pool of processes
+
+    Raises ValueError with the error of the first bad line, numbered across the whole file.
+    """
+
+    processes = processes or _parse_processes()
+    ranges = iter(split_hashfile(hashfile_path, range_bytes))
+    validator = HashfileValidator(file_type, hash_type) if validate else None
+    lines_before = 0
+
+    # spawned processes do not inherit the db connections or scheduler threads of this one
+    executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+    pending = deque()
+    try:
+        # keep a bounded number of ranges in flight so parsed rows never pile up faster than they are written
+        for start, end in ranges:
+            pending.append(executor.submit(parse_hashfile_range, hashfile_path, start, end, file_type, hash_type, validate))
+            if len(pending) >= processes * 2:
+                break
+
+        while pending:
+            rows, line_count, bad_line = pending.popleft().result()
+            if bad_line is not None:
+                line_number = lines_before + line_count
+                error = validator.check(line_number, bad_line) if validator else None
+                if error:
+                    raise ValueError(error)
+                # raises the parse error of the line
+                parse_hashfile_line(bad_line, file_type, hash_type)
+            lines_before += line_count
+
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append(executor.submit(parse_hashfile_range, hashfile_path, *next_range, file_type, hash_type, validate))
+            yield rows
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+def _parse_processes():
+    """Function to return the configured number of parsing processes, 0 when parallel parsing is off"""
+
+    return current_app.config.get('PARALLEL_PARSE_PROCESSES', 0)
@@ -2,13 +2,24 @@
 import os
 import secrets
 import hashlib
-import re
+import time
+import fcntl
+import sqlite3
+import zlib
 from datetime import datetime
+from types import SimpleNamespace
 import _md5
 from flask import current_app, url_for
 import requests
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
 from hashview.models import db
-from hashview.models import Rules, Wordlists, Hashfiles, HashfileHashes, Hashes, Tasks, Jobs, JobTasks, JobNotifications, Users, Agents
+from hashview.models import Settings, Rules, Wordlists, Hashfiles, HashfileHashes, Hashes, Tasks, Jobs, JobTasks, JobNotifications, Users, Agents
+from hashview.analytics.summaries import HashfileImportSummary, record_cracked_hashes, store_hashfile_summary
+from hashview.utils.validation import check_lines
+from hashview.utils.agent_status import buffer_agent_status
+from hashview.utils.hashfile_parsing import parse_hashfile_lines, parse_hashfile_parallel, use_parallel_parsing
+from hashview.utils.hashfile_parsing import parse_hashfile_line  # noqa: F401 (moved, still importable from here)
 from flask_mail import Message
 
 
@@ -46,6 +57,26 @@ def get_filehash(filepath):
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
 
+def stream_lines(lines, use_gzip=False, batch_size=5000):
+    """Function to turn lines into utf-8 chunks of batch_size lines, gzip compressed if asked, for a streamed response"""
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            chunk = ''.join(batch).encode('utf-8')
+            batch = []
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = ''.join(batch).encode('utf-8')
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
 def send_email(user, subject, message):
     """Function to send email"""
 
@@ -93,137 +124,339 @@ def send_pushover(user, subject, message):
     return
 
 def get_md5_hash(string):
-    """Function to get md5 hash of string"""
+    """Function to get the md5 digest (16 raw bytes) of string, the key hashes are looked up by"""
 
     m = _md5.md5(string.encode('utf-8'))
-    return m.hexdigest()
+    return m.digest()
+
+# Number of hashfile lines parsed, looked up and written per transaction
+IMPORT_CHUNK_SIZE = 5000
+
+# Max number of bind parameters we hand to a single IN (...) lookup
+LOOKUP_CHUNK_SIZE = 900
+
+# Number of times a chunk is looked up again when a concurrent import inserted the same new hashes
+IMPORT_CHUNK_ATTEMPTS = 3
+
+# Number of queued job tasks an agent tries to claim before looking again
+JOB_TASK_CLAIM_CANDIDATES = 10
+
+# Seconds get_cached_settings() serves settings without going back to the db
+SETTINGS_CACHE_TTL = 30
+_settings_cache = {'settings': None, 'expires': 0}
+
+# Seconds a successful /v1 authorization is trusted before the db is asked again
+AUTHORIZATION_CACHE_TTL = 30
+_authorization_cache = {}
+
+# Number of cracked plaintexts fetched at a time when a dynamic wordlist is rebuilt
+DYNAMIC_WORDLIST_BATCH_SIZE = 10000
+
+def lookup_hashes(keys):
+    """Function to resolve (hash_type, sub_ciphertext) keys to existing (id, cracked, plaintext) with set based lookups"""
+
+    subs_by_type = {}
+    for hash_type, sub_ciphertext in keys:
+        subs_by_type.setdefault(int(hash_type), []).append(sub_ciphertext)
+
+    hashes = {}
+    for hash_type, subs in subs_by_type.items():
+        for offset in range(0, len(subs), LOOKUP_CHUNK_SIZE):
+            results = db.session.query(Hashes.id, Hashes.sub_ciphertext, Hashes.cracked, Hashes.plaintext).filter(Hashes.hash_type == hash_type).filter(Hashes.sub_ciphertext.in_(subs[offset:offset + LOOKUP_CHUNK_SIZE]))
+            for hash_id, sub_ciphertext, cracked, plaintext in results:
+                hashes[(hash_type, sub_ciphertext)] = (hash_id, cracked, plaintext)
+    return hashes
+
+def _import_hashfile_chunk(hashfile_id, rows, import_summary):
+    """Function to write one chunk of parsed (hash_type, sub_ciphertext, ciphertext, username_hex) rows in a single transaction"""
+
+    ciphertexts = {}
+    for hash_type, sub_ciphertext, ciphertext, _ in rows:
+        ciphertexts.setdefault((hash_type, sub_ciphertext), ciphertext)
+
+    for attempt in range(1, IMPORT_CHUNK_ATTEMPTS + 1):
+        # the lookup that finds existing hashes also tells which ones are already cracked
+        hashes = lookup_hashes(ciphertexts.keys())
+
+        missing = [key for key in ciphertexts if key not in hashes]
+        if not missing:
+            break
+        try:
+            db.session.execute(Hashes.__table__.insert(), [
+                {'hash_type': hash_type, 'sub_ciphertext': sub_ciphertext, 'ciphertext': ciphertexts[(hash_type, sub_ciphertext)], 'cracked': False}
+                for hash_type, sub_ciphertext in missing
+            ])
+        except IntegrityError:
+            # another import inserted some of these hashes since the lookup, look them up again
+            db.session.rollback()
+            if attempt == IMPORT_CHUNK_ATTEMPTS:
+                raise
+            continue
+        inserted = lookup_hashes(missing)
+        import_summary.add_inserted(hash_id for hash_id, _, _ in inserted.values())
+        hashes.update(inserted)
+        break
+
+    imported = []
+    for hash_type, sub_ciphertext, _, username_hex in rows:
+        hash_id, cracked, plaintext = hashes[(hash_type, sub_ciphertext)]
+        imported.append((hash_id, hash_type, cracked, plaintext, username_hex))
+
+    db.session.execute(HashfileHashes.__table__.insert(), [
+        {'hash_id': hash_id, 'username': username_hex, 'hashfile_id': hashfile_id}
+        for hash_id, _, _, _, username_hex in imported
+    ])
+    import_summary.add_rows(imported)
+    db.session.commit()
 
-def import_hash_only(line, hash_type):
-    """Function to import single hash"""
+def import_hashfilehashes(hashfile_id, hashfile_path, file_type, hash_type, progress=None):
+    """Function to import a hashfile in chunks
 
-    line = line.strip().lower()
+    progress, when given, is called with (HashfileImportSummary, seconds elapsed) after every committed chunk.
+    """
 
-    hash = Hashes.query.filter_by(hash_type=hash_type, sub_ciphertext=get_md5_hash(line)).first()
+    try:
+        _import_hashfile_lines(hashfile_id, hashfile_path, file_type, hash_type, progress)
+    except ValueError:
+        db.session.rollback()
+        return False
+    return True
 
-    if hash:
-        return hash.id
+def validate_and_import_hashfilehashes(hashfile_id, hashfile_path, file_type, hash_type, progress=None):
+    """Function to validate and import a hashfile in a single read, returns the first error or False
 
-    new_hash = Hashes(hash_type=hash_type, sub_ciphertext=get_md5_hash(line), ciphertext=line, cracked=0)
-    db.session.add(new_hash)
-    db.session.commit()
-    return new_hash.id
+    Chunks before the first invalid line are already committed, the caller drops the hashfile on error.
+    """
 
-def import_hashfilehashes(hashfile_id, hashfile_path, file_type, hash_type):
-    """Function to hashfile"""
+    try:
+        _import_hashfile_lines(hashfile_id, hashfile_path, file_type, hash_type, progress, validate=True)
+    except ValueError as error:
+        db.session.rollback()
+        return str(error)
+    return False
 
-    # Open file
-    file = open(hashfile_path, 'r')
-    lines = file.readlines()
+def _import_hashfile_lines(hashfile_id, hashfile_path, file_type, hash_type, progress=None, validate=False):
+    """Function to parse (and validate) the lines of a hashfile and write them in chunks, raises ValueError on a bad line"""
 
-    # for line in file,
-    for line in lines:
-        # If line is empty:
-        if len(line) > 0:
-            if file_type == 'hash_only':
-                # forcing lower casing of hash as hashcat will return lower cased version of the has and we want to match what we imported.
-                if hash_type in ('300', '1731'):
-                    hash_id = import_hash_only(line=line.lower().rstrip(), hash_type=hash_type)
-                elif hash_type == '2100':
-                    line = line.lower().rstrip()
-                    line = line.replace('$dcc2$', '$DCC2$')
-                    hash_id = import_hash_only(line, hash_type)
-                else:
-                    hash_id = import_hash_only(line=line.rstrip(), hash_type=hash_type)
-                # extract username from dcc2 hash
-                if hash_type == '2100':
-                    username = line.split('#')[1]
-                else:
-                    username = None
-            elif file_type == 'user_hash':
-                if ':' in line:
-                    if hash_type in ('300', '1731'):
-                        hash_id = import_hash_only(line=line.lower().rstrip(), hash_type=hash_type)
-                    if hash_type == '2100':
-                        line = line.split(':',1)[1].rstrip()
-                        line = line.lower()
-                        line = line.replace('$dcc2$', '$DCC2$')
-                        hash_id = import_hash_only(line, hash_type)
-                        username = line.split(':')[0]
-                    else:
-                        hash_id = import_hash_only(line=line.split(':',1)[1].rstrip(), hash_type=hash_type)
-                        username = line.split(':')[0]
-                else:
-                    return False
-            elif file_type == 'shadow':
-                hash_id= import_hash_only(line=line.split(':')[1], hash_type=hash_type)
-                username = line.split(':')[0]
-            elif file_type == 'pwdump':
-                # do we let user select LM so that we crack those instead of NTLM?
-                # First extracting usernames so we can filter out machine accounts
-                if re.search("\$$", line.split(':')[0]):
-                #if '$' in line.split(':')[0]:
-                    continue
-                else:
-                    hash_id = import_hash_only(line=line.split(':')[3].lower(), hash_type='1000')
-                    username = line.split(':')[0]
-            elif file_type == 'kerberos':
-                hash_id = import_hash_only(line=line.lower().rstrip(), hash_type=hash_type)
-                if hash_type == '18200':
-                    username = line.split('$')[3].split(':')[0]
-                else:
-                    username = line.split('$')[3]
-            elif file_type == 'NetNTLM':
-                # First extracting usernames so we can filter out machine accounts
-                # 5600, domain is case sensitve. Hashcat returns username in upper case.
-                if re.search("\$$", line.split(':')[0]):
-                #if '$' in line.split(':')[0]:
-                    continue
-                else:
-                    # uppercase uesrname in line
-                    line_list = line.split(':')
-                    # uppercase the username in line
-                    line_list[0] = line_list[0].upper()
-                    # lowercase the rest (except domain name) 3,4,5
-                    line_list[3] = line_list[3].lower()
-                    line_list[4] = line_list[4].lower()
-                    line_list[5] = line_list[5].lower()
-                    line = ':'.join(line_list)
-                    hash_id = import_hash_only(line=line.rstrip(), hash_type=hash_type)
-                    username = line.split(':', maxsplit=1)[0]
-            else:
-                return False
-            if username is None:
-                hashfilehashes = HashfileHashes(hash_id=hash_id, hashfile_id=hashfile_id)
+    started_at = time.perf_counter()
+    import_summary = HashfileImportSummary()
+
+    with open(hashfile_path) as file:
+        # Very large files are parsed by a pool of processes, this process stays the only writer
+        if use_parallel_parsing(hashfile_path, file_type, validate):
+            batches = parse_hashfile_parallel(hashfile_path, file_type, hash_type, validate)
+        else:
+            batches = parse_hashfile_lines(file, file_type, hash_type, validate, IMPORT_CHUNK_SIZE)
+        for batch in batches:
+            for offset in range(0, len(batch), IMPORT_CHUNK_SIZE):
+                _import_hashfile_chunk(hashfile_id, batch[offset:offset + IMPORT_CHUNK_SIZE], import_summary)
+                if progress:
+                    progress(import_summary, time.perf_counter() - started_at)
+
+    # the summary was built from the imported rows, no need to read the hashfile back
+    store_hashfile_summary(hashfile_id, import_summary)
+    db.session.commit()
+
+    elapsed = max(time.perf_counter() - started_at, 1e-6)
+    current_app.logger.info('Imported %s hashes (%s already known, %s already cracked) into Hashfile ID: %s in %.2fs (%.0f rows/s).', import_summary.total, import_summary.known, import_summary.cracked, hashfile_id, elapsed, import_summary.total / elapsed)
+    return import_summary
+
+def import_cracked_hashes(hash_type, crack_file_contents):
+    """Function to mark hashes as cracked from the contents of a hashcat outfile (hash:hex_plaintext)
+
+    Returns a dict with the number of newly cracked, already cracked and unmatched entries.
+    """
+
+    plaintexts = {}
+    for entry in crack_file_contents.split('\n'):
+        if ':' in entry:
+            elements = entry.split(':')
+            plaintext = elements.pop().rstrip().upper()
+            ciphertext = ':'.join(elements)
+            plaintexts[get_md5_hash(ciphertext)] = plaintext
+
+    counts = {'new': 0, 'already_cracked': 0, 'unmatched': 0}
+    recovered = set()
+    new_hash_ids = set()
+    # Sorted so concurrent uploads lock the same hashes in the same order
+    sub_ciphertexts = sorted(plaintexts)
+    for offset in range(0, len(sub_ciphertexts), LOOKUP_CHUNK_SIZE):
+        chunk = sub_ciphertexts[offset:offset + LOOKUP_CHUNK_SIZE]
+        uncracked = {}
+        cracked_subs = set()
+        # Locked until the commit, an upload of the same cracks waits and then sees them as already cracked
+        results = db.session.query(Hashes.id, Hashes.sub_ciphertext, Hashes.cracked).filter(Hashes.hash_type == hash_type).filter(Hashes.sub_ciphertext.in_(chunk)).order_by(Hashes.sub_ciphertext).with_for_update()
+        for hash_id, sub_ciphertext, cracked in results:
+            if cracked:
+                cracked_subs.add(sub_ciphertext)
             else:
-                hashfilehashes = HashfileHashes(hash_id=hash_id, username=username.encode('latin-1').hex(), hashfile_id=hashfile_id)
-            db.session.add(hashfilehashes)
-            db.session.commit()
+                uncracked[hash_id] = sub_ciphertext
+
+        new_subs = set(uncracked.values())
+        counts['new'] += len(new_subs)
+        counts['already_cracked'] += len(cracked_subs - new_subs)
+        counts['unmatched'] += len(chunk) - len(new_subs | cracked_subs)
+
+        if uncracked:
+            # One UPDATE per chunk, the CASE maps every hash id to its own plaintext
+            db.session.query(Hashes).filter(Hashes.id.in_(uncracked)).filter(Hashes.cracked.is_(False)).update({
+                Hashes.plaintext: case({hash_id: plaintexts[sub_ciphertext] for hash_id, sub_ciphertext in uncracked.items()}, value=Hashes.id),
+                Hashes.cracked: True,
+            }, synchronize_session=False)
+            recovered.update(plaintexts[sub_ciphertext] for sub_ciphertext in new_subs)
+            new_hash_ids.update(uncracked)
+    record_cracked_hashes(new_hash_ids)
+    db.session.commit()
+    queue_dynamic_wordlist_plaintexts(recovered)
+    return counts
 
-    return True
+def queue_dynamic_wordlist_plaintexts(plaintexts):
+    """Function to queue newly recovered plaintexts (hex) for inclusion in the dynamic wordlists"""
+
+    if not plaintexts:
+        return
+    data = ''.join(plaintext + '\n' for plaintext in plaintexts)
+    for (path,) in db.session.query(Wordlists.path).filter_by(type='dynamic'):
+        with open(path + '.pending', 'a') as journal:
+            fcntl.flock(journal, fcntl.LOCK_EX)
+            journal.write(data)
+
+def _read_dynamic_wordlist_journal(path):
+    """Function to return the queued plaintexts of a dynamic wordlist and the journal length they cover"""
+
+    if not os.path.exists(path + '.pending'):
+        return [], 0
+    with open(path + '.pending', 'rb') as journal:
+        fcntl.flock(journal, fcntl.LOCK_SH)
+        data = journal.read()
+    # ignore a trailing line that is still being written
+    data = data[:data.rfind(b'\n') + 1]
+    return data.split(), len(data)
+
+def _trim_dynamic_wordlist_journal(path, consumed):
+    """Function to drop the first consumed bytes of the journal, keeping anything appended since"""
+
+    if not consumed:
+        return
+    with open(path + '.pending', 'r+b') as journal:
+        fcntl.flock(journal, fcntl.LOCK_EX)
+        journal.seek(consumed)
+        remaining = journal.read()
+        journal.seek(0)
+        journal.write(remaining)
+        journal.truncate()
+
+def _open_dynamic_wordlist_index(index_path):
+    """Function to open the on disk index of line digests for a dynamic wordlist"""
+
+    index = sqlite3.connect(index_path)
+    index.execute('CREATE TABLE IF NOT EXISTS lines (digest BLOB PRIMARY KEY) WITHOUT ROWID')
+    return index
+
+def _write_wordlist_lines(tmp_path, lines, existing_path=None):
+    """Function to write (existing file +) lines to tmp_path, returns (sha256 hexdigest, line count)"""
+
+    sha256_hash = hashlib.sha256()
+    newlines = 0
+    last_byte = b'\n'
+    with open(tmp_path, 'wb') as destination:
+        if existing_path:
+            with open(existing_path, 'rb') as source:
+                for block in iter(lambda: source.read(1024 * 1024), b''):
+                    sha256_hash.update(block)
+                    newlines += block.count(b'\n')
+                    last_byte = block[-1:]
+                    destination.write(block)
+        if last_byte != b'\n':
+            sha256_hash.update(b'\n')
+            newlines += 1
+            destination.write(b'\n')
+        for line in lines:
+            line += b'\n'
+            sha256_hash.update(line)
+            newlines += line.count(b'\n')
+            destination.write(line)
+        destination.flush()
+        os.fsync(destination.fileno())
+    # same convention as get_linecount()
+    return sha256_hash.hexdigest(), newlines + 1
 
 def update_dynamic_wordlist(wordlist_id):
-    """Function to update dynamic wordlist"""
+    """Function to update dynamic wordlist
+
+    Plaintexts queued by import_cracked_hashes are deduplicated against <path>.idx and appended. The
+    new file is written next to the old one and swapped in with os.replace, so hashcat never sees a
+    partial file. Without an index (first run, or after it was removed) the list is rebuilt from the db.
+
+    Updates are single-flight: concurrent callers wait on <path>.lock for the running update and then
+    find nothing left to do. Wordlists.generation is bumped whenever the file content changes.
+    """
 
     wordlist = Wordlists.query.get(wordlist_id)
-    hashes = Hashes.query.filter_by(cracked=True).distinct('plaintext')
-
-    # Do we delete the original file, or overwrite it?
-    # if we overwrite, what happens if the new content has fewer lines than the previous file.
-    # would this even happen? In most/all cases there will be new stuff to add.
-    # is there a file lock on a wordlist when in use by hashcat? Could we just create a temp file and replace after generation?
-    # Open file
-    file = open(wordlist.path, 'wt')
-    for entry in hashes:
-        file.write(str(bytes.fromhex(entry.plaintext).decode('latin-1')) + '\n')
-    file.close()
-
-    # update line count
-    wordlist.size = get_linecount(wordlist.path)
-    # update file hash
-    wordlist.checksum = get_filehash(wordlist.path)
-    # update last update
-    wordlist.last_updated = datetime.today()
-    db.session.commit()
+    with open(wordlist.path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # End our transaction so we see whatever the update we may have waited on committed
+        db.session.commit()
+        db.session.refresh(wordlist)
+
+        index_path = wordlist.path + '.idx'
+        # Everything queued up to here is already committed, so a rebuild from the db covers it as well
+        queued, consumed = _read_dynamic_wordlist_journal(wordlist.path)
+        if not queued and os.path.exists(index_path) and os.path.exists(wordlist.path):
+            return wordlist
+
+        if _write_dynamic_wordlist(wordlist, queued):
+            wordlist.generation += 1
+        _trim_dynamic_wordlist_journal(wordlist.path, consumed)
+        # update last update
+        wordlist.last_updated = datetime.today()
+        db.session.commit()
+    return wordlist
+
+def _write_dynamic_wordlist(wordlist, queued):
+    """Function to rebuild or append to a dynamic wordlist, returns True if the file changed"""
+
+    index_path = wordlist.path + '.idx'
+    tmp_path = wordlist.path + '.' + str(os.getpid()) + '.tmp'
+
+    if not os.path.exists(index_path) or not os.path.exists(wordlist.path):
+        if os.path.exists(index_path + '.tmp'):
+            os.remove(index_path + '.tmp')
+        index = _open_dynamic_wordlist_index(index_path + '.tmp')
+        query = db.session.query(Hashes.plaintext).filter(Hashes.cracked.is_(True)).filter(Hashes.plaintext.isnot(None)).distinct().yield_per(DYNAMIC_WORDLIST_BATCH_SIZE)
+
+        def rebuild_lines():
+            for (plaintext,) in query:
+                line = bytes.fromhex(plaintext)
+                if index.execute('INSERT OR IGNORE INTO lines (digest) VALUES (?)', (hashlib.md5(line).digest(),)).rowcount:
+                    yield line
+
+        wordlist.checksum, wordlist.size = _write_wordlist_lines(tmp_path, rebuild_lines())
+        index.commit()
+        index.close()
+        os.replace(tmp_path, wordlist.path)
+        os.replace(index_path + '.tmp', index_path)
+        current_app.logger.info('Rebuilt dynamic wordlist %s with %s lines.', wordlist.path, wordlist.size)
+        return True
+
+    index = _open_dynamic_wordlist_index(index_path)
+    new_lines = []
+    for plaintext in queued:
+        try:
+            line = bytes.fromhex(plaintext.decode('ascii'))
+        except ValueError:
+            continue
+        if index.execute('INSERT OR IGNORE INTO lines (digest) VALUES (?)', (hashlib.md5(line).digest(),)).rowcount:
+            new_lines.append(line)
+
+    if new_lines:
+        wordlist.checksum, wordlist.size = _write_wordlist_lines(tmp_path, new_lines, wordlist.path)
+        os.replace(tmp_path, wordlist.path)
+        current_app.logger.info('Appended %s lines to dynamic wordlist %s.', len(new_lines), wordlist.path)
+    # Only commit the index once the lines are really in the wordlist
+    index.commit()
+    index.close()
+    return bool(new_lines)
 
 def build_hashcat_command(job_id, task_id):
     """Function to build the main hashcat cmd we use to crack"""
@@ -270,6 +503,72 @@ def build_hashcat_command(job_id, task_id):
 
     return cmd
 
+def claim_next_job_task(agent_id):
+    """Function to assign the highest priority queued job task to an agent
+
+    The claim is a conditional UPDATE guarded on status = 'Queued', so when several agents race for
+    the same task only one UPDATE matches a row. Losers move on to the next candidate. The caller
+    commits, the row stays locked until then.
+    Returns the claimed JobTasks or None if nothing is queued.
+    """
+
+    tried = []
+    while True:
+        candidates = [job_task_id for (job_task_id,) in db.session.query(JobTasks.id).filter_by(status='Queued').filter(JobTasks.id.notin_(tried)).order_by(JobTasks.priority.desc(), JobTasks.id).limit(JOB_TASK_CLAIM_CANDIDATES)]
+        if not candidates:
+            return None
+
+        for job_task_id in candidates:
+            claimed = db.session.query(JobTasks).filter(JobTasks.id == job_task_id).filter(JobTasks.status == 'Queued').update({
+                JobTasks.agent_id: agent_id,
+                JobTasks.status: 'Running',
+                JobTasks.started_at: datetime.now().replace(microsecond=0),
+            }, synchronize_session=False)
+            if claimed:
+                return JobTasks.query.get(job_task_id)
+            tried.append(job_task_id)
+        # Every candidate was taken by another agent in the meantime, look again
+
+def get_cached_settings():
+    """Function to return a snapshot of the Settings row, re-read at most every SETTINGS_CACHE_TTL seconds"""
+
+    if _settings_cache['settings'] is None or time.monotonic() >= _settings_cache['expires']:
+        settings = Settings.query.first()
+        _settings_cache['settings'] = SimpleNamespace(
+            retention_period    = settings.retention_period,
+            max_runtime_jobs    = settings.max_runtime_jobs,
+            max_runtime_tasks   = settings.max_runtime_tasks,
+            enabled_job_weights = settings.enabled_job_weights,
+        )
+        _settings_cache['expires'] = time.monotonic() + SETTINGS_CACHE_TTL
+    return _settings_cache['settings']
+
+def clear_settings_cache():
+    """Function to drop the cached settings after they were changed"""
+
+    _settings_cache['settings'] = None
+
+def is_authorization_cached(kind, key):
+    """Function to check the in-process cache of recently authorized api keys ('user') and agent uuids ('agent')"""
+
+    expires = _authorization_cache.get((kind, key))
+    if expires is None:
+        return False
+    if time.monotonic() >= expires:
+        _authorization_cache.pop((kind, key), None)
+        return False
+    return True
+
+def cache_authorization(kind, key):
+    """Function to remember a successful authorization for AUTHORIZATION_CACHE_TTL seconds"""
+
+    _authorization_cache[(kind, key)] = time.monotonic() + AUTHORIZATION_CACHE_TTL
+
+def clear_authorization_cache():
+    """Function to forget all cached authorizations, call whenever an agent or api key changes"""
+
+    _authorization_cache.clear()
+
 def update_job_task_status(jobtask_id, status):
     """Function to update task status of a job"""
 
@@ -280,10 +579,11 @@ def update_job_task_status(jobtask_id, status):
 
     jobtask.status = status
     if status == 'Completed':
+        agent = Agents.query.get(jobtask.agent_id) if jobtask.agent_id else None
         jobtask.agent_id = None
-        agent = Agents.query.get(jobtask.agent_id)
         if agent:
-            agent.hc_status = ''
+            # through the buffer, a heartbeat still buffered for the agent would overwrite a direct write
+            buffer_agent_status(agent.uuid, hc_status='')
     db.session.commit()
 
     # Update Jobs
@@ -339,290 +639,42 @@ def update_job_task_status(jobtask_id, status):
 
     return True
 
-def validate_pwdump_hashfile(hashfile_path, hash_type):
-    """Function to validate if hashfile submitted is a pwdump format"""
-
-    file = open(hashfile_path, 'r')
-    lines = file.readlines()
-    line_number = 0
+# Dumb way of doing this, we return with an error message if we have an issue with the hashfile
+# and return false if hashfile is okay. :/ Should be the otherway around :shrug emoji:
+def validate_hashfile(hashfile_path, file_type, hash_type):
+    """Function to validate a hashfile against the rules of its file type and hash type in one streaming pass"""
 
-    for line in lines:
-        line_number += 1
-
-        # Skip entries that are just newlines
-        if len(line) > 50000:
-            return 'Error line ' + str(line_number) + ' is too long. Line length: ' + str(len(line)) + '. Max length is 50,000 chars.'
-        if len(line) > 0:
-            if ':' not in line:
-                return 'Error line ' + str(line_number) + ' is missing a : character. Pwdump file should include usernames.'
-            # This is slow af :(
-            colon_cnt = 0
-            for char in line:
-                if char == ':':
-                    colon_cnt += 1
-            if colon_cnt < 6:
-                return 'Error line ' + str(line_number) + '. File does not appear to be be in a pwdump format.'
-            if hash_type == '1000':
-                if len(line.split(':')[3]) != 32:
-                    return 'Error line ' + str(line_number) + ' has an invalid number of characters (' + str(len(line.rstrip())) + ') should be 32'
-            else:
-                return 'Sorry. The only Hash Type we support for PWDump files is NTLM'
+    try:
+        with open(hashfile_path) as file:
+            for _ in check_lines(file, file_type, hash_type):
+                pass
+    except ValueError as error:
+        return str(error)
     return False
 
+def validate_pwdump_hashfile(hashfile_path, hash_type):
+    """Function to validate if hashfile submitted is a pwdump format"""
+    return validate_hashfile(hashfile_path, 'pwdump', hash_type)
+
 def validate_netntlm_hashfile(hashfile_path):
     """Function to validate if hashfile submitted is a netntlm format"""
-
-    file = open(hashfile_path, 'r')
-    lines = file.readlines()
-    line_number = 0
-
-    # Do a whole file check if file_type is NetNTLM
-    # If duplicate usernames exists return error
-    # we could probably wrap this into the for loop below
-
-    list_of_username_and_computers = []
-    for line in lines:
-        username_computer = (line.split(':')[0] + ':' + line.split(':')[2]).lower()
-        if username_computer in list_of_username_and_computers:
-            return 'Error: Duplicate usernames / computer found in hashfiles (' + str(username_computer) + '). Please only submit unique usernames / computer.'
-        list_of_username_and_computers.append(username_computer)
-
-    for line in lines:
-        line_number += 1
-
-        # Skip entries that are just newlines
-        if len(line) > 50000:
-            return 'Error line ' + str(line_number) + ' is too long. Line length: ' + str(len(line)) + '. Max length is 50,000 chars.'
-        if len(line) > 0:
-            if ':' not in line:
-                return 'Error line ' + str(line_number) + ' is missing a : character. NetNTLM file should include usernames.'
-            # This is slow af :(
-            colon_cnt = 0
-            for char in line:
-                if char == ':':
-                    colon_cnt += 1
-            if colon_cnt < 5:
-                return 'Error line ' + str(line_number) + '. File does not appear to be be in a NetNTLM format.'
-    return False
+    return validate_hashfile(hashfile_path, 'NetNTLM', None)
 
 def validate_kerberos_hashfile(hashfile_path, hash_type):
     """Function to validate if hashfile submitted is a kerberos format"""
-
-    file = open(hashfile_path, 'r')
-    lines = file.readlines()
-    line_number = 0
-
-    for line in lines:
-        line_number += 1
-
-        # Skip entries that are just newlines
-        if len(line) > 50000:
-            return 'Error line ' + str(line_number) + ' is too long. Line length: ' + str(len(line)) + '. Max length is 50,000 chars.'
-        if len(line) > 0:
-            if '$' not in line:
-                return 'Error line ' + str(line_number) + ' is missing a $ character. kerberos file should include these.'
-            dollar_cnt = 0
-            # This is slow af :(
-            for char in line:
-                if char == '$':
-                    dollar_cnt += 1
-
-            if hash_type == '7500':
-                if dollar_cnt != 6:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, AS-REQ Pre-Auth (1)'
-                if line.split('$')[1] != 'krb5pa':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, AS-REQ Pre-Auth (2)'
-                if line.split('$')[2] != '23':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, AS-REQ Pre-Auth (3)'
-            elif hash_type == '13100':
-                if dollar_cnt != 7 and dollar_cnt != 8:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, TGS-REP (1)'
-                if line.split('$')[1] != 'krb5tgs':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, TGS-REP (2)'
-                if line.split('$')[2] != '23':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, TGS-REP (3)'
-            elif hash_type == '18200':
-                if dollar_cnt != 4 and dollar_cnt != 5:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, AS-REP (1)'
-                if line.split('$')[1] != 'krb5asrep':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, AS-REP (2)'
-                if line.split('$')[2] != '23':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 23, AS-REP (3)'
-            elif hash_type == '19600':
-                if dollar_cnt != 6 and dollar_cnt != 7:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 17, TGS-REP (AES128-CTS-HMAC-SHA1-96) (1)'
-                if line.split('$')[1] != 'krb5tgs':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 17, TGS-REP (AES128-CTS-HMAC-SHA1-96) (2)'
-                if line.split('$')[2] != '17':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 17, TGS-REP (AES128-CTS-HMAC-SHA1-96) (3)'
-            elif hash_type == '19700':
-                if dollar_cnt != 6 and dollar_cnt != 7:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 18, TGS-REP (AES256-CTS-HMAC-SHA1-96) (1)'
-                if line.split('$')[1] != 'krb5tgs':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 18, TGS-REP (AES256-CTS-HMAC-SHA1-96) (2)'
-                if line.split('$')[2] != '18':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 18, TGS-REP (AES256-CTS-HMAC-SHA1-96) (3)'
-            elif hash_type == '19800':
-                if dollar_cnt != 5 and dollar_cnt != 6:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 17, Pre-Auth (1)'
-                if line.split('$')[1] != 'krb5pa':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 17, Pre-Auth (2)'
-                if line.split('$')[2] != '17':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 17, Pre-Auth (3)'
-            elif hash_type == '19900':
-                if dollar_cnt != 5 and dollar_cnt != 6:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 18, Pre-Auth (1)'
-                if line.split('$')[1] != 'krb5pa':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 18, Pre-Auth (2)'
-                if line.split('$')[2] != '18':
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Kerberos 5, etype 18, Pre-Auth (3)'
-            else:
-                return 'Sorry. The only suppported Hash Types are: 7500, 13100, 18200, 19600, 19700, 19800 and 19900.'
-    return False
+    return validate_hashfile(hashfile_path, 'kerberos', hash_type)
 
 def validate_shadow_hashfile(hashfile_path, hash_type):
     """Function to validate if hashfile submitted is a shadow format"""
-
-    file = open(hashfile_path, 'r')
-    lines = file.readlines()
-    line_number = 0
-
-    for line in lines:
-        line_number += 1
-
-        # Skip entries that are just newlines
-        if len(line) > 50000:
-            return 'Error line ' + str(line_number) + ' is too long. Line length: ' + str(len(line)) + '. Max length is 50,000 chars.'
-        if len(line) > 0:
-            if ':' not in line:
-                return 'Error line ' + str(line_number) + ' is missing a : character. shadow file should include usernames.'
-            if hash_type == '1800':
-                dollar_cnt = 0
-                for char in line:
-                    if char == '$':
-                        dollar_cnt+=1
-                if dollar_cnt != 3:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Sha512 Crypt from a shadow file.'
-                if '$6$' not in line:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Sha512 Crypt from a shadow file.'
-    return False
+    return validate_hashfile(hashfile_path, 'shadow', hash_type)
 
 def validate_user_hash_hashfile(hashfile_path):
     """Function to validate if hashfile submitted is a user:hash format"""
+    return validate_hashfile(hashfile_path, 'user_hash', None)
 
-    file = open(hashfile_path, 'r')
-    lines = file.readlines()
-    line_number = 0
-
-    for line in lines:
-        line_number += 1
-
-        # Skip entries that are just newlines
-        if len(line) > 50000:
-            return 'Error line ' + str(line_number) + ' is too long. Line length: ' + str(len(line)) + '. Max length is 50,000 chars.'
-        if len(line) > 0:
-            if ':' not in line:
-                return 'Error line ' + str(line_number) + ' is missing a : character. user:hash file should have just ONE of these'
-
-    return
-
-# Dumb way of doing this, we return with an error message if we have an issue with the hashfile
-# and return false if hashfile is okay. :/ Should be the otherway around :shrug emoji:
 def validate_hash_only_hashfile(hashfile_path, hash_type):
     """Function to validate if hashfile submitted is a hash only format"""
-
-    file = open(hashfile_path, 'r')
-    lines = file.readlines()
-
-    line_number = 0
-    # for line in file,
-    for line in lines:
-        line_number += 1
-
-        # Skip entries that are just newlines
-        if len(line) > 50000:
-            return 'Error line ' + str(line_number) + ' is too long. Line length: ' + str(len(line)) + '. Max length is 50,000 chars.'
-        if len(line) > 0:
-
-            # Check hash types
-            if hash_type in ('0', '22', '1000'):
-                if len(line.rstrip()) != 32:
-                    return 'Error line ' + str(line_number) + ' has an invalid number of characters (' + str(len(line.rstrip())) + ') should be 32'
-            if hash_type == '122':
-                if len(line.rstrip()) != 50:
-                    return 'Error line ' + str(line_number) + ' has an invalid number of characters (' + str(len(line.rstrip())) + ') should be 50'
-            if hash_type == '300':
-                if len(line.rstrip()) != 40:
-                    return 'Error line ' + str(line_number) + ' has an invalid number of characters (' + str(len(line.rstrip())) + ') should be 40'
-            if hash_type == '500':
-                if '$1$' not in line:
-                    return 'Error line ' + str(line_number) + ' is not a valid md5Crypt, MD5 (Unix) or Cisco-IOS $1$ (MD5) hash'
-            if hash_type == '1100':
-                if ':' not in line:
-                    return 'Error line ' + str(line_number) + ' is missing a : character. Domain Cached Credentials (DCC), MS Cache hashes should have one'
-            if hash_type == '1800':
-                dollar_cnt = 0
-                for char in line:
-                    if char == '$':
-                        dollar_cnt+=1
-                if dollar_cnt != 3:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Sha512 Crypt.'
-                if '$6$' not in line:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Sha512 Crypt.'
-            if hash_type == '2100':
-                if '$' not in line:
-                    return 'Error line ' + str(line_number) + ' is missing a $ character. DCC2 Hashes should have these'
-                dollar_cnt = 0
-                hash_cnt = 0
-                for char in line:
-                    if char == '$':
-                        dollar_cnt += 1
-                    if char == '#':
-                        hash_cnt += 1
-                if dollar_cnt != 2:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: DCC2 MS Cache'
-                if hash_cnt != 2:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: DCC2 MS Cache'
-            if hash_type == '2400':
-                if len(line.rstrip()) != 18:
-                    return 'Error line ' + str(line_number) + ' has an invalid number of characters (' + str(len(line.rstrip())) + ') should be 18'
-            if hash_type == '2410':
-                if ':' not in line:
-                    return 'Error line ' + str(line_number) + ' is missing a : character. Cisco-ASA Hashes should have these.'
-            if hash_type == '3200':
-                if '$' not in line:
-                    return 'Error line ' + str(line_number) + ' is missing a $ character. bcrypt Hashes should have these.'
-                dollar_cnt = 0
-                for char in line:
-                    if char == '$':
-                        dollar_cnt += 1
-                if dollar_cnt != 3:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: bcrypt'
-            if hash_type == '5700':
-                if len(line.rstrip()) != 43:
-                    return 'Error line ' + str(line_number) + ' has an invalid number of characters (' + str(len(line.rstrip())) + ') should be 43'
-            if hash_type == '7100':
-                if '$' not in line:
-                    return 'Error line ' + str(line_number) + ' is missing a $ character. Mac OSX 10.8+ ($ml$) hashes should have these.'
-                dollar_cnt = 0
-                for char in line:
-                    if char == '$':
-                        dollar_cnt += 1
-                if dollar_cnt != 2:
-                    return 'Error line ' + str(line_number) + '. Doesnt appear to be of the type: Mac OSX 10.8+ ($ml$)'
-            if hash_type in ('9400', '9500', '9600'):
-                if '$' not in line:
-                    return 'Error line ' + str(line_number) + ' is missing a $ character. Office hashes require 2.'
-                if '*' not in line:
-                    return 'Error line ' + str(line_number) + ' is missing a * character. Office hashes require 6.'
-                star_cnt = 0
-                for char in line:
-                    if char == '*':
-                        star_cnt +=1
-                if star_cnt != 7:
-                    return 'Error line ' + str(line_number) + '. Does not appear to be of the type office.'              
-
-    return False
+    return validate_hashfile(hashfile_path, 'hash_only', hash_type)
 
 def getTimeFormat(total_runtime): # Runtime in seconds
     """Function to convert seconds into, minutes, hours, days or weeks"""
@@ -0,0 +1,188 @@
+"""Streaming hashfile validation driven by a per file type / hash type rule table
+
+Every rule is a (check, argument, error) tuple, checks are:
+    'contains'      argument is a substring the line must contain
+    'length'        argument is the length the stripped line must have
+    'count'         argument is (character, allowed counts)
+    'min_count'     argument is (character, minimum count)
+    'field'         argument is (separator, index, value) the split line must have
+    'field_length'  argument is (separator, index, length) of a field of the split line
+    'unique'        argument is (separator, indexes) forming a key that may only appear once per file
+    'reject'        always fails, used for unsupported hash types
+
+Errors are formatted with the line number, the stripped line length and the duplicate key.
+"""
+
+# Lines longer than this are rejected before any rule runs
+MAX_LINE_LENGTH = 50000
+
+TOO_LONG_ERROR = 'Error line {line_number} is too long. Line length: {length}. Max length is 50,000 chars.'
+
+
+def _length_rule(length):
+    """Function to return the rule of a hash type with a fixed length"""
+    return ('length', length, 'Error line {line_number} has an invalid number of characters ({length}) should be ' + str(length))
+
+def _kerberos_rules(prefix, etype, dollar_counts, name):
+    """Function to return the rules of a kerberos hash type"""
+    error = 'Error line {line_number}. Doesnt appear to be of the type: ' + name
+    return (
+        ('count', ('$', dollar_counts), error + ' (1)'),
+        ('field', ('$', 1, prefix), error + ' (2)'),
+        ('field', ('$', 2, etype), error + ' (3)'),
+    )
+
+# Rules every line of a file type must pass, before the rules of its hash type
+FILE_TYPE_RULES = {
+    'pwdump': (
+        ('contains', ':', 'Error line {line_number} is missing a : character. Pwdump file should include usernames.'),
+        ('min_count', (':', 6), 'Error line {line_number}. File does not appear to be be in a pwdump format.'),
+    ),
+    'NetNTLM': (
+        ('contains', ':', 'Error line {line_number} is missing a : character. NetNTLM file should include usernames.'),
+        ('min_count', (':', 5), 'Error line {line_number}. File does not appear to be be in a NetNTLM format.'),
+        ('unique', (':', (0, 2)), 'Error: Duplicate usernames / computer found in hashfiles ({key}). Please only submit unique usernames / computer.'),
+    ),
+    'kerberos': (
+        ('contains', '$', 'Error line {line_number} is missing a $ character. kerberos file should include these.'),
+    ),
+    'shadow': (
+        ('contains', ':', 'Error line {line_number} is missing a : character. shadow file should include usernames.'),
+    ),
+    'user_hash': (
+        ('contains', ':', 'Error line {line_number} is missing a : character. user:hash file should have just ONE of these'),
+    ),
+    'hash_only': (),
+}
+
+# Rules of every supported hash type of a file type, hash types without an entry have no extra rules
+HASH_TYPE_RULES = {
+    'pwdump': {
+        '1000': (('field_length', (':', 3, 32), 'Error line {line_number} has an invalid number of characters ({length}) should be 32'),),
+    },
+    'kerberos': {
+        '7500': _kerberos_rules('krb5pa', '23', (6,), 'Kerberos 5, etype 23, AS-REQ Pre-Auth'),
+        '13100': _kerberos_rules('krb5tgs', '23', (7, 8), 'Kerberos 5, etype 23, TGS-REP'),
+        '18200': _kerberos_rules('krb5asrep', '23', (4, 5), 'Kerberos 5, etype 23, AS-REP'),
+        '19600': _kerberos_rules('krb5tgs', '17', (6, 7), 'Kerberos 5, etype 17, TGS-REP (AES128-CTS-HMAC-SHA1-96)'),
+        '19700': _kerberos_rules('krb5tgs', '18', (6, 7), 'Kerberos 5, etype 18, TGS-REP (AES256-CTS-HMAC-SHA1-96)'),
+        '19800': _kerberos_rules('krb5pa', '17', (5, 6), 'Kerberos 5, etype 17, Pre-Auth'),
+        '19900': _kerberos_rules('krb5pa', '18', (5, 6), 'Kerberos 5, etype 18, Pre-Auth'),
+    },
+    'shadow': {
+        '1800': (
+            ('count', ('$', (3,)), 'Error line {line_number}. Doesnt appear to be of the type: Sha512 Crypt from a shadow file.'),
+            ('contains', '$6$', 'Error line {line_number}. Doesnt appear to be of the type: Sha512 Crypt from a shadow file.'),
+        ),
+    },
+    'hash_only': {
+        '0': (_length_rule(32),),
+        '22': (_length_rule(32),),
+        '1000': (_length_rule(32),),
+        '122': (_length_rule(50),),
+        '300': (_length_rule(40),),
+        '500': (('contains', '$1$', 'Error line {line_number} is not a valid md5Crypt, MD5 (Unix) or Cisco-IOS $1$ (MD5) hash'),),
+        '1100': (('contains', ':', 'Error line {line_number} is missing a : character. Domain Cached Credentials (DCC), MS Cache hashes should have one'),),
+        '1800': (
+            ('count', ('$', (3,)), 'Error line {line_number}. Doesnt appear to be of the type: Sha512 Crypt.'),
+            ('contains', '$6$', 'Error line {line_number}. Doesnt appear to be of the type: Sha512 Crypt.'),
+        ),
+        '2100': (
+            ('contains', '$', 'Error line {line_number} is missing a $ character. DCC2 Hashes should have these'),
+            ('count', ('$', (2,)), 'Error line {line_number}. Doesnt appear to be of the type: DCC2 MS Cache'),
+            ('count', ('#', (2,)), 'Error line {line_number}. Doesnt appear to be of the type: DCC2 MS Cache'),
+        ),
+        '2400': (_length_rule(18),),
+        '2410': (('contains', ':', 'Error line {line_number} is missing a : character. Cisco-ASA Hashes should have these.'),),
+        '3200': (
+            ('contains', '$', 'Error line {line_number} is missing a $ character. bcrypt Hashes should have these.'),
+            ('count', ('$', (3,)), 'Error line {line_number}. Doesnt appear to be of the type: bcrypt'),
+        ),
+        '5700': (_length_rule(43),),
+        '7100': (
+            ('contains', '$', 'Error line {line_number} is missing a $ character. Mac OSX 10.8+ ($ml$) hashes should have these.'),
+            ('count', ('$', (2,)), 'Error line {line_number}. Doesnt appear to be of the type: Mac OSX 10.8+ ($ml$)'),
+        ),
+    },
+}
+for office_hash_type in ('9400', '9500', '9600'):
+    HASH_TYPE_RULES['hash_only'][office_hash_type] = (
+        ('contains', '$', 'Error line {line_number} is missing a $ character. Office hashes require 2.'),
+        ('contains', '*', 'Error line {line_number} is missing a * character. Office hashes require 6.'),
+        ('count', ('*', (7,)), 'Error line {line_number}. Does not appear to be of the type office.'),
+    )
+
+# File types that only support the hash types listed in HASH_TYPE_RULES
+UNSUPPORTED_HASH_TYPE_ERRORS = {
+    'pwdump': 'Sorry. The only Hash Type we support for PWDump files is NTLM',
+    'kerberos': 'Sorry. The only suppported Hash Types are: 7500, 13100, 18200, 19600, 19700, 19800 and 19900.',
+}
+
+
+class HashfileValidator:
+    """Class checking the lines of a hashfile one at a time against the rules of its file type and hash type"""
+
+    def __init__(self, file_type, hash_type):
+        if file_type not in FILE_TYPE_RULES:
+            raise ValueError('Invalid File Format')
+
+        hash_type_rules = HASH_TYPE_RULES.get(file_type, {})
+        if hash_type in hash_type_rules:
+            extra_rules = hash_type_rules[hash_type]
+        elif file_type in UNSUPPORTED_HASH_TYPE_ERRORS:
+            extra_rules = (('reject', None, UNSUPPORTED_HASH_TYPE_ERRORS[file_type]),)
+        else:
+            extra_rules = ()
+        self.rules = FILE_TYPE_RULES[file_type] + extra_rules
+        self.seen = set()
+
+    def check(self, line_number, line):
+        """Function to return the error message of a line (with its line ending), or None when it is valid"""
+
+        if len(line) > MAX_LINE_LENGTH:
+            return TOO_LONG_ERROR.format(line_number=line_number, length=len(line))
+
+        # every separator splits the line at most once
+        fields = {}
+        for check, argument, error in self.rules:
+            key = None
+            if check == 'contains':
+                failed = argument not in line
+            elif check == 'length':
+                failed = len(line.rstrip()) != argument
+            elif check == 'count':
+                failed = line.count(argument[0]) not in argument[1]
+            elif check == 'min_count':
+                failed = line.count(argument[0]) < argument[1]
+            elif check == 'field':
+                separator, index, value = argument
+                parts = fields.get(separator) or fields.setdefault(separator, line.split(separator))
+                failed = parts[index] != value
+            elif check == 'field_length':
+                separator, index, length = argument
+                parts = fields.get(separator) or fields.setdefault(separator, line.split(separator))
+                failed = len(parts[index]) != length
+            elif check == 'unique':
+                separator, indexes = argument
+                parts = fields.get(separator) or fields.setdefault(separator, line.split(separator))
+                key = separator.join(parts[index] for index in indexes).lower()
+                failed = key in self.seen
+                self.seen.add(key)
+            else:
+                # 'reject'
+                failed = True
+
+            if failed:
+                return error.format(line_number=line_number, length=len(line.rstrip()), key=key)
+        return None
+
+
+def check_lines(lines, file_type, hash_type):
+    """Function to yield (line_number, line) of valid lines, raising ValueError with the error of the first invalid one"""
+
+    validator = HashfileValidator(file_type, hash_type)
+    for line_number, line in enumerate(lines, 1):
+        error = validator.check(line_number, line)
+        if error:
+            raise ValueError(error)
+        yield line_number, line
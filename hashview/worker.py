@@ -0,0 +1,28 @@
+"""Out of process worker running the scheduled jobs, so web processes never start a scheduler"""
+import signal
+import threading
+
+from flask import Flask
+
+
+def run_worker(app :Flask):
+    """ Function to run the worker jobs (retention, dynamic wordlists, summaries, hashfile imports) until SIGINT/SIGTERM """
+
+    from hashview.scheduler import scheduler
+    from hashview.scheduler import add_worker_jobs
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    scheduler.init_app(app)
+    add_worker_jobs(app)
+    scheduler.start()
+    app.logger.info('Worker is Running with Jobs(%s).', ', '.join(job.id for job in scheduler.get_jobs()))
+
+    while not stop.wait(1):
+        pass
+
+    app.logger.info('Worker is Stopping.')
+    # let a running job finish, its lock is released on the way out
+    scheduler.shutdown(wait=True)
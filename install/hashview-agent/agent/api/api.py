@@ -32,6 +32,9 @@ def rules_list():
 def get_rules_file(rules_id):
     return http.get('/v1/rules/' + str(rules_id))
 
+def download_rules_file(rules_id, file_path, checksum):
+    return http.download('/v1/rules/' + str(rules_id), file_path, checksum)
+
 def getWordlists():
     response =  http.get('/v1/wordlists')
     if(json.loads(response)['status'] == 426):
@@ -44,6 +47,9 @@ def getWordlists():
 def get_wordlists_file(wordlist_id):
     return http.get('/v1/wordlists/' + str(wordlist_id))
 
+def download_wordlists_file(wordlist_id, file_path, checksum):
+    return http.download('/v1/wordlists/' + str(wordlist_id), file_path, checksum)
+
 def jobTasks(job_task_id):
     response = http.get('/v1/jobTasks/' + str(job_task_id))
     if(json.loads(response)['status'] == 426):
@@ -86,19 +92,34 @@ def updateDynamicWordlists(wordlist_id):
 def get_hashfile(hashfile_id):
     return http.get('/v1/hashfiles/' + str(hashfile_id))
 
-def uploadCrackFile(file_path, hash_type):
-    with open(file_path, 'r') as file:
+def uploadCrackFile(file_path, hash_type, offset=0):
+    # Only send what hashcat appended since the last acknowledged offset, and only complete lines.
+    # A partial trailing line is picked up on the next upload.
+    with open(file_path, 'rb') as file:
+        file.seek(0, 2)
+        if file.tell() < offset:
+            # crack file was truncated or replaced, start over
+            offset = 0
+        file.seek(offset)
+        contents = file.read()
+    contents = contents[:contents.rfind(b'\n') + 1]
+    if not contents:
+        return {'msg': 'No new results', 'offset': offset}
+
     # we use jobtask to determin hashtype server side. 
-        response =  http.post('/v1/uploadCrackFile/' + str(hash_type), data={'file': file.read()})
-        decoded_response = json.loads(response)
-        if decoded_response['type'] == 'message' and decoded_response['status'] == 200:
-            return decoded_response
-        elif decoded_response['type'] == 'message' and decoded_response['status'] == 426:
-            print('Our agent version is older than the servers. You need to upgrade your agent before continuing.')
-            exit()
-        else:
-            print('we got an unexpected response type')
-            print(str(decoded_response['type']))
+    # Cut at a newline so never inside a multi byte character, hashes are matched as utf-8 like the hashfile import
+    response =  http.post('/v1/uploadCrackFile/' + str(hash_type), data={'file': contents.decode('utf-8'), 'offset': offset})
+    decoded_response = json.loads(response)
+    if decoded_response['type'] == 'message' and decoded_response['status'] == 200:
+        # older servers do not acknowledge an offset, they still imported everything we sent
+        decoded_response.setdefault('offset', offset + len(contents))
+        return decoded_response
+    elif decoded_response['type'] == 'message' and decoded_response['status'] == 426:
+        print('Our agent version is older than the servers. You need to upgrade your agent before continuing.')
+        exit()
+    else:
+        print('we got an unexpected response type')
+        print(str(decoded_response['type']))
 
 def getHashType(hashfile_id):
     response = http.get('/v1/getHashType/' + str(hashfile_id))
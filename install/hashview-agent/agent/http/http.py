@@ -1,5 +1,6 @@
 import requests
 import json
+import os
 from agent.config import Config
 # to supress SSL Error messages
 import urllib3
@@ -72,3 +73,53 @@ def post(url, data):
         return response.text
     else:
         print('[!] HTTP POST (response): Got an unexpected return code:' + str(response.status_code))
+
+def download(url, file_path, etag=None):
+    path = ''
+    if Config.USE_SSL == 'True':
+        path += 'https://'
+    else:
+        path += 'http://'
+
+    version = agent.__version__
+
+    cookie = {
+        'uuid': Config.UUID,
+        'name': Config.NAME,
+        'agent_version': version
+    }
+
+    path += Config.HASHVIEW_SERVER + ':' + Config.HASHVIEW_PORT + url
+
+    # Resume a previous partial download. If-Range makes the server send the whole file again if it changed.
+    headers = {}
+    offset = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    if offset and etag:
+        headers['Range'] = 'bytes=' + str(offset) + '-'
+        headers['If-Range'] = '"' + etag + '"'
+
+    if builtins.state == 'debug':
+        print('[DEBUG] http.py->DOWNLOAD: (path)' + path)
+        print('[DEBUG] http.py->DOWNLOAD: (headers)' + str(headers))
+
+    try:
+        with http.get(path, verify=False, cookies=cookie, headers=headers, stream=True) as response:
+            if response.status_code == 416:
+                # we already have every byte
+                return True
+            if response.status_code == 206:
+                mode = 'ab'
+            elif response.status_code == 200:
+                mode = 'wb'
+            else:
+                print('[!] HTTP GET (response): Got an unexpected return code:' + str(response.status_code))
+                return False
+
+            with open(file_path, mode) as file:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    file.write(chunk)
+    except requests.exceptions.RequestException as e:
+        # keep what we have, the next attempt resumes from here
+        print('[!] HTTP GET (download): ' + str(e))
+        return False
+    return True
@@ -3,8 +3,8 @@ import os
 import socket
 import uuid
 import json
-import secrets
 import hashlib
+import gzip
 import sys
 import psutil
 import re
@@ -88,6 +88,46 @@ def getHashcatPid():
                 return False
     return False
 
+def download_file(file_type, entry):
+    # Downloads land in control/tmp/<checksum>.gz.part so an interrupted transfer is resumed on the next sync
+    # instead of starting over. The file is verified with a streaming sha256 while it is decompressed.
+    compressed_path = 'control/tmp/' + entry['checksum'] + '.gz.part'
+    decompressed_path = 'control/tmp/' + entry['checksum']
+    if file_type == 'rules':
+        downloaded = api.download_rules_file(entry['id'], compressed_path, entry['checksum'])
+    else:
+        downloaded = api.download_wordlists_file(entry['id'], compressed_path, entry['checksum'])
+    if not downloaded:
+        print('Download failed, will resume on next sync.')
+        return False
+
+    print('Decompressing and comparing checksums')
+    sha256_hash = hashlib.sha256()
+    try:
+        with gzip.open(compressed_path, 'rb') as compressed, open(decompressed_path, 'wb') as decompressed:
+            for byte_block in iter(lambda: compressed.read(1024 * 1024), b""):
+                sha256_hash.update(byte_block)
+                decompressed.write(byte_block)
+    except (OSError, EOFError) as e:
+        print('Corrupt download (' + str(e) + '), starting over on next sync.')
+        os.remove(compressed_path)
+        with suppress(FileNotFoundError):
+            os.remove(decompressed_path)
+        return False
+    os.remove(compressed_path)
+
+    print('Local: ' + str(sha256_hash.hexdigest()))
+    print('Remote: ' + str(entry['checksum']))
+    if sha256_hash.hexdigest() == entry['checksum']:
+        print('Checksums match!')
+        # move & rename file to match that of whats expected in the hashcat command
+        os.replace(decompressed_path, 'control/' + file_type + '/' + entry['path'].split('/')[-1])
+        return True
+
+    print('hashes dont match. what do we do now?')
+    os.remove(decompressed_path)
+    return False
+
 def sync_rules():
     # pull list of rules & hashes
     print('Syncing local rules with server.')
@@ -114,70 +154,18 @@ def sync_rules():
                     # TODO change to try catch
                     os.remove('control/rules/' + rules_manifest_entry.split('|')[2].rstrip())
                     
-                    # download rules file
-                    random_hex = secrets.token_hex(8)
-                    compressed_rules_file_content = api.get_rules_file(entry['id'])
-                    local_compressed_rule = open('control/tmp/'+ random_hex + '.gz', 'wb')
-                    local_compressed_rule.write(compressed_rules_file_content)
-                    local_compressed_rule.close()                
-                    
-                    # decompress rules file
-                    cmd = 'gunzip control/tmp/' + random_hex + '.gz'
-                    os.system(cmd)                    
-                            
-                    # generate checksum
-                    print('Comparing checksums')
-                    sha256_hash = hashlib.sha256()
-                    with open('control/tmp/'+random_hex, 'rb') as f:
-                        for byte_block in iter(lambda: f.read(4096),b""):
-                            sha256_hash.update(byte_block)                
-                    print('Local: ' + str(sha256_hash.hexdigest()))
-                    print('Remote: ' + str(entry['checksum']))
-
-                    if sha256_hash.hexdigest() == entry['checksum']:
-                        print('Checksums match!')
-                        # create new manifest entry    
-                        new_rules_manifest.write(str(entry['id']) + '|' + sha256_hash.hexdigest() + '|' + entry['path'].split('/')[-1] + '\n')
-                        # move & rename rules file to match that of whats expected in the hashcat command
-                        cmd = 'mv control/tmp/' + random_hex + ' control/rules/' + entry['path'].split('/')[-1]
-                        os.system(cmd)
-                    else:
-                        print('hashes dont match. what do we do now?')
-                        os.remove('control/tmp/' + random_hex)
+                    # download, decompress and verify rules file
+                    if download_file('rules', entry):
+                        # create new manifest entry
+                        new_rules_manifest.write(str(entry['id']) + '|' + entry['checksum'] + '|' + entry['path'].split('/')[-1] + '\n')
             
         # We've compared the two lists, now if we didnt have the entry before it means its a new rules file and we need to download it.
         if currently_has_rule == False:
             print('Downloading rule id: ' + str(entry['id']) + ' (' + entry['name'] + ')' )
-            # download rules file
-            random_hex = secrets.token_hex(8)
-            compressed_rules_file_content = api.get_rules_file(entry['id'])
-            local_compressed_rule = open('control/tmp/'+ random_hex + '.gz', 'wb')
-            local_compressed_rule.write(compressed_rules_file_content)
-            local_compressed_rule.close()
-
-            # decompress rules file
-            cmd = 'gunzip control/tmp/' + random_hex + '.gz'
-            os.system(cmd)
-            
-            # generate checksum
-            print('Comparing checksums')
-            sha256_hash = hashlib.sha256()
-            with open('control/tmp/'+random_hex, 'rb') as f:
-                for byte_block in iter(lambda: f.read(4096),b""):
-                    sha256_hash.update(byte_block)                
-            print('Local: ' + str(sha256_hash.hexdigest()))
-            print('Remote: ' + str(entry['checksum']))
-
-            if sha256_hash.hexdigest() == entry['checksum']:
-                print('Checksums match!')
-                # create new manifest entry    
-                new_rules_manifest.write(str(entry['id']) + '|' + sha256_hash.hexdigest() + '|' + entry['path'].split('/')[-1] + '\n')
-                # move & rename rules file to match that of whats expected in the hashcat command
-                cmd = 'mv control/tmp/' + random_hex + ' control/rules/' + entry['path'].split('/')[-1]
-                os.system(cmd)
-            else:
-                print('hashes dont match. what do we do now?')
-                os.remove('control/tmp/' + random_hex)
+            # download, decompress and verify rules file
+            if download_file('rules', entry):
+                # create new manifest entry
+                new_rules_manifest.write(str(entry['id']) + '|' + entry['checksum'] + '|' + entry['path'].split('/')[-1] + '\n')
         elif currently_has_rule == True and mismatched_rule == False:
             new_rules_manifest.write(str(entry['id']) + '|' + entry['checksum'] + '|' + entry['path'].split('/')[-1] + '\n')
     # move new manifest into correct directory
@@ -211,70 +199,18 @@ def sync_wordlists():
                     # TODO change to try catch
                     os.remove('control/wordlists/' + wordlists_manifest_entry.split('|')[2].rstrip())
                     
-                    # download wordlists file
-                    random_hex = secrets.token_hex(8)
-                    compressed_wordlists_file_content = api.get_wordlists_file(entry['id'])
-                    local_compressed_wordlist = open('control/tmp/'+ random_hex + '.gz', 'wb')
-                    local_compressed_wordlist.write(compressed_wordlists_file_content)
-                    local_compressed_wordlist.close()                
-                    
-                    # decompress wordlist file
-                    cmd = 'gunzip control/tmp/' + random_hex + '.gz'
-                    os.system(cmd)                    
-                            
-                    # generate checksum
-                    print('Comparing checksums')
-                    sha256_hash = hashlib.sha256()
-                    with open('control/tmp/'+random_hex, 'rb') as f:
-                        for byte_block in iter(lambda: f.read(4096),b""):
-                            sha256_hash.update(byte_block)                
-                    print('Local: ' + str(sha256_hash.hexdigest()))
-                    print('Remote: ' + str(entry['checksum']))
-
-                    if sha256_hash.hexdigest() == entry['checksum']:
-                        print('Checksums match!')
-                        # create new manifest entry    
-                        new_wordlists_manifest.write(str(entry['id']) + '|' + sha256_hash.hexdigest() + '|' + entry['path'].split('/')[-1] + '\n')
-                        # move & rename wordlist file to match that of whats expected in the hashcat command
-                        cmd = 'mv control/tmp/' + random_hex + ' control/wordlists/' + entry['path'].split('/')[-1]
-                        os.system(cmd)
-                    else:
-                        print('hashes dont match. what do we do now?')
-                        os.remove('control/tmp/' + random_hex)
+                    # download, decompress and verify wordlist file
+                    if download_file('wordlists', entry):
+                        # create new manifest entry
+                        new_wordlists_manifest.write(str(entry['id']) + '|' + entry['checksum'] + '|' + entry['path'].split('/')[-1] + '\n')
             
         # We've compared the two lists, now if we didnt have the entry before it means its a new wordlist file and we need to download it.
         if currently_has_wordlist == False:
             print('Downloading wordlist id: ' + str(entry['id']) + ' (' + entry['name'] + ')' )
-            # download wordlist file
-            random_hex = secrets.token_hex(8)
-            compressed_wordlists_file_content = api.get_wordlists_file(entry['id'])
-            local_compressed_wordlist = open('control/tmp/'+ random_hex + '.gz', 'wb')
-            local_compressed_wordlist.write(compressed_wordlists_file_content)
-            local_compressed_wordlist.close()
-
-            # decompress wordlist file
-            cmd = 'gunzip control/tmp/' + random_hex + '.gz'
-            os.system(cmd)
-            
-            # generate checksum
-            print('Comparing checksums')
-            sha256_hash = hashlib.sha256()
-            with open('control/tmp/'+random_hex, 'rb') as f:
-                for byte_block in iter(lambda: f.read(4096),b""):
-                    sha256_hash.update(byte_block)                
-            print('Local: ' + str(sha256_hash.hexdigest()))
-            print('Remote: ' + str(entry['checksum']))
-
-            if sha256_hash.hexdigest() == entry['checksum']:
-                print('Checksums match!')
-                # create new manifest entry    
-                new_wordlists_manifest.write(str(entry['id']) + '|' + sha256_hash.hexdigest() + '|' + entry['path'].split('/')[-1] + '\n')
-                # move & rename wordlists file to match that of whats expected in the hashcat command
-                cmd = 'mv control/tmp/' + random_hex + ' control/wordlists/' + entry['path'].split('/')[-1]
-                os.system(cmd)
-            else:
-                print('hashes dont match. what do we do now?')
-                os.remove('control/tmp/' + random_hex)
+            # download, decompress and verify wordlist file
+            if download_file('wordlists', entry):
+                # create new manifest entry
+                new_wordlists_manifest.write(str(entry['id']) + '|' + entry['checksum'] + '|' + entry['path'].split('/')[-1] + '\n')
         elif currently_has_wordlist == True and mismatched_wordlist == False:
             new_wordlists_manifest.write(str(entry['id']) + '|' + entry['checksum'] + '|' + entry['path'].split('/')[-1] + '\n')
     # move new manifest into correct directory
@@ -353,7 +289,24 @@ def killHashcat(pid):
         #p.terminate()
 
 def uploadCrackFile(file_path, hash_type):
-    return api.uploadCrackFile(file_path, hash_type)
+    # The offset of the last acknowledged upload is kept next to the crack file so we only ever
+    # send new cracks, even across agent restarts.
+    offset_file = file_path + '.offset'
+    offset = 0
+    if os.path.exists(offset_file):
+        with open(offset_file) as file:
+            with suppress(ValueError):
+                offset = int(file.read().strip())
+
+    response = api.uploadCrackFile(file_path, hash_type, offset)
+    if response is None:
+        # unexpected answer from the server, keep the offset so these cracks are sent again
+        print('[!] Crack file upload failed, will retry.')
+        return {'msg': 'Error'}
+    if response['msg'] == 'OK':
+        with open(offset_file, 'w') as file:
+            file.write(str(response['offset']))
+    return response
 
 def getHashType(hashfile_id):
     return api.getHashType(hashfile_id)
@@ -387,10 +340,6 @@ if __name__ == '__main__':
                 print("[*] Agent is unauthorized to connect to this server. Please contact Hashview Admin to grant its access.")
             if response['msg'] == 'START':
                 # We've been assigned a task
-                # First we'll sync our rules
-                sync_rules()
-                # And our wordlists
-                sync_wordlists()
                 print("[*] We've been assigned Task Id: " + str(response['job_task_id']))
                 job_task = jobTasks(response['job_task_id'])
 
@@ -410,7 +359,12 @@ if __name__ == '__main__':
                             if update_response['msg'] != 'OK':
                                 print('[!] Something broke during the updateing of the dynamic wordlist: ' + str(wordlist['id']))
                             else:
-                                print('[*] Update Complete')
+                                # sync_wordlists below only downloads it again if the checksum changed
+                                print('[*] Update Complete (generation ' + str(update_response.get('generation')) + ')')
+
+                # Sync our rules and wordlists, after the dynamic wordlist update so we pick up its latest version
+                sync_rules()
+                sync_wordlists()
 
 
                 # Get Job, so that we can get our hashfile
@@ -0,0 +1,55 @@
+"""Compare serial and multi-process parsing of a synthetic pwdump hashfile (no database involved).
+
+serial      parse_hashfile_lines in this process, what every upload uses by default
+parallel-N  parse_hashfile_parallel with N spawned processes, one byte range at a time, what large
+            uploads use with parallel_parse_processes = N in the [imports] section of config.conf
+
+    HASHVIEW_BENCH_LINES=10000000 HASHVIEW_BENCH_PROCESSES=1,2,4,8 python tests/benchmarks/hashfile_parsing.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from hashview.utils.hashfile_parsing import (  # noqa: E402
+    parse_hashfile_lines,
+    parse_hashfile_parallel,
+)
+
+
+def synthetic_pwdump(path, count):
+    with open(path, 'w') as file:
+        for number in range(count):
+            file.write(f'user{number}:{1000 + number}:aad3b435b51404eeaad3b435b51404ee:{number * 2654435761 % (1 << 128):032x}:::\n')
+
+
+def run(label, batches, count):
+    started = time.perf_counter()
+    rows = sum(len(batch) for batch in batches())
+    elapsed = time.perf_counter() - started
+    assert rows == count, rows
+    print(f'{label:<12} {elapsed:8.2f}s {count / elapsed:12.0f} lines/s')
+
+
+def main():
+    count = int(os.environ.get('HASHVIEW_BENCH_LINES', 10000000))
+    processes = [int(value) for value in os.environ.get('HASHVIEW_BENCH_PROCESSES', f'1,2,4,{os.cpu_count() or 1}').split(',')]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pwdump.txt')
+        synthetic_pwdump(path, count)
+        print(f'{count} pwdump lines, {os.path.getsize(path) / 1024 / 1024:.0f} MB, {os.cpu_count() or 1} cores')
+
+        def serial():
+            with open(path) as file:
+                yield from parse_hashfile_lines(file, 'pwdump', '1000', validate=True)
+
+        run('serial', serial, count)
+        for number in sorted(set(processes)):
+            run(f'parallel-{number}', lambda number=number: parse_hashfile_parallel(path, 'pwdump', '1000', validate=True, processes=number), count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Measure /v1/agents/heartbeat latency against a running Hashview server.
+
+Every simulated agent posts an Idle heartbeat every HASHVIEW_BENCH_INTERVAL
+seconds for HASHVIEW_BENCH_SECONDS. Agents that are not authorized yet still
+exercise the agent lookup and check-in write path.
+
+    HASHVIEW_API_URL=http://localhost:5000 HASHVIEW_BENCH_AGENTS=200 python tests/benchmarks/heartbeat_latency.py
+"""
+import os
+import statistics
+import threading
+import time
+import uuid as uuid_lib
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def agent_loop(api_url, agent_version, interval, deadline, samples, errors):
+    session = requests.Session()
+    session.cookies.set("uuid", str(uuid_lib.uuid4()))
+    session.cookies.set("agent_version", agent_version)
+    session.cookies.set("name", "bench-agent")
+
+    # spread the fleet over the interval like real agents
+    time.sleep(interval * (hash(session.cookies.get("uuid")) % 1000) / 1000)
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            response = session.post(
+                f"{api_url}/v1/agents/heartbeat",
+                json={"agent_status": "Idle", "hc_status": ""},
+                timeout=30,
+            )
+            response.raise_for_status()
+            samples.append(time.perf_counter() - started)
+        except requests.RequestException:
+            errors.append(1)
+        time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+def main() -> int:
+    api_url = os.getenv("HASHVIEW_API_URL", "http://localhost:5000")
+    agent_version = os.getenv("HASHVIEW_AGENT_VERSION", "0.8.1")
+    agents = int(os.getenv("HASHVIEW_BENCH_AGENTS", "50"))
+    interval = float(os.getenv("HASHVIEW_BENCH_INTERVAL", "10"))
+    seconds = float(os.getenv("HASHVIEW_BENCH_SECONDS", "60"))
+
+    samples, errors = [], []
+    deadline = time.time() + seconds
+    threads = [
+        threading.Thread(target=agent_loop, args=(api_url, agent_version, interval, deadline, samples, errors))
+        for _ in range(agents)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if not samples:
+        print("NO SAMPLES")
+        return 1
+    print(f"agents={agents} interval={interval}s requests={len(samples)} errors={len(errors)}")
+    print(f"p50={percentile(samples, 50) * 1000:.1f}ms p99={percentile(samples, 99) * 1000:.1f}ms mean={statistics.mean(samples) * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+"""Compare the ways of building the charset (fig4) and mask (fig7) breakdowns of recovered plaintexts.
+
+regex       the per row re.sub path the analytics page used to run
+per-row     PlaintextAggregate.add, one str.translate per plaintext
+vectorized  PlaintextAggregate.update with numpy (hashview.analytics.classify)
+classify    classify.summarize_plaintexts alone, without the password and username figures
+
+    HASHVIEW_BENCH_PLAINTEXTS=1000000 python tests/benchmarks/plaintext_classification.py
+"""
+import os
+import random
+import re
+import string
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from hashview.analytics import classify  # noqa: E402
+from hashview.analytics.aggregate import PlaintextAggregate  # noqa: E402
+
+
+def synthetic_plaintexts(count, seed=1):
+    rng = random.Random(seed)
+    words = ['password', 'summer', 'welcome', 'dragon', 'monkey', 'letmein', 'football', 'Company']
+    suffixes = ['', '1', '123', '!', '2024', '2024!', '#1', '99']
+    plaintexts = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            word = rng.choice(words)
+            if rng.random() < 0.5:
+                word = word.capitalize()
+            plaintext = word + rng.choice(suffixes)
+        else:
+            plaintext = ''.join(rng.choice(string.printable[:94]) for _ in range(rng.randint(1, 16)))
+        plaintexts.append(plaintext.encode('latin-1').hex().upper())
+    return plaintexts
+
+
+def regex_path(plaintexts):
+    charsets = Counter()
+    masks = Counter()
+    for entry in plaintexts:
+        tmp_plaintext = bytes.fromhex(entry).decode('latin-1')
+        tmp_plaintext = re.sub(r"[A-Z]", 'U', tmp_plaintext)
+        tmp_plaintext = re.sub(r"[a-z]", 'L', tmp_plaintext)
+        tmp_plaintext = re.sub(r"[0-9]", 'D', tmp_plaintext)
+        tmp_plaintext = re.sub(r"[^0-9A-Za-z]", 'S', tmp_plaintext)
+        charsets[frozenset(tmp_plaintext)] += 1
+        tmp_plaintext = re.sub(r"U", '?u', tmp_plaintext)
+        tmp_plaintext = re.sub(r"L", '?l', tmp_plaintext)
+        tmp_plaintext = re.sub(r"D", '?d', tmp_plaintext)
+        tmp_plaintext = re.sub(r"S", '?s', tmp_plaintext)
+        masks[tmp_plaintext] += 1
+    return masks
+
+
+def per_row_path(plaintexts):
+    aggregate = PlaintextAggregate()
+    for plaintext in plaintexts:
+        aggregate.add(plaintext)
+    return aggregate.masks
+
+
+def vectorized_path(plaintexts):
+    return PlaintextAggregate().update((plaintext, None) for plaintext in plaintexts).masks
+
+
+def classify_path(plaintexts):
+    masks = Counter()
+    for offset in range(0, len(plaintexts), 10000):
+        masks.update(classify.summarize_plaintexts(plaintexts[offset:offset + 10000])[2])
+    return masks
+
+
+def timed(name, function, plaintexts):
+    started = time.perf_counter()
+    masks = function(plaintexts)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<11} {elapsed:8.2f}s {len(plaintexts) / elapsed:12,.0f} plaintexts/s")
+    return masks
+
+
+def main():
+    count = int(os.environ.get('HASHVIEW_BENCH_PLAINTEXTS', '1000000'))
+    plaintexts = synthetic_plaintexts(count)
+    print(f"{count:,} synthetic plaintexts")
+
+    reference = timed('regex', regex_path, plaintexts)
+    assert timed('per-row', per_row_path, plaintexts) == reference
+    if classify.is_available():
+        assert timed('vectorized', vectorized_path, plaintexts) == reference
+        assert timed('classify', classify_path, plaintexts) == reference
+    else:
+        print('vectorized  skipped, numpy is not installed')
+
+
+if __name__ == '__main__':
+    main()
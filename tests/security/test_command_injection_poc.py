@@ -51,10 +51,9 @@ def test_rules_download_command_injection_poc(monkeypatch):
 
         monkeypatch.setattr(
             api_routes,
-            "send_from_directory",
+            "send_file",
             lambda *args, **kwargs: Response("ok", status=200),
         )
-        monkeypatch.setattr(api_routes.subprocess, "run", lambda *a, **k: None)
 
         client = app.test_client()
         client.set_cookie("uuid", "test-api-key")
@@ -63,7 +62,7 @@ def test_rules_download_command_injection_poc(monkeypatch):
 
 
 @pytest.mark.security
-def test_rules_download_uses_subprocess_run_list_args(monkeypatch, tmp_path):
+def test_rules_download_compresses_in_process(monkeypatch, tmp_path):
     app = create_app(
         testing=True,
         config_overrides={
@@ -101,17 +100,22 @@ def test_rules_download_uses_subprocess_run_list_args(monkeypatch, tmp_path):
 
         captured = {}
 
-        def fake_run(args, **kwargs):
-            captured["args"] = args
-            captured["kwargs"] = kwargs
-            return None
+        def fake_get_compressed_artifact(source_path, checksum):
+            captured["source_path"] = source_path
+            captured["checksum"] = checksum
+            return "cached.gz"
+
+        def fail_system(*args, **kwargs):
+            raise AssertionError("downloads must not shell out")
 
         import hashview.api.routes as api_routes
 
-        monkeypatch.setattr(api_routes.subprocess, "run", fake_run)
+        monkeypatch.setattr(api_routes.os, "system", fail_system)
+        monkeypatch.setattr(api_routes.os.path, "isfile", lambda path: True)
+        monkeypatch.setattr(api_routes, "get_compressed_artifact", fake_get_compressed_artifact)
         monkeypatch.setattr(
             api_routes,
-            "send_from_directory",
+            "send_file",
             lambda *args, **kwargs: Response("ok", status=200),
         )
 
@@ -120,9 +124,8 @@ def test_rules_download_uses_subprocess_run_list_args(monkeypatch, tmp_path):
         resp = client.get(f"/v1/rules/{rule.id}")
 
         assert resp.status_code == 200
-        assert isinstance(captured["args"], list)
-        assert captured["args"][:3] == ["gzip", "-9", "-k"]
-        assert captured["kwargs"].get("check") is True
+        assert captured["source_path"].endswith("control/rules/safe.rule")
+        assert captured["checksum"] == "0" * 64
 
 
 @pytest.mark.security
@@ -166,10 +169,9 @@ def test_rules_download_rejects_invalid_extension(monkeypatch):
 
         monkeypatch.setattr(
             api_routes,
-            "send_from_directory",
+            "send_file",
             lambda *args, **kwargs: Response("ok", status=200),
         )
-        monkeypatch.setattr(api_routes.subprocess, "run", lambda *a, **k: None)
 
         client = app.test_client()
         client.set_cookie("uuid", "test-api-key")
@@ -0,0 +1,64 @@
+import pytest
+from flask import Flask
+
+from hashview.analytics import figures
+from hashview.api.routes import api
+from hashview.models import Agents, db
+from hashview.utils import agent_status
+from hashview.utils.utils import clear_authorization_cache
+
+AGENT_UUID = "11111111-2222-3333-4444-555555555555"
+
+
+# Unit tests run against an in-memory database and never touch a browser or
+# live host, so the e2e autouse fixtures from tests/conftest.py are replaced.
+@pytest.fixture(autouse=True)
+def ensure_setup():
+    return None
+
+
+@pytest.fixture(autouse=True)
+def configure_page():
+    return None
+
+
+@pytest.fixture(autouse=True)
+def agent_status_buffer(monkeypatch):
+    """Keep the write-behind buffer empty and flushed by hand"""
+    monkeypatch.setattr(agent_status, "_start_flusher", lambda: None)
+    monkeypatch.setattr(agent_status, "_buffer", {})
+
+
+@pytest.fixture(autouse=True)
+def figure_cache(monkeypatch):
+    """Every test starts with an empty analytics figure cache"""
+    monkeypatch.setattr(figures, "_cache", {})
+    monkeypatch.setattr(figures, "_scope_locks", {})
+
+
+@pytest.fixture()
+def app():
+    app = Flask("hashview")
+    app.config.update(
+        SECRET_KEY="test-secret-key",
+        SQLALCHEMY_DATABASE_URI="sqlite://",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture()
+def client(app):
+    """Test client authenticated as an authorized agent"""
+    clear_authorization_cache()
+    app.register_blueprint(api)
+    db.session.add(Agents(name="agent", src_ip="127.0.0.1", uuid=AGENT_UUID, status="Working"))
+    db.session.commit()
+    client = app.test_client()
+    client.set_cookie("uuid", AGENT_UUID)
+    return client
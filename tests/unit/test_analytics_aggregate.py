@@ -0,0 +1,58 @@
+from hashview.analytics.aggregate import BLANK_LABEL, PlaintextAggregate
+
+
+def _hex(value):
+    return value.encode('latin-1').hex().upper()
+
+
+def test_aggregate_matches_page_figures():
+    rows = [
+        (_hex("Password1"), _hex("CORP\\alice")),
+        (_hex("Password1"), _hex("bob")),
+        (_hex("summer"), _hex("summer")),
+        (_hex(""), _hex("carol")),
+        (_hex("caf\xe9!"), None),
+        (_hex("12345678"), _hex("*12345678")),
+    ]
+
+    aggregate = PlaintextAggregate().update(rows)
+
+    assert aggregate.total == 6
+    assert (aggregate.meets_complexity, aggregate.fails_complexity) == (2, 4)
+    charsets = dict(aggregate.charset_counts())
+    assert charsets["MixedAlphaNumeric"] == 2
+    assert charsets["LowerAlpha Only"] == 1
+    assert charsets["Blank (unset)"] == 1
+    assert charsets["LowerAlphaSpecial"] == 1
+    assert charsets["Numeric Only"] == 1
+    assert aggregate.top_lengths() == [(0, 1), (5, 1), (6, 1), (8, 1), (9, 2)]
+    assert aggregate.top_passwords(2) == [("Password1", 2), ("summer", 1)]
+    assert (BLANK_LABEL, 1) in aggregate.top_passwords()
+    assert aggregate.top_masks(1) == [("?u?l?l?l?l?l?l?l?d", 2)]
+    assert aggregate.masks["?l?l?l?s?s"] == 1
+    assert aggregate.username_matches == ["summer", "12345678"]
+
+
+def test_analytics_page_figures(app):
+    import hashview.analytics.routes as analytics_routes
+    from hashview.models import HashfileHashes, Hashes, Hashfiles, db
+    from hashview.utils.utils import get_md5_hash
+
+    db.session.add(Hashfiles(id=1, name="hashes.txt", customer_id=1, owner_id=1))
+    for i, plaintext in enumerate(["Password1", "letmein", None]):
+        record = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(str(i)), ciphertext=str(i), cracked=plaintext is not None, plaintext=_hex(plaintext) if plaintext else None)
+        db.session.add(record)
+        db.session.flush()
+        db.session.add(HashfileHashes(hash_id=record.id, hashfile_id=1, username=_hex(f"user{i}")))
+    db.session.commit()
+
+    def figure(name):
+        with app.test_request_context("/analytics/data/" + name):
+            return analytics_routes.analytics_figure.__wrapped__(name).get_json()
+
+    assert figure("fig1")["values"] == [2, 1]
+    assert figure("fig2")["values"] == [1, 1, 1]
+    assert figure("fig6")["labels"] == ["Password1", "letmein"]
+    assert figure("fig7")["total"] == 2
+    assert figure("fig5")["labels"] == [7, 9]
+    assert figure("stats")["total_accounts"] == "3"
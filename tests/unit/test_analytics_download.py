@@ -0,0 +1,52 @@
+import gzip
+
+import hashview.analytics.routes as analytics_routes
+from hashview.models import HashfileHashes, Hashes, Hashfiles, db
+from hashview.utils.utils import get_md5_hash
+
+
+def _hex(value):
+    return value.encode('latin-1').hex().upper()
+
+
+def _setup(monkeypatch):
+    monkeypatch.setattr(analytics_routes, "ANALYTICS_EXPORT_BATCH_SIZE", 2)
+    db.session.add(Hashfiles(id=1, name="a.txt", customer_id=1, owner_id=1))
+    db.session.add(Hashfiles(id=2, name="b.txt", customer_id=2, owner_id=1))
+    rows = [(1, "alice", "aa", "caf\xe9"), (1, None, "bb", "x"), (1, "bob", "cc", None), (2, "carol", "dd", "y")]
+    for hashfile_id, username, ciphertext, plaintext in rows:
+        record = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=plaintext is not None, plaintext=_hex(plaintext) if plaintext else None)
+        db.session.add(record)
+        db.session.flush()
+        db.session.add(HashfileHashes(hash_id=record.id, hashfile_id=hashfile_id, username=_hex(username) if username else None))
+    db.session.commit()
+
+
+def _download(app, query, headers=None):
+    with app.test_request_context("/analytics/download" + query, headers=headers or {}):
+        response = analytics_routes.analytics_download_hashes.__wrapped__()
+        return response, b"".join(response.response)
+
+
+def test_found_download_streams_decoded_accounts(app, monkeypatch):
+    _setup(monkeypatch)
+
+    response, data = _download(app, "?type=found&customer_id=1")
+
+    assert response.headers["Content-Disposition"] == "attachment; filename=found_1_all.txt"
+    assert sorted(data.decode("utf-8").splitlines()) == ["alice:aa:caf\xe9", "bb:x"]
+
+
+def test_left_download_gzip(app, monkeypatch):
+    _setup(monkeypatch)
+
+    response, data = _download(app, "?type=left&customer_id=1&hashfile_id=1", {"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Content-Disposition"] == "attachment; filename=left_1_1.txt"
+    assert gzip.decompress(data).decode("utf-8") == "bob:cc\n"
+
+
+def test_invalid_type_redirects(app):
+    response, _ = _download(app, "?type=other")
+    assert response.status_code == 302
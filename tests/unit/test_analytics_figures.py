@@ -0,0 +1,81 @@
+import pytest
+from werkzeug.exceptions import NotFound
+
+import hashview.analytics.figures as figures
+import hashview.analytics.routes as analytics_routes
+from hashview.models import HashfileHashes, Hashes, Hashfiles, db
+from hashview.utils.utils import get_md5_hash, import_cracked_hashes
+
+CIPHERTEXT = "8846f7eaee8fb117ad06bdd830b7586c"
+
+
+def _setup():
+    db.session.add(Hashfiles(id=1, name="hashes.txt", customer_id=1, owner_id=1))
+    record = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(CIPHERTEXT), ciphertext=CIPHERTEXT, cracked=False)
+    db.session.add(record)
+    db.session.flush()
+    db.session.add(HashfileHashes(hash_id=record.id, hashfile_id=1))
+    db.session.commit()
+
+
+def test_repeat_views_are_served_from_cache(app, monkeypatch):
+    _setup()
+    builds = []
+    build_figures = figures.build_figures
+    monkeypatch.setattr(figures, "build_figures", lambda *scope: builds.append(scope) or build_figures(*scope))
+
+    assert figures.get_figures()["fig1"]["values"] == [0, 1]
+    assert figures.get_figures()["fig3"]["values"] == [0, 1]
+    assert figures.get_figures("1", "1")["fig1"]["values"] == [0, 1]
+    assert builds == [(None, None), ("1", "1")]
+
+
+def test_crack_ingestion_invalidates_cache(app):
+    _setup()
+    assert figures.get_figures()["fig1"]["values"] == [0, 1]
+
+    import_cracked_hashes(1000, CIPHERTEXT + ":41\n")
+
+    assert figures.get_figures()["fig1"]["values"] == [1, 0]
+    assert figures.get_figures()["fig6"]["labels"] == ["A"]
+
+
+def test_slow_build_only_blocks_its_own_scope(monkeypatch):
+    import threading
+
+    building = threading.Event()
+    release = threading.Event()
+    builds = []
+
+    def build_figures(*scope):
+        builds.append(scope)
+        if scope == ("1", None):
+            building.set()
+            assert release.wait(5)
+        return {"scope": scope}
+
+    monkeypatch.setattr(figures, "get_figures_version", lambda: 1)
+    monkeypatch.setattr(figures, "build_figures", build_figures)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(figures.get_figures("1"))) for _ in range(3)]
+    threads[0].start()
+    assert building.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+
+    # another scope is served while the first one is still being built
+    assert figures.get_figures("2") == {"scope": ("2", None)}
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    # single flight: the waiting requests got the figures of the one build
+    assert results == [{"scope": ("1", None)}] * 3
+    assert builds.count(("1", None)) == 1
+
+
+def test_unknown_figure_is_404(app):
+    with app.test_request_context("/analytics/data/fig9"):
+        with pytest.raises(NotFound):
+            analytics_routes.analytics_figure.__wrapped__("fig9")
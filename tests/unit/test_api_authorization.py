@@ -0,0 +1,71 @@
+from sqlalchemy import event
+
+from hashview.api.routes import agent_authorized, update_heartbeat
+from hashview.models import Agents, db
+from hashview.utils import agent_status, utils
+
+AGENT_UUID = "11111111-2222-3333-4444-555555555555"
+
+
+def test_agent_authorization_is_cached_until_cleared(client):
+    assert agent_authorized(AGENT_UUID)
+
+    Agents.query.filter_by(uuid=AGENT_UUID).one().status = "Pending"
+    db.session.commit()
+    assert agent_authorized(AGENT_UUID)
+
+    # agents_deauthorize clears the cache
+    utils.clear_authorization_cache()
+    assert not agent_authorized(AGENT_UUID)
+
+
+def test_authorized_requests_skip_auth_queries(client):
+    client.get("/v1/rules")
+    statements = []
+    engine = db.engine
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        client.get("/v1/rules")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert not [statement for statement in statements if "FROM users" in statement or "FROM agents" in statement or "UPDATE agents" in statement]
+
+
+def test_checkins_are_written_behind_in_one_batch(client, app):
+    db.session.add(Agents(name="second", src_ip="127.0.0.1", uuid="second-agent", status="Idle"))
+    db.session.commit()
+
+    with app.test_request_context(environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        update_heartbeat(AGENT_UUID)
+        update_heartbeat("second-agent")
+    assert Agents.query.filter_by(uuid=AGENT_UUID).one().last_checkin is None
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(executemany)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        assert agent_status.flush_agent_status() == 2
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert statements == [True]
+    db.session.expire_all()
+    assert {agent.src_ip for agent in Agents.query.all()} == {"10.0.0.1"}
+    assert Agents.query.filter_by(uuid=AGENT_UUID).one().last_checkin is not None
+
+
+def test_readers_see_buffered_status(client):
+    agent_status.buffer_agent_status(AGENT_UUID, hc_status='{"Recovered": "1/2"}')
+
+    agent = agent_status.overlay_agent_status(Agents.query.all())[0]
+
+    assert agent.hc_status == '{"Recovered": "1/2"}'
+    assert agent not in db.session.dirty
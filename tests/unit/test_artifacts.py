@@ -0,0 +1,120 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+from flask import Flask
+
+from hashview.utils import artifacts
+
+
+@pytest.fixture()
+def artifact_app(tmp_path):
+    app = Flask("hashview", root_path=str(tmp_path))
+    with app.app_context():
+        yield app
+
+
+def _source(tmp_path, name, contents):
+    path = tmp_path / name
+    path.write_bytes(contents)
+    return str(path), hashlib.sha256(contents).hexdigest()
+
+
+def test_artifact_is_built_once_per_checksum(artifact_app, tmp_path, monkeypatch):
+    source_path, checksum = _source(tmp_path, "words.txt", b"password\nletmein\n")
+
+    artifact_path = artifacts.get_compressed_artifact(source_path, checksum)
+    with gzip.open(artifact_path, "rb") as artifact:
+        assert artifact.read() == b"password\nletmein\n"
+
+    def fail_build(*args):
+        raise AssertionError("artifact was rebuilt")
+
+    monkeypatch.setattr(artifacts, "_build_artifact", fail_build)
+    assert artifacts.get_compressed_artifact(source_path, checksum) == artifact_path
+
+
+def test_rebuilt_artifact_is_byte_identical(artifact_app, tmp_path, monkeypatch):
+    source_path, checksum = _source(tmp_path, "words.txt", b"password\nletmein\n")
+    artifact_path = artifacts.get_compressed_artifact(source_path, checksum)
+    with open(artifact_path, "rb") as artifact:
+        first = artifact.read()
+
+    # evicted, then rebuilt later by another process
+    os.remove(artifact_path)
+    monkeypatch.setattr(os, "getpid", lambda: 12345)
+    monkeypatch.setattr("time.time", lambda: 2000000000.0)
+    artifact_path = artifacts.get_compressed_artifact(source_path, checksum)
+    with open(artifact_path, "rb") as artifact:
+        assert artifact.read() == first
+
+
+def test_artifact_eviction_keeps_newest(artifact_app, tmp_path):
+    first_path, first_checksum = _source(tmp_path, "a.txt", os.urandom(4096))
+    second_path, second_checksum = _source(tmp_path, "b.txt", os.urandom(4096))
+    artifact_app.config["ARTIFACT_CACHE_MAX_BYTES"] = 6000
+
+    first = artifacts.get_compressed_artifact(first_path, first_checksum)
+    os.utime(first, (1, 1))
+    second = artifacts.get_compressed_artifact(second_path, second_checksum)
+
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+
+
+@pytest.mark.parametrize("name,valid", [
+    ("0123abcd.txt", True),
+    ("best64.rule", True),
+    ("evil; whoami; #.rule", False),
+    ("../etc/passwd.txt", False),
+    ("bad.exe", False),
+])
+def test_artifact_name_validation(name, valid):
+    assert artifacts.is_valid_artifact_name(name) is valid
+
+
+def test_rules_download_serves_cached_artifact(client, app, tmp_path, monkeypatch):
+    from hashview.models import Rules, db
+
+    rules_dir = tmp_path / "control" / "rules"
+    rules_dir.mkdir(parents=True)
+    contents = b":\nc\n"
+    (rules_dir / "best64.rule").write_bytes(contents)
+    checksum = hashlib.sha256(contents).hexdigest()
+    monkeypatch.setattr(app, "root_path", str(tmp_path))
+    db.session.add(Rules(name="best64", owner_id=1, path=str(rules_dir / "best64.rule"), size=2, checksum=checksum))
+    db.session.commit()
+
+    response = client.get("/v1/rules/1")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"' + checksum + '"'
+    assert int(response.headers["Content-Length"]) == len(response.get_data())
+    assert gzip.decompress(response.get_data()) == contents
+
+    assert client.get("/v1/rules/1", headers={"If-None-Match": '"' + checksum + '"'}).status_code == 304
+
+
+def test_wordlist_download_honors_range(client, app, tmp_path, monkeypatch):
+    from hashview.models import Wordlists, db
+
+    wordlists_dir = tmp_path / "control" / "wordlists"
+    wordlists_dir.mkdir(parents=True)
+    contents = os.urandom(10000)
+    (wordlists_dir / "0123abcd.txt").write_bytes(contents)
+    checksum = hashlib.sha256(contents).hexdigest()
+    monkeypatch.setattr(app, "root_path", str(tmp_path))
+    db.session.add(Wordlists(name="random", owner_id=1, type="static", path=str(wordlists_dir / "0123abcd.txt"), size=1, checksum=checksum))
+    db.session.commit()
+
+    full = client.get("/v1/wordlists/1").get_data()
+    partial = client.get("/v1/wordlists/1", headers={"Range": "bytes=100-", "If-Range": '"' + checksum + '"'})
+
+    assert partial.status_code == 206
+    assert full[:100] + partial.get_data() == full
+    assert gzip.decompress(full) == contents
+
+    # a stale If-Range gets the whole file again
+    stale = client.get("/v1/wordlists/1", headers={"Range": "bytes=100-", "If-Range": '"' + "0" * 64 + '"'})
+    assert stale.status_code == 200
+    assert stale.get_data() == full
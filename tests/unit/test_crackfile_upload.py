@@ -0,0 +1,42 @@
+from hashview.models import Hashes, db
+from hashview.utils.utils import get_md5_hash
+
+
+def test_upload_with_offset_imports_complete_lines_only(client):
+    first = "8846f7eaee8fb117ad06bdd830b7586c"
+    second = "31d6cfe0d16ae931b73c59d7e0c089c0"
+    for ciphertext in (first, second):
+        db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=False))
+    db.session.commit()
+
+    # second line is still being written by hashcat
+    contents = first + ":70617373776f7264\n" + second + ":41"
+    response = client.post("/v1/uploadCrackFile/1000", json={"file": contents, "offset": 100}).get_json()
+
+    assert response["new"] == 1
+    assert response["offset"] == 100 + len(first + ":70617373776f7264\n")
+    assert not Hashes.query.filter_by(ciphertext=second).one().cracked
+
+
+def test_upload_without_offset_keeps_old_behaviour(client):
+    ciphertext = "8846f7eaee8fb117ad06bdd830b7586c"
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=False))
+    db.session.commit()
+
+    response = client.post("/v1/uploadCrackFile/1000", json={"file": ciphertext + ":41"}).get_json()
+
+    assert response["new"] == 1
+    assert "offset" not in response
+
+
+def test_upload_offset_counts_bytes_of_non_ascii_hashes(client):
+    # NetNTLM lines carry the user and domain, which may be non-ASCII
+    ciphertext = "jösé::DOMÄIN:1122334455667788:" + "a" * 32 + ":0101"
+    db.session.add(Hashes(hash_type=5600, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=False))
+    db.session.commit()
+
+    line = ciphertext + ":41\n"
+    response = client.post("/v1/uploadCrackFile/5600", json={"file": line, "offset": 10}).get_json()
+
+    assert response["new"] == 1
+    assert response["offset"] == 10 + len(line.encode("utf-8"))
@@ -0,0 +1,102 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask_mail import Mail
+
+from hashview.models import HashfileHashes, HashNotifications, Hashes, Hashfiles, HashfileSummaries, Jobs, JobTasks, Settings, Users, db
+from hashview.scheduler import _data_retention_cleanup_inner
+import hashview.scheduler as scheduler
+from hashview.utils.utils import get_md5_hash
+
+
+class Mailer:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+def _hash(hashfile_ids, ciphertext, cracked=False):
+    record = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=cracked, plaintext="41" if cracked else None)
+    db.session.add(record)
+    db.session.flush()
+    for hashfile_id in hashfile_ids:
+        db.session.add(HashfileHashes(hash_id=record.id, hashfile_id=hashfile_id))
+    return record
+
+
+def test_retention_cleanup_is_set_based(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "RETENTION_BATCH_SIZE", 2)
+    app.config["MAIL_DEFAULT_SENDER"] = "hashview@example.com"
+    Mail(app)
+    old = datetime.today() - timedelta(days=60)
+    db.session.add(Settings(id=1, retention_period=30))
+    db.session.add(Users(id=1, first_name="Alice", last_name="A", email_address="alice@example.com", password="x"))
+    db.session.add(Users(id=2, first_name="Bob", last_name="B", email_address="bob@example.com", password="x"))
+    db.session.add(Hashfiles(id=1, name="old.txt", customer_id=1, owner_id=1, uploaded_at=old))
+    db.session.add(Hashfiles(id=2, name="new.txt", customer_id=1, owner_id=2))
+    db.session.add(HashfileSummaries(hashfile_id=1, customer_id=1))
+    db.session.add(Jobs(id=1, name="old job", status="Completed", customer_id=1, owner_id=1, created_at=old))
+    db.session.add(Jobs(id=2, name="new job on old hashfile", status="Ready", customer_id=1, owner_id=1, hashfile_id=1))
+    db.session.add(Jobs(id=3, name="new job", status="Ready", customer_id=1, owner_id=2, hashfile_id=2))
+    db.session.add(JobTasks(job_id=1, task_id=1, status="Completed"))
+    db.session.add(JobTasks(job_id=3, task_id=1, status="Ready"))
+    orphan = _hash([1], "aa")
+    db.session.add(HashNotifications(owner_id=1, hash_id=orphan.id, method="email"))
+    _hash([1, 2], "bb")
+    _hash([1], "cc", cracked=True)
+    for i in range(3):
+        _hash([1], f"d{i}")
+    db.session.commit()
+
+    tmp_dir = tmp_path / "hashview" / "control" / "tmp"
+    tmp_dir.mkdir(parents=True)
+    (tmp_dir / "stale").write_text("x")
+    os.utime(tmp_dir / "stale", (time.time() - 40 * 86400,) * 2)
+    (tmp_dir / "fresh").write_text("x")
+    monkeypatch.chdir(tmp_path)
+
+    mailer = Mailer()
+    _data_retention_cleanup_inner(db, mailer, logging.getLogger("test"))
+
+    assert [job.id for job in Jobs.query.all()] == [3]
+    assert [task.job_id for task in JobTasks.query.all()] == [3]
+    assert [hashfile.id for hashfile in Hashfiles.query.all()] == [2]
+    assert HashfileHashes.query.filter_by(hashfile_id=1).count() == 0
+    assert HashfileSummaries.query.count() == 0
+    assert {record.ciphertext for record in Hashes.query.all()} == {"bb", "cc"}
+    assert HashNotifications.query.count() == 0
+    assert sorted(child.name for child in tmp_dir.iterdir()) == ["fresh"]
+
+    # one email for alice covering both jobs and the hashfile, nothing for bob
+    assert [message.recipients for message in mailer.sent] == [["alice@example.com"]]
+    assert "old job" in mailer.sent[0].body
+    assert "new job on old hashfile" in mailer.sent[0].body
+    assert '"old.txt" was removed' in mailer.sent[0].body
+
+
+def test_retention_cleanup_renews_its_lock_and_stops_once_lost(app, monkeypatch):
+    monkeypatch.setattr(scheduler, "RETENTION_BATCH_SIZE", 1)
+    db.session.add(Settings(id=1, retention_period=30))
+    db.session.add(Hashfiles(id=1, name="old.txt", customer_id=1, owner_id=1, uploaded_at=datetime.today() - timedelta(days=60)))
+    for i in range(3):
+        _hash([1], f"e{i}")
+    db.session.commit()
+
+    renewals = []
+
+    def renew_lock():
+        renewals.append(True)
+        # another worker took the lock over after the second batch
+        return len(renewals) < 2
+
+    with pytest.raises(RuntimeError):
+        _data_retention_cleanup_inner(db, Mailer(), logging.getLogger("test"), renew_lock)
+
+    assert len(renewals) == 2
+    assert HashfileHashes.query.filter_by(hashfile_id=1).count() == 1
+    assert Hashfiles.query.get(1) is not None
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from hashview.models import Hashes, Wordlists, db
+from hashview.utils.utils import get_filehash, get_linecount, get_md5_hash, import_cracked_hashes, update_dynamic_wordlist
+
+
+def _add_hash(ciphertext, plaintext=None):
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=plaintext is not None, plaintext=plaintext))
+
+
+@pytest.fixture()
+def wordlist(app, tmp_path):
+    path = tmp_path / "dynamic-all.txt"
+    path.write_bytes(b"")
+    wordlist = Wordlists(name="All Recovered Hashes", owner_id=1, type="dynamic", path=str(path), size=0, checksum=get_filehash(str(path)))
+    db.session.add(wordlist)
+    _add_hash(f"{1:032x}", b"password".hex().upper())
+    _add_hash(f"{2:032x}", b"password".hex().upper())
+    _add_hash(f"{3:032x}", b"caf\xe9".hex().upper())
+    _add_hash(f"{4:032x}")
+    _add_hash(f"{5:032x}")
+    db.session.commit()
+    return wordlist
+
+
+def _assert_consistent(wordlist):
+    assert wordlist.checksum == get_filehash(wordlist.path)
+    assert wordlist.size == get_linecount(wordlist.path)
+
+
+def test_dynamic_wordlist_rebuild_without_index(wordlist):
+    update_dynamic_wordlist(wordlist.id)
+
+    with open(wordlist.path, "rb") as file:
+        assert sorted(file.read().splitlines()) == [b"caf\xe9", b"password"]
+    assert os.path.exists(wordlist.path + ".idx")
+    _assert_consistent(wordlist)
+
+
+def test_dynamic_wordlist_appends_only_new_plaintexts(wordlist):
+    update_dynamic_wordlist(wordlist.id)
+    with open(wordlist.path, "rb") as file:
+        before = file.read()
+
+    # one new plaintext and one that is already in the list
+    import_cracked_hashes(1000, f"{4:032x}:{b'letmein'.hex()}\n{5:032x}:{b'password'.hex()}\n")
+    update_dynamic_wordlist(wordlist.id)
+
+    with open(wordlist.path, "rb") as file:
+        assert file.read() == before + b"letmein\n"
+    assert os.path.getsize(wordlist.path + ".pending") == 0
+    _assert_consistent(wordlist)
+
+
+def test_dynamic_wordlist_untouched_without_new_cracks(wordlist):
+    update_dynamic_wordlist(wordlist.id)
+    inode = os.stat(wordlist.path).st_ino
+
+    update_dynamic_wordlist(wordlist.id)
+
+    assert os.stat(wordlist.path).st_ino == inode
+    _assert_consistent(wordlist)
+
+
+def test_dynamic_wordlist_generation_only_bumps_on_change(wordlist):
+    update_dynamic_wordlist(wordlist.id)
+    assert wordlist.generation == 1
+
+    update_dynamic_wordlist(wordlist.id)
+    assert wordlist.generation == 1
+
+    import_cracked_hashes(1000, f"{4:032x}:{b'letmein'.hex()}\n")
+    update_dynamic_wordlist(wordlist.id)
+    assert wordlist.generation == 2
+
+
+def test_update_wordlist_route_reports_generation(client, wordlist):
+    response = client.get(f"/v1/updateWordlist/{wordlist.id}").get_json()
+
+    assert response["generation"] == 1
+    assert response["checksum"] == get_filehash(wordlist.path)
+
+
+def test_dynamic_wordlist_waits_for_running_update(wordlist, monkeypatch):
+    import fcntl
+    import threading
+
+    import hashview.utils.utils as utils
+
+    update_dynamic_wordlist(wordlist.id)
+    import_cracked_hashes(1000, f"{4:032x}:{b'letmein'.hex()}\n")
+
+    writes = []
+    original = utils._write_dynamic_wordlist
+    monkeypatch.setattr(utils, "_write_dynamic_wordlist", lambda *args: writes.append(args) or original(*args))
+
+    # Hold the lock like an in-progress update would, then let it go once the second caller is waiting
+    lock_file = open(wordlist.path + ".lock", "w")
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    timer = threading.Timer(0.2, lock_file.close)
+    timer.start()
+    update_dynamic_wordlist(wordlist.id)
+    timer.join()
+    update_dynamic_wordlist(wordlist.id)
+
+    assert len(writes) == 1
+    assert wordlist.generation == 2
@@ -0,0 +1,41 @@
+import gzip
+
+from hashview.models import HashfileHashes, Hashes, db
+from hashview.utils.utils import get_md5_hash
+
+
+def _add_hash(hashfile_id, ciphertext, cracked=False):
+    record = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=cracked)
+    db.session.add(record)
+    db.session.flush()
+    db.session.add(HashfileHashes(hash_id=record.id, hashfile_id=hashfile_id))
+
+
+def _setup_hashfile(monkeypatch):
+    import hashview.api.routes as api_routes
+
+    monkeypatch.setattr(api_routes, "HASHFILE_EXPORT_BATCH_SIZE", 2)
+    for i in range(5):
+        _add_hash(1, f"{i:032x}")
+    _add_hash(1, f"{99:032x}", cracked=True)
+    _add_hash(2, f"{100:032x}")
+    db.session.commit()
+    return [f"{i:032x}" for i in range(5)]
+
+
+def test_hashfile_export_streams_uncracked_hashes(client, monkeypatch):
+    expected = _setup_hashfile(monkeypatch)
+
+    response = client.get("/v1/hashfiles/1", headers={"Accept-Encoding": "identity"})
+
+    assert response.headers.get("Content-Encoding") is None
+    assert sorted(response.get_data(as_text=True).splitlines()) == expected
+
+
+def test_hashfile_export_gzip(client, monkeypatch):
+    expected = _setup_hashfile(monkeypatch)
+
+    response = client.get("/v1/hashfiles/1", headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert sorted(gzip.decompress(response.get_data()).decode().splitlines()) == expected
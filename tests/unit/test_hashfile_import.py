@@ -0,0 +1,181 @@
+import pytest
+
+import hashview.utils.utils as utils
+from hashview.models import HashfileHashes, Hashes, db
+from hashview.utils.utils import get_md5_hash, import_hashfilehashes, parse_hashfile_line
+
+NTLM = "31D6CFE0D16AE931B73C59D7E0C089C0"
+
+
+def test_parse_hash_only_lowercases_hash():
+    assert parse_hashfile_line(NTLM + "\n", "hash_only", "1000") == (NTLM.lower(), "1000", None)
+
+
+def test_parse_hash_only_dcc2_extracts_username():
+    ciphertext, _, username = parse_hashfile_line("$DCC2$10240#Admin#ABCDEF\n", "hash_only", "2100")
+    assert ciphertext == "$dcc2$10240#admin#abcdef"
+    assert username == "admin"
+
+
+def test_parse_user_hash():
+    assert parse_hashfile_line("bob:" + NTLM + "\r\n", "user_hash", "1000") == (NTLM.lower(), "1000", "bob")
+
+
+def test_parse_user_hash_requires_colon():
+    with pytest.raises(ValueError):
+        parse_hashfile_line(NTLM + "\n", "user_hash", "1000")
+
+
+def test_parse_pwdump_forces_ntlm_and_skips_machine_accounts():
+    line = "alice:1001:aad3b435b51404eeaad3b435b51404ee:" + NTLM + ":::\n"
+    assert parse_hashfile_line(line, "pwdump", "1000") == (NTLM.lower(), "1000", "alice")
+    assert parse_hashfile_line("WS01$:1002:aad3:" + NTLM + ":::\n", "pwdump", "1000") is None
+
+
+def test_parse_shadow():
+    line = "root:$6$salt$HASH:19000:0:99999:7:::\n"
+    assert parse_hashfile_line(line, "shadow", "1800") == ("$6$salt$hash", "1800", "root")
+
+
+def test_parse_kerberos_usernames():
+    tgs = "$krb5tgs$23$*svc_sql$CORP.LOCAL$MSSQL/db*$AB$CD\n"
+    assert parse_hashfile_line(tgs, "kerberos", "13100")[2] == "*svc_sql"
+    asrep = "$krb5asrep$23$jdoe@CORP.LOCAL:AB$CD\n"
+    assert parse_hashfile_line(asrep, "kerberos", "18200")[2] == "jdoe@CORP.LOCAL"
+
+
+def test_parse_netntlm_uppercases_username():
+    line = "bob::CORP:AABB:CCDD:EEFF\n"
+    ciphertext, _, username = parse_hashfile_line(line, "NetNTLM", "5600")
+    assert username == "BOB"
+    assert ciphertext == "bob::corp:aabb:ccdd:eeff"
+
+
+def test_parse_skips_blank_lines():
+    assert parse_hashfile_line("\n", "hash_only", "0") is None
+
+
+def test_import_reuses_existing_hashes(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "IMPORT_CHUNK_SIZE", 2)
+    existing = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(NTLM.lower()), ciphertext=NTLM.lower(), cracked=True, plaintext="70")
+    db.session.add(existing)
+    db.session.commit()
+
+    other = "8846f7eaee8fb117ad06bdd830b7586c"
+    hashfile = tmp_path / "hashes.txt"
+    hashfile.write_text("alice:" + NTLM + "\nbob:" + other + "\ncarol:" + other + "\n")
+
+    assert import_hashfilehashes(1, str(hashfile), "user_hash", "1000")
+
+    assert Hashes.query.count() == 2
+    rows = HashfileHashes.query.filter_by(hashfile_id=1).order_by(HashfileHashes.id).all()
+    assert [bytes.fromhex(row.username).decode("latin-1") for row in rows] == ["alice", "bob", "carol"]
+    assert rows[0].hash_id == existing.id
+    assert rows[1].hash_id == rows[2].hash_id != existing.id
+
+
+def test_hashes_are_unique_per_hash_type_and_digest(app):
+    from sqlalchemy.exc import IntegrityError
+
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(NTLM.lower()), ciphertext=NTLM.lower(), cracked=False))
+    db.session.add(Hashes(hash_type=0, sub_ciphertext=get_md5_hash(NTLM.lower()), ciphertext=NTLM.lower(), cracked=False))
+    db.session.commit()
+    assert len(Hashes.query.first().sub_ciphertext) == 16
+
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(NTLM.lower()), ciphertext=NTLM.lower(), cracked=False))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_import_retries_chunk_when_a_hash_was_inserted_concurrently(app, tmp_path, monkeypatch):
+    existing = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(NTLM.lower()), ciphertext=NTLM.lower(), cracked=False)
+    db.session.add(existing)
+    db.session.commit()
+
+    # the first lookup misses the hash, as if another import inserted it right after
+    lookups = []
+    lookup_hashes = utils.lookup_hashes
+
+    def racing_lookup(keys):
+        lookups.append(keys)
+        return {} if len(lookups) == 1 else lookup_hashes(keys)
+
+    monkeypatch.setattr(utils, "lookup_hashes", racing_lookup)
+
+    hashfile = tmp_path / "hashes.txt"
+    hashfile.write_text("alice:" + NTLM + "\n")
+    assert import_hashfilehashes(1, str(hashfile), "user_hash", "1000")
+
+    assert len(lookups) > 1
+    assert Hashes.query.count() == 1
+    assert HashfileHashes.query.one().hash_id == existing.id
+
+
+def test_import_gives_up_after_repeated_insert_conflicts(app, tmp_path, monkeypatch):
+    from sqlalchemy.exc import IntegrityError
+
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(NTLM.lower()), ciphertext=NTLM.lower(), cracked=False))
+    db.session.commit()
+    lookups = []
+
+    def missing_lookup(keys):
+        lookups.append(keys)
+        return {}
+
+    monkeypatch.setattr(utils, "lookup_hashes", missing_lookup)
+
+    hashfile = tmp_path / "hashes.txt"
+    hashfile.write_text("alice:" + NTLM + "\n")
+    with pytest.raises(IntegrityError):
+        import_hashfilehashes(1, str(hashfile), "user_hash", "1000")
+    assert len(lookups) == utils.IMPORT_CHUNK_ATTEMPTS
+
+
+def test_import_rejects_mismatched_file_type(app, tmp_path):
+    hashfile = tmp_path / "hashes.txt"
+    hashfile.write_text(NTLM + "\n")
+    assert not import_hashfilehashes(1, str(hashfile), "user_hash", "1000")
+    assert HashfileHashes.query.count() == 0
+
+
+def test_import_cracked_hashes_counts_and_updates(app):
+    from hashview.utils.utils import import_cracked_hashes
+
+    uncracked = "8846f7eaee8fb117ad06bdd830b7586c"
+    cracked = NTLM.lower()
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(uncracked), ciphertext=uncracked, cracked=False))
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(cracked), ciphertext=cracked, cracked=True, plaintext=""))
+    db.session.commit()
+
+    contents = uncracked + ":70617373776f7264\n" + cracked + ":\n" + "ffffffffffffffffffffffffffffffff:41\n"
+    counts = import_cracked_hashes(1000, contents)
+
+    assert counts == {"new": 1, "already_cracked": 1, "unmatched": 1}
+    record = Hashes.query.filter_by(ciphertext=uncracked).one()
+    assert record.cracked
+    assert record.plaintext == "70617373776F7264"
+
+    assert import_cracked_hashes(1000, contents) == {"new": 0, "already_cracked": 2, "unmatched": 1}
+
+
+def test_import_cracked_hashes_locks_the_hashes_it_looks_up(app, monkeypatch):
+    from sqlalchemy.orm import Query
+
+    from hashview.utils.utils import import_cracked_hashes
+
+    ciphertext = "8846f7eaee8fb117ad06bdd830b7586c"
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=False))
+    db.session.commit()
+    locked = []
+    with_for_update = Query.with_for_update
+
+    def recording_with_for_update(self, **kwargs):
+        locked.append(self)
+        return with_for_update(self, **kwargs)
+
+    monkeypatch.setattr(Query, "with_for_update", recording_with_for_update)
+
+    # a concurrent upload of the same crack waits on the lock, then counts it as already cracked
+    assert import_cracked_hashes(1000, ciphertext + ":41\n")["new"] == 1
+    assert len(locked) == 1
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+
+import hashview.utils.utils as utils
+from hashview.models import HashfileHashes, HashfileImports, Hashes, Hashfiles, Jobs, db
+from hashview.utils.hashfile_imports import claim_hashfile_import, fail_stale_hashfile_imports, queue_hashfile_import, run_hashfile_import
+
+NTLM = "31d6cfe0d16ae931b73c59d7e0c089c0"
+OTHER = "8846f7eaee8fb117ad06bdd830b7586c"
+THIRD = "aad3b435b51404eeaad3b435b51404ee"
+
+
+def _queue(tmp_path, contents, file_type="user_hash"):
+    job = Jobs(name="job", status="Incomplete", customer_id=1, owner_id=1)
+    db.session.add(job)
+    db.session.commit()
+    upload = tmp_path / "upload.txt"
+    upload.write_text(contents)
+    return job, queue_hashfile_import(job=job, name="pasted hashes", path=str(upload), file_type=file_type, hash_type="1000", owner_id=1)
+
+
+def test_import_runs_in_background_and_records_progress(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "IMPORT_CHUNK_SIZE", 2)
+    job, hashfile_import = _queue(tmp_path, "alice:" + NTLM + "\nbob:" + OTHER + "\ncarol:" + OTHER + "\n")
+    assert hashfile_import.status == "queued"
+
+    claimed = claim_hashfile_import()
+    assert claimed.id == hashfile_import.id
+    assert claimed.status == "validating"
+    # nobody else gets the same upload
+    assert claim_hashfile_import() is None
+
+    assert run_hashfile_import(claimed)
+
+    hashfile_import = HashfileImports.query.get(hashfile_import.id)
+    assert hashfile_import.status == "done"
+    assert hashfile_import.rows_processed == 3
+    assert hashfile_import.rows_per_second > 0
+    # hashes inserted by the import itself do not count as already known
+    assert (hashfile_import.hashes_known, hashfile_import.hashes_cracked) == (0, 0)
+    hashfile = Hashfiles.query.get(hashfile_import.hashfile_id)
+    # pasted hashes keep the name typed in the form
+    assert hashfile.name == "pasted hashes"
+    assert Jobs.query.get(job.id).hashfile_id == hashfile.id
+    assert HashfileHashes.query.filter_by(hashfile_id=hashfile.id).count() == 3
+    assert not (tmp_path / "upload.txt").exists()
+
+
+def test_import_reports_already_known_and_cracked_hashes(app, tmp_path):
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=utils.get_md5_hash(NTLM), ciphertext=NTLM, cracked=True, plaintext="41"))
+    db.session.add(Hashes(hash_type=1000, sub_ciphertext=utils.get_md5_hash(OTHER), ciphertext=OTHER, cracked=False))
+    db.session.commit()
+    _, hashfile_import = _queue(tmp_path, "alice:" + NTLM + "\nbob:" + OTHER + "\ncarol:" + NTLM + "\n")
+
+    assert run_hashfile_import(claim_hashfile_import())
+
+    hashfile_import = HashfileImports.query.get(hashfile_import.id)
+    assert (hashfile_import.rows_processed, hashfile_import.hashes_known, hashfile_import.hashes_cracked) == (3, 3, 2)
+    assert Hashes.query.count() == 2
+
+
+def test_invalid_upload_fails_with_validation_error(app, tmp_path):
+    _, hashfile_import = _queue(tmp_path, NTLM + "\n")
+
+    assert not run_hashfile_import(claim_hashfile_import())
+
+    hashfile_import = HashfileImports.query.get(hashfile_import.id)
+    assert hashfile_import.status == "failed"
+    assert hashfile_import.error == "Error line 1 is missing a : character. user:hash file should have just ONE of these"
+    assert Hashfiles.query.count() == 0
+    assert not (tmp_path / "upload.txt").exists()
+
+
+def test_upload_missing_from_worker_storage_fails(app, tmp_path):
+    _, hashfile_import = _queue(tmp_path, "alice:" + NTLM + "\n")
+    (tmp_path / "upload.txt").unlink()
+
+    assert not run_hashfile_import(claim_hashfile_import())
+
+    hashfile_import = HashfileImports.query.get(hashfile_import.id)
+    assert hashfile_import.status == "failed"
+    assert "shares hashview/control" in hashfile_import.error
+    assert Hashfiles.query.count() == 0
+
+
+def test_stale_import_is_failed_and_discarded(app, tmp_path):
+    _, hashfile_import = _queue(tmp_path, "alice:" + NTLM + "\n")
+    hashfile = Hashfiles(name="partial", customer_id=1, owner_id=1)
+    db.session.add(hashfile)
+    db.session.flush()
+    record = Hashes(hash_type=1000, sub_ciphertext=utils.get_md5_hash(NTLM), ciphertext=NTLM, cracked=False)
+    db.session.add(record)
+    db.session.flush()
+    db.session.add(HashfileHashes(hash_id=record.id, hashfile_id=hashfile.id))
+    hashfile_import.status = "importing"
+    hashfile_import.hashfile_id = hashfile.id
+    hashfile_import.updated_at = datetime.now() - timedelta(hours=1)
+    db.session.commit()
+
+    assert fail_stale_hashfile_imports() == 1
+
+    assert HashfileImports.query.get(hashfile_import.id).status == "failed"
+    assert Hashfiles.query.count() == 0
+    assert HashfileHashes.query.count() == 0
+    assert Hashes.query.count() == 0
+
+
+def test_failed_import_only_drops_its_own_orphaned_hashes(app, tmp_path, monkeypatch):
+    import hashview.utils.hashfile_imports as hashfile_imports
+
+    monkeypatch.setattr(hashfile_imports, "HASHFILE_IMPORT_DELETE_BATCH", 1)
+    _, hashfile_import = _queue(tmp_path, "alice:" + NTLM + "\n")
+    hashfile = Hashfiles(name="partial", customer_id=1, owner_id=1)
+    db.session.add(hashfile)
+    db.session.flush()
+    hashfile_id = hashfile.id
+    records = {}
+    # THIRD was just resolved by another import that has not linked it yet
+    for ciphertext in (NTLM, OTHER, THIRD):
+        records[ciphertext] = Hashes(hash_type=1000, sub_ciphertext=utils.get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=False)
+        db.session.add(records[ciphertext])
+    db.session.flush()
+    db.session.add(HashfileHashes(hash_id=records[NTLM].id, hashfile_id=hashfile_id))
+    db.session.add(HashfileHashes(hash_id=records[OTHER].id, hashfile_id=hashfile_id))
+    # OTHER is also part of another hashfile
+    db.session.add(HashfileHashes(hash_id=records[OTHER].id, hashfile_id=hashfile_id + 1))
+    hashfile_import.status = "importing"
+    hashfile_import.hashfile_id = hashfile_id
+    hashfile_import.updated_at = datetime.now() - timedelta(hours=1)
+    db.session.commit()
+
+    assert fail_stale_hashfile_imports() == 1
+
+    assert HashfileHashes.query.filter_by(hashfile_id=hashfile_id).count() == 0
+    assert sorted(record.ciphertext for record in Hashes.query.all()) == sorted([OTHER, THIRD])
@@ -0,0 +1,70 @@
+import pytest
+
+import hashview.utils.hashfile_parsing as hashfile_parsing
+import hashview.utils.utils as utils
+from hashview.models import Hashes, HashfileHashes
+from hashview.utils.hashfile_parsing import (
+    parse_hashfile_lines,
+    parse_hashfile_parallel,
+    split_hashfile,
+    use_parallel_parsing,
+)
+from hashview.utils.utils import import_hashfilehashes
+
+
+def _pwdump(tmp_path, count, extra=""):
+    path = tmp_path / "pwdump.txt"
+    lines = "".join(f"user{number}:{number}:aad3b435b51404eeaad3b435b51404ee:{number % 50:032x}:::\n" for number in range(count))
+    path.write_text(lines + f"WS01$:1:aad3:{1:032x}:::\n" + extra)
+    return str(path)
+
+
+def test_split_hashfile_ranges_end_on_newlines(tmp_path):
+    path = _pwdump(tmp_path, 100)
+    ranges = split_hashfile(path, range_bytes=500)
+    data = open(path, "rb").read()
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[end - 1:end] == b"\n"
+
+
+def test_parallel_parsing_matches_serial(tmp_path):
+    path = _pwdump(tmp_path, 300)
+    with open(path) as file:
+        serial = [row for batch in parse_hashfile_lines(file, "pwdump", "1000", validate=True) for row in batch]
+    parallel = [row for batch in parse_hashfile_parallel(path, "pwdump", "1000", validate=True, processes=2, range_bytes=1000) for row in batch]
+
+    assert len(serial) == 300
+    assert parallel == serial
+    assert serial[0] == (1000, utils.get_md5_hash(f"{0:032x}"), f"{0:032x}", "user0".encode("latin-1").hex())
+
+
+def test_parallel_validation_reports_line_of_whole_file(tmp_path):
+    path = _pwdump(tmp_path, 300, extra="broken\n")
+    with pytest.raises(ValueError, match="^Error line 302 is missing a : character. Pwdump file should include usernames.$"):
+        for _ in parse_hashfile_parallel(path, "pwdump", "1000", validate=True, processes=2, range_bytes=1000):
+            pass
+
+
+def test_parallel_parsing_is_off_by_default(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(hashfile_parsing, "PARALLEL_PARSE_MIN_BYTES", 0)
+
+    assert not use_parallel_parsing(_pwdump(tmp_path, 10), "pwdump")
+
+    monkeypatch.setitem(app.config, "PARALLEL_PARSE_PROCESSES", 2)
+    assert use_parallel_parsing(_pwdump(tmp_path, 10), "pwdump")
+
+
+def test_import_uses_parallel_parsing_for_large_files(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(hashfile_parsing, "PARALLEL_PARSE_MIN_BYTES", 0)
+    monkeypatch.setitem(app.config, "PARALLEL_PARSE_PROCESSES", 2)
+    monkeypatch.setattr(hashfile_parsing, "PARALLEL_PARSE_RANGE_BYTES", 1000)
+    monkeypatch.setattr(utils, "IMPORT_CHUNK_SIZE", 7)
+    path = _pwdump(tmp_path, 120)
+
+    assert import_hashfilehashes(1, path, "pwdump", "1000")
+
+    assert HashfileHashes.query.filter_by(hashfile_id=1).count() == 120
+    assert Hashes.query.count() == 50
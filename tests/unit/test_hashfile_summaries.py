@@ -0,0 +1,100 @@
+import json
+
+from hashview.analytics.summaries import get_hashfile_summaries, merge_summaries, refresh_hashfile_summary
+from hashview.models import HashfileSummaries, Hashfiles, db
+from hashview.utils.utils import import_cracked_hashes, import_hashfilehashes
+
+NTLM = "31d6cfe0d16ae931b73c59d7e0c089c0"
+OTHER = "8846f7eaee8fb117ad06bdd830b7586c"
+
+
+def _import(tmp_path, hashfile_id, customer_id, lines):
+    db.session.add(Hashfiles(id=hashfile_id, name="hashes.txt", customer_id=customer_id, owner_id=1))
+    db.session.commit()
+    hashfile = tmp_path / f"hashes{hashfile_id}.txt"
+    hashfile.write_text("".join(line + "\n" for line in lines))
+    assert import_hashfilehashes(hashfile_id, str(hashfile), "user_hash", "1000")
+
+
+def _columns(summary):
+    return {column.name: getattr(summary, column.name) for column in HashfileSummaries.__table__.columns if column.name != "updated_at"}
+
+
+def test_import_builds_summary(app, tmp_path):
+    _import(tmp_path, 1, 7, ["alice:" + NTLM, "bob:" + OTHER, "carol:" + OTHER])
+
+    summary = HashfileSummaries.query.get(1)
+    assert (summary.customer_id, summary.hash_type) == (7, 1000)
+    assert (summary.total, summary.cracked) == (3, 0)
+    assert (summary.unique_cracked, summary.unique_uncracked) == (0, 2)
+
+
+def test_crack_ingestion_updates_summaries_incrementally(app, tmp_path):
+    _import(tmp_path, 1, 7, ["alice:" + NTLM, "bob:" + OTHER, "carol:" + OTHER])
+    _import(tmp_path, 2, 8, ["dave:" + OTHER])
+
+    # "bob" as plaintext, so bob's password matches his username
+    import_cracked_hashes(1000, OTHER + ":626f62\n")
+
+    first = HashfileSummaries.query.get(1)
+    assert (first.cracked, first.unique_cracked, first.unique_uncracked) == (2, 1, 1)
+    assert json.loads(first.lengths) == {"3": 2}
+    assert json.loads(first.passwords) == {"bob": 2}
+    assert json.loads(first.username_matches) == ["bob"]
+    assert HashfileSummaries.query.get(2).cracked == 1
+
+    incremental = _columns(first)
+    assert _columns(refresh_hashfile_summary(1)) == incremental
+
+
+def test_dashboard_scopes_merge_summaries(app, tmp_path):
+    _import(tmp_path, 1, 7, ["alice:" + NTLM])
+    _import(tmp_path, 2, 7, ["bob:" + OTHER])
+    _import(tmp_path, 3, 8, ["carol:" + OTHER])
+    import_cracked_hashes(1000, OTHER + ":41\n")
+
+    customer = merge_summaries(get_hashfile_summaries(customer_id=7))
+    assert (customer.cracked, customer.uncracked) == (1, 1)
+    everything = merge_summaries(get_hashfile_summaries())
+    assert (everything.cracked, everything.uncracked, everything.fails_complexity) == (2, 1, 2)
+    assert everything.top_passwords() == [("A", 2)]
+
+
+def test_missing_summary_is_built_on_read(app, tmp_path):
+    _import(tmp_path, 1, 7, ["alice:" + NTLM])
+    HashfileSummaries.query.delete()
+    db.session.commit()
+
+    summaries = get_hashfile_summaries(hashfile_ids=[1])
+
+    assert [summary.total for summary in summaries] == [1]
+    assert HashfileSummaries.query.count() == 1
+
+
+def test_import_summary_matches_full_refresh(app, tmp_path):
+    _import(tmp_path, 1, 7, ["alice:" + NTLM, "bob:" + OTHER])
+    # "bob" as plaintext, so bob's password matches his username
+    import_cracked_hashes(1000, OTHER + ":626f62\n")
+
+    # both hashes are already known and one is cracked when the second hashfile is imported
+    _import(tmp_path, 2, 7, ["bob:" + OTHER, "carol:" + OTHER, "dave:" + NTLM, "erin:" + OTHER.upper()])
+
+    from_import = _columns(HashfileSummaries.query.get(2))
+    assert (from_import["total"], from_import["cracked"]) == (4, 3)
+    assert (from_import["unique_cracked"], from_import["unique_uncracked"]) == (1, 1)
+    assert _columns(refresh_hashfile_summary(2)) == from_import
+
+
+def test_username_matches_are_not_capped(app, tmp_path, monkeypatch):
+    import hashview.analytics.summaries as summaries
+
+    monkeypatch.setattr(summaries, "SUMMARY_TOP_LIMIT", 2)
+    ciphertexts = [f"{number:032x}" for number in range(5)]
+    _import(tmp_path, 1, 7, [f"user{number}:{ciphertext}" for number, ciphertext in enumerate(ciphertexts)])
+
+    # every account uses its username as password
+    import_cracked_hashes(1000, "".join(f"{ciphertext}:{f'user{number}'.encode().hex()}\n" for number, ciphertext in enumerate(ciphertexts)))
+
+    summary = HashfileSummaries.query.get(1)
+    assert sorted(json.loads(summary.username_matches)) == [f"user{number}" for number in range(5)]
+    assert len(json.loads(summary.passwords)) == 2
@@ -0,0 +1,54 @@
+import hashview.utils.utils as utils
+from hashview.models import HashfileHashes
+from hashview.utils.utils import validate_and_import_hashfilehashes, validate_hash_only_hashfile, validate_hashfile, validate_kerberos_hashfile, validate_netntlm_hashfile, validate_pwdump_hashfile
+
+NTLM = "31d6cfe0d16ae931b73c59d7e0c089c0"
+
+
+def _write(tmp_path, contents):
+    path = tmp_path / "hashes.txt"
+    path.write_text(contents)
+    return str(path)
+
+
+def test_pwdump_rules(tmp_path):
+    assert not validate_pwdump_hashfile(_write(tmp_path, "alice:1001:aad3:" + NTLM + ":::\n"), "1000")
+    assert validate_pwdump_hashfile(_write(tmp_path, "alice:1001:aad3:" + NTLM + ":::\nbob\n"), "1000") == "Error line 2 is missing a : character. Pwdump file should include usernames."
+    assert validate_pwdump_hashfile(_write(tmp_path, "alice:1001:aad3:abc:::\n"), "1000") == "Error line 1 has an invalid number of characters (22) should be 32"
+    assert validate_pwdump_hashfile(_write(tmp_path, "alice:1001:aad3:" + NTLM + ":::\n"), "0") == "Sorry. The only Hash Type we support for PWDump files is NTLM"
+
+
+def test_kerberos_rules(tmp_path):
+    tgs = "$krb5tgs$23$*svc$CORP$spn*$ab$cd\n"
+    assert not validate_kerberos_hashfile(_write(tmp_path, tgs), "13100")
+    assert validate_kerberos_hashfile(_write(tmp_path, tgs.replace("$23$", "$17$")), "13100") == "Error line 1. Doesnt appear to be of the type: Kerberos 5, etype 23, TGS-REP (3)"
+    assert validate_kerberos_hashfile(_write(tmp_path, tgs), "1") == "Sorry. The only suppported Hash Types are: 7500, 13100, 18200, 19600, 19700, 19800 and 19900."
+
+
+def test_hash_only_rules(tmp_path):
+    assert not validate_hash_only_hashfile(_write(tmp_path, NTLM + "\n" + NTLM.upper() + "\n"), "1000")
+    assert validate_hash_only_hashfile(_write(tmp_path, NTLM + "\nabc\n"), "1000") == "Error line 2 has an invalid number of characters (3) should be 32"
+    assert validate_hash_only_hashfile(_write(tmp_path, "$DCC2$10240#admin\n"), "2100") == "Error line 1. Doesnt appear to be of the type: DCC2 MS Cache"
+    assert validate_hash_only_hashfile(_write(tmp_path, "x" * 50001), "0") == "Error line 1 is too long. Line length: 50001. Max length is 50,000 chars."
+    # hash types without rules accept anything
+    assert not validate_hash_only_hashfile(_write(tmp_path, "anything\n"), "99999")
+
+
+def test_netntlm_duplicates_are_detected_in_one_pass(tmp_path):
+    lines = "".join(f"user{number}::CORP:aa:bb:cc\n" for number in range(1000))
+    assert not validate_netntlm_hashfile(_write(tmp_path, lines))
+    assert validate_netntlm_hashfile(_write(tmp_path, lines + "USER5::corp:dd:ee:ff\n")) == "Error: Duplicate usernames / computer found in hashfiles (user5:corp). Please only submit unique usernames / computer."
+
+
+def test_unknown_file_type(tmp_path):
+    assert validate_hashfile(_write(tmp_path, NTLM + "\n"), "nope", "0") == "Invalid File Format"
+
+
+def test_validation_is_fused_with_import(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "IMPORT_CHUNK_SIZE", 2)
+    path = _write(tmp_path, "".join(f"user{number}:{NTLM}\n" for number in range(5)))
+    assert not validate_and_import_hashfilehashes(1, path, "user_hash", "1000")
+    assert HashfileHashes.query.filter_by(hashfile_id=1).count() == 5
+
+    path = _write(tmp_path, "alice:" + NTLM + "\nbob:" + NTLM + "\ncarol\n")
+    assert validate_and_import_hashfilehashes(2, path, "user_hash", "1000") == "Error line 3 is missing a : character. user:hash file should have just ONE of these"
@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import event
+
+import hashview
+from hashview.models import Agents, Jobs, JobTasks, Settings, db
+from hashview.utils import agent_status, utils
+
+
+@pytest.fixture()
+def heartbeat(client):
+    db.session.add(Settings(retention_period=0, max_runtime_jobs=0, max_runtime_tasks=0))
+    db.session.commit()
+    utils.clear_settings_cache()
+    client.set_cookie("agent_version", hashview.__version__)
+
+    commits = []
+    event.listen(db.session(), "after_commit", commits.append)
+
+    def post(agent_status, hc_status=""):
+        commits.clear()
+        return client.post("/v1/agents/heartbeat", json={"agent_status": agent_status, "hc_status": hc_status}).get_json()
+
+    post.commits = commits
+    yield post
+    utils.clear_settings_cache()
+
+
+def test_idle_heartbeat_claims_task_with_one_commit(heartbeat):
+    db.session.add(JobTasks(job_id=1, task_id=1, status="Queued"))
+    db.session.commit()
+
+    response = heartbeat("Idle")
+
+    assert response["msg"] == "START"
+    assert len(heartbeat.commits) == 1
+    agent = Agents.query.one()
+    assert agent.status == "Idle"
+    assert agent_status.get_buffered_agent_status(agent.uuid)["last_checkin"] is not None
+    assert JobTasks.query.get(response["job_task_id"]).agent_id == agent.id
+
+    # the same task is handed out again until the agent reports it as working
+    assert heartbeat("Idle")["job_task_id"] == response["job_task_id"]
+
+
+def test_idle_heartbeat_without_work(heartbeat):
+    assert heartbeat("Idle")["msg"] == "OK"
+    assert len(heartbeat.commits) == 1
+
+
+def test_settings_are_cached(heartbeat):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        assert utils.get_cached_settings().retention_period == 0
+        assert len(statements) == 1
+
+        statements.clear()
+        assert utils.get_cached_settings().retention_period == 0
+        assert statements == []
+
+        # clear_settings_cache forces the next call back to the db
+        utils.clear_settings_cache()
+        utils.get_cached_settings()
+        assert len(statements) == 1
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_working_heartbeat_buffers_hashcat_status(heartbeat):
+    from datetime import datetime
+
+    agent = Agents.query.one()
+    db.session.add(JobTasks(job_id=1, task_id=1, status="Running", agent_id=agent.id, started_at=datetime.now().replace(microsecond=0)))
+    db.session.commit()
+
+    response = heartbeat("Working", {"Speed #": "10 MH/s", "Recovered": "1/2"})
+
+    assert response["msg"] == "OK"
+    assert Agents.query.one().status == "Working"
+    buffered = agent_status.get_buffered_agent_status(agent.uuid)
+    assert buffered["benchmark"] == "10 MH/s"
+    assert '"Recovered": "1/2"' in buffered["hc_status"]
+
+
+def test_completed_task_clears_status_through_the_buffer(heartbeat):
+    agent = Agents.query.one()
+    db.session.add(Jobs(id=1, name="job", status="Running", customer_id=1, owner_id=1))
+    db.session.add(JobTasks(id=1, job_id=1, task_id=1, status="Running", agent_id=agent.id))
+    db.session.add(JobTasks(id=2, job_id=1, task_id=2, status="Queued"))
+    db.session.commit()
+    heartbeat("Working", {"Speed #": "10 MH/s", "Recovered": "1/2"})
+
+    utils.update_job_task_status(1, "Completed")
+    agent_status.flush_agent_status()
+
+    db.session.expire_all()
+    assert JobTasks.query.get(1).agent_id is None
+    assert Agents.query.one().hc_status == ""
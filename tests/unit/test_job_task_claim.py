@@ -0,0 +1,55 @@
+import threading
+
+from flask import Flask
+
+from hashview.models import JobTasks, db
+from hashview.utils.utils import claim_next_job_task
+
+
+def _queue_tasks(count, priority=3):
+    for task_id in range(count):
+        db.session.add(JobTasks(job_id=1, task_id=task_id, priority=priority, status='Queued'))
+    db.session.commit()
+
+
+def test_claim_takes_highest_priority_first(app):
+    _queue_tasks(1, priority=1)
+    _queue_tasks(1, priority=5)
+
+    job_task = claim_next_job_task(7)
+    db.session.commit()
+
+    assert job_task.priority == 5
+    assert job_task.agent_id == 7
+    assert job_task.status == 'Running'
+    assert claim_next_job_task(8).priority == 1
+    assert claim_next_job_task(9) is None
+
+
+def test_concurrent_claims_never_share_a_task(tmp_path):
+    app = Flask("hashview")
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite:///" + str(tmp_path / "claims.db"), SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        _queue_tasks(10)
+
+    claims = {}
+
+    def agent(agent_id):
+        with app.app_context():
+            job_task = claim_next_job_task(agent_id)
+            db.session.commit()
+            claims[agent_id] = job_task.id if job_task else None
+
+    threads = [threading.Thread(target=agent, args=(agent_id,)) for agent_id in range(1, 21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    claimed = [job_task_id for job_task_id in claims.values() if job_task_id]
+    assert len(claimed) == 10
+    assert len(set(claimed)) == 10
+    with app.app_context():
+        assert {job_task.id: job_task.agent_id for job_task in JobTasks.query.all()} == {job_task_id: agent_id for agent_id, job_task_id in claims.items() if job_task_id}
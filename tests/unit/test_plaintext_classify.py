@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from hashview.analytics import classify
+from hashview.analytics.aggregate import PlaintextAggregate
+
+np = pytest.importorskip("numpy")
+
+
+def _hex(value):
+    return value.encode('latin-1').hex().upper()
+
+
+def _rows(count):
+    rng = random.Random(7)
+    alphabet = "aZ9!é\x00 " + "".join(chr(i) for i in range(256))
+    rows = [(_hex(""), _hex("blank")), (_hex("bob"), _hex("CORP\\bob")), (_hex("Summer2024!"), None)]
+    for _ in range(count):
+        plaintext = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        rows.append((_hex(plaintext), _hex(plaintext) if rng.random() < 0.1 else None))
+    return rows
+
+
+def test_classify_plaintexts():
+    lengths, bits, masks = classify.classify_plaintexts([_hex("Ab1!"), _hex(""), _hex("zz\x00")])
+
+    assert lengths.tolist() == [4, 0, 3]
+    assert bits.tolist() == [15, 0, 10]
+    assert masks.tolist() == [b"?u?l?d?s", b"", b"?l?l?s"]
+
+
+def test_vectorized_aggregate_matches_per_row(monkeypatch):
+    rows = _rows(2000)
+    monkeypatch.setattr("hashview.analytics.aggregate.CLASSIFY_BATCH_SIZE", 300)
+
+    vectorized = PlaintextAggregate().update(rows)
+    per_row = PlaintextAggregate()
+    for plaintext, username in rows:
+        per_row.add(plaintext, username)
+
+    for attribute in ("total", "meets_complexity", "fails_complexity", "charsets", "lengths", "passwords", "masks", "username_matches"):
+        assert getattr(vectorized, attribute) == getattr(per_row, attribute), attribute
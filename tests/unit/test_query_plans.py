@@ -0,0 +1,98 @@
+import logging
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from hashview.analytics.summaries import refresh_hashfile_summary
+from hashview.models import HashfileHashes, HashNotifications, Hashes, Hashfiles, Settings, Users, db
+from hashview.scheduler import _data_retention_cleanup_inner
+from hashview.utils.utils import get_md5_hash, import_cracked_hashes
+
+# A full scan of either side of the hashes <-> hashfile_hashes join, index seeks show up as SEARCH
+FULL_SCAN = re.compile(r"\bSCAN (hashes|hashfile_hashes)\b(?! USING (COVERING )?INDEX \w+ \()")
+
+
+class Mailer:
+    def send(self, message):
+        pass
+
+
+def _setup():
+    db.session.add(Settings(id=1, retention_period=30))
+    db.session.add(Users(id=1, first_name="Alice", last_name="A", email_address="alice@example.com", password="x"))
+    db.session.add(Hashfiles(id=1, name="hashes.txt", customer_id=1, owner_id=1))
+    db.session.add(Hashfiles(id=2, name="old.txt", customer_id=1, owner_id=1, uploaded_at=datetime.today() - timedelta(days=60)))
+    for i in range(20):
+        ciphertext = f"{i:032x}"
+        record = Hashes(hash_type=1000, sub_ciphertext=get_md5_hash(ciphertext), ciphertext=ciphertext, cracked=False)
+        db.session.add(record)
+        db.session.flush()
+        db.session.add(HashfileHashes(hash_id=record.id, hashfile_id=1 + i % 2, username="61"))
+        db.session.add(HashNotifications(owner_id=1, hash_id=record.id, method="email"))
+    db.session.commit()
+
+
+def _full_scans(statements):
+    """EXPLAIN QUERY PLAN every statement touching hashfile_hashes, returns the full scans found"""
+
+    scans = []
+    connection = db.session.connection()
+    for statement, parameters in statements:
+        if "hashfile_hashes" not in statement or statement.lstrip().upper().startswith("INSERT"):
+            continue
+        for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+            if FULL_SCAN.search(row[-1]):
+                scans.append((row[-1], statement))
+    return scans
+
+
+@pytest.fixture()
+def statements(app):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.startswith("EXPLAIN"):
+            executed.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_agent_hashfile_paths_use_indexes(client, statements):
+    _setup()
+
+    assert client.get("/v1/hashfiles/1", headers={"Accept-Encoding": "identity"}).status_code == 200
+    assert client.get("/v1/getHashType/1").get_json()["hash_type"] == 1000
+
+    assert _full_scans(statements) == []
+
+
+def test_summary_crack_and_retention_paths_use_indexes(app, statements):
+    _setup()
+
+    refresh_hashfile_summary(1)
+    import_cracked_hashes(1000, f"{0:032x}:41\n{1:032x}:42\n")
+    _data_retention_cleanup_inner(db, Mailer(), logging.getLogger("test"))
+
+    assert Hashfiles.query.count() == 1
+    assert _full_scans(statements) == []
+
+
+@pytest.mark.parametrize("query", [
+    # analytics download of a hashfile
+    lambda: db.session.query(HashfileHashes.username, Hashes.ciphertext, Hashes.plaintext).join(HashfileHashes, Hashes.id == HashfileHashes.hash_id).filter(Hashes.cracked.is_(True)).filter(HashfileHashes.hashfile_id == 1),
+    # jobs_summary and the job completion notification counts
+    lambda: db.session.query(Hashes).outerjoin(HashfileHashes, Hashes.id == HashfileHashes.hash_id).filter(Hashes.cracked == '1').filter(HashfileHashes.hashfile_id == 1),
+    lambda: db.session.query(HashNotifications).join(HashfileHashes, HashNotifications.hash_id == HashfileHashes.hash_id).filter(HashfileHashes.hashfile_id == 1),
+    # build_hashcat_command and the hashfile delete
+    lambda: HashfileHashes.query.filter_by(hashfile_id=1),
+    lambda: Hashes.query.filter(~db.exists().where(Hashes.id == HashfileHashes.hash_id)).filter(Hashes.cracked.is_(False)).filter(Hashes.id.in_([1, 2])),
+])
+def test_route_queries_use_indexes(app, query):
+    _setup()
+    statement = query().statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+
+    assert _full_scans([(str(statement), ())]) == []
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import hashview.scheduler as scheduler
+from hashview.models import WorkerLocks, db
+from hashview.scheduler import acquire_worker_lock, release_worker_lock, renew_worker_lock, run_locked_job
+
+
+def test_only_one_worker_holds_a_lock(app, monkeypatch):
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-a:1")
+    assert acquire_worker_lock(db, "DATA_RETENTION", 60)
+    # renewing our own lock is fine
+    assert acquire_worker_lock(db, "DATA_RETENTION", 60)
+
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-b:2")
+    assert not acquire_worker_lock(db, "DATA_RETENTION", 60)
+    # other jobs are not affected
+    assert acquire_worker_lock(db, "DYNAMIC_WORDLISTS", 60)
+    # releasing a lock held by someone else is a no-op
+    release_worker_lock(db, "DATA_RETENTION")
+    assert WorkerLocks.query.get("DATA_RETENTION").owner == "host-a:1"
+
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-a:1")
+    release_worker_lock(db, "DATA_RETENTION")
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-b:2")
+    assert acquire_worker_lock(db, "DATA_RETENTION", 60)
+
+
+def test_expired_lock_is_taken_over(app, monkeypatch):
+    db.session.add(WorkerLocks(name="DATA_RETENTION", owner="dead-host:1", expires_at=datetime.now() - timedelta(minutes=1)))
+    db.session.commit()
+
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-b:2")
+    assert acquire_worker_lock(db, "DATA_RETENTION", 60)
+    assert WorkerLocks.query.get("DATA_RETENTION").owner == "host-b:2"
+
+
+def test_long_run_renews_its_lock(app, monkeypatch):
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-a:1")
+    assert acquire_worker_lock(db, "DATA_RETENTION", 60)
+    WorkerLocks.query.get("DATA_RETENTION").expires_at = datetime.now() + timedelta(seconds=1)
+    db.session.commit()
+
+    assert renew_worker_lock(db, "DATA_RETENTION", 3600)
+    assert WorkerLocks.query.get("DATA_RETENTION").expires_at > datetime.now() + timedelta(minutes=59)
+
+    # a worker that lost its lock is told so
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-b:2")
+    assert not renew_worker_lock(db, "DATA_RETENTION", 3600)
+    assert WorkerLocks.query.get("DATA_RETENTION").owner == "host-a:1"
+
+
+def test_run_locked_job_skips_when_locked(app, monkeypatch):
+    ran = []
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-a:1")
+    acquire_worker_lock(db, "DATA_RETENTION", 60)
+
+    monkeypatch.setattr(scheduler, "_lock_owner", lambda: "host-b:2")
+    assert not run_locked_job(app, "DATA_RETENTION", 60, ran.append)
+    assert ran == []
+
+    assert run_locked_job(app, "HASHFILE_SUMMARIES", 60, ran.append)
+    assert ran == [app]
+    # released once the job is done
+    assert WorkerLocks.query.get("HASHFILE_SUMMARIES") is None